@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import json
+import time
+
+from ollama import AsyncClient
+from chatbot import Bot
+
+
+def read_seeds(path):
+    """Seed prompts, one per line. Empty lines are skipped."""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+async def run_conversation(client, semaphore, conversation, seed, args, tokenizer, out, stats):
+    """
+    Run one bot pair for args.turns replies starting from the seed prompt
+    """
+    async with semaphore:
+        bots = [Bot(model, tokenizer=tokenizer, system=args.system, low_water=args.low_water)
+                for model in (args.model1, args.model2)]
+        for bot in bots:
+            bot.verbose = False
+        r = seed
+        for turn in range(args.turns):
+            bot = bots[turn % 2]
+            start = time.perf_counter()
+            try:
+                r = await bot.atalk(client, r, args.max_tokens)
+            except Exception as e:
+                stats['errors'] += 1
+                print(f"conversation {conversation} failed on turn {turn}: {e}")
+                return
+            response = bot.last_response
+            stats['turns'] += 1
+            stats['eval_count'] += response.eval_count or 0
+            stats['prompt_eval_count'] += response.prompt_eval_count or 0
+            stats['prompt_eval_duration'] += response.prompt_eval_duration or 0
+            out.write(json.dumps({
+                "conversation": conversation,
+                "turn": turn,
+                "bot": f"bot{turn % 2 + 1}",
+                "model": bot.model,
+                "content": r,
+                "seconds": round(time.perf_counter() - start, 3),
+                "eval_count": response.eval_count,
+                "eval_duration": response.eval_duration,
+                "prompt_eval_count": response.prompt_eval_count,
+                "prompt_eval_duration": response.prompt_eval_duration,
+            }) + "\n")
+
+
+async def run_batch(seeds, args, tokenizer=None):
+    """
+    Run a conversation for every seed, at most args.concurrency at the same time.
+    Returns aggregate statistics of the run. Without a tokenizer the bots use the
+    shared tokenizer of their model family.
+    """
+    client = AsyncClient(host=args.host)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    stats = {'conversations': len(seeds), 'turns': 0, 'errors': 0, 'eval_count': 0,
+             'prompt_eval_count': 0, 'prompt_eval_duration': 0}
+    start = time.perf_counter()
+    with open(args.output, 'w') as out:
+        await asyncio.gather(*[
+            run_conversation(client, semaphore, i, seed, args, tokenizer, out, stats)
+            for i, seed in enumerate(seeds)
+        ])
+    stats['seconds'] = time.perf_counter() - start
+    stats['tokens_per_s'] = stats['eval_count'] / stats['seconds'] if stats['seconds'] else 0
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run many two-bot conversations concurrently without prompts")
+    parser.add_argument("--model1", required=True, help="First LLM model. It needs to be pulled with Ollama already")
+    parser.add_argument("--model2", required=True, help="Second LLM model. It needs to be pulled with Ollama already")
+    parser.add_argument("--prompts_file", required=True, help="File with one seed prompt per line")
+    parser.add_argument("--output", default="transcripts.jsonl", help="JSONL transcript file. Default transcripts.jsonl")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Conversations running at the same time. Match OLLAMA_NUM_PARALLEL. Default 4")
+    parser.add_argument("--turns", type=int, default=10, help="Replies per conversation. Default 10")
+    parser.add_argument("--max_tokens", type=int, default=2048, help="Max tokens. Default 2048")
+    parser.add_argument("--system", default=None, help="System prompt for all bots")
+    parser.add_argument("--low_water", type=float, default=0.5,
+                        help="When max tokens is exceeded trim history down to this fraction of it. Default 0.5")
+    parser.add_argument("--host", default=None, help="Ollama host. Default is OLLAMA_HOST or localhost:11434")
+    return parser.parse_args(argv)
+
+
+def print_stats(stats):
+    print(f"Conversations: {stats['conversations']} ({stats['errors']} failed)")
+    print(f"Turns: {stats['turns']} in {stats['seconds']:.2f}s")
+    print(f"Generated tokens: {stats['eval_count']} ({stats['tokens_per_s']:.1f} tokens/s)")
+    print(f"Prompt tokens evaluated: {stats['prompt_eval_count']} in {stats['prompt_eval_duration'] / 1e9:.2f}s")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    stats = asyncio.run(run_batch(read_seeds(args.prompts_file), args))
+    print_stats(stats)
@@ -3,11 +3,12 @@ import json
 import argparse
 import re
 import sys
+import time
 
 from ollama import chat
 from ollama import ChatResponse
 from ollama import Options
-from tokenizers import Tokenizer
+from tokenizer_registry import get_tokenizer
 
 class bcolors:
     BLUE = '\033[94m'
@@ -15,27 +16,144 @@ class bcolors:
     END = '\033[0m'
 
 
+class ThinkFilter:
+    """
+    Incremental filter for <think>...</think> blocks in streamed output.
+    Tags may be split over chunk boundaries, so a possible partial tag at the
+    end of a chunk is held back until the next chunk arrives.
+    """
+    OPEN = '<think>'
+    CLOSE = '</think>'
+
+    def __init__(self):
+        self.inside = False
+        self.buffer = ''
+
+    def _partial_tag(self, tag):
+        # Length of the longest buffer suffix that could start the tag
+        for n in range(min(len(tag) - 1, len(self.buffer)), 0, -1):
+            if self.buffer.endswith(tag[:n]):
+                return n
+        return 0
+
+    def feed(self, text):
+        """Feed a chunk and return the part of it that is visible"""
+        self.buffer += text
+        visible = []
+        while True:
+            tag = self.CLOSE if self.inside else self.OPEN
+            idx = self.buffer.find(tag)
+            if idx < 0:
+                break
+            if not self.inside:
+                visible.append(self.buffer[:idx])
+            self.buffer = self.buffer[idx + len(tag):]
+            self.inside = not self.inside
+        keep = self._partial_tag(tag)
+        if not self.inside:
+            visible.append(self.buffer[:len(self.buffer) - keep])
+        self.buffer = self.buffer[len(self.buffer) - keep:]
+        return ''.join(visible)
+
+    def flush(self):
+        """Return whatever visible text is still buffered at the end of the stream"""
+        rest = '' if self.inside else self.buffer
+        self.inside = False
+        self.buffer = ''
+        return rest
+
+
 class Bot:
-    def __init__(self, model="deepseek-r1:1.5b"):
+    def __init__(self, model="deepseek-r1:1.5b", tokenizer=None, system=None, low_water=0.5):
         self.messages = []
+        # Token count of each message in self.messages, same order
+        self.token_counts = []
+        # Running total of self.token_counts
+        self.token_count = 0
+        # Leading messages that are never trimmed: the system prompt and the first prompt.
+        # Keeping them keeps the start of the prompt, and Ollama's KV cache for it, stable.
+        self.pinned = 1
+        if system:
+            self.messages.append({'role': 'system', 'content': system})
+            self.pinned += 1
+        # When history exceeds max_tokens it is trimmed down to low_water * max_tokens
+        # in one go, so the prompt prefix stays the same for several turns
+        self.low_water = low_water
+        # (prompt_eval_count, prompt_eval_duration) of every response
+        self.prompt_evals = []
         self.model = model
         self.debug = False
-        self.tokenizer = Tokenizer.from_pretrained("gpt2")
+        # Print token counts on every turn
+        self.verbose = True
+        # Last ChatResponse, kept for its timing and token metadata
+        self.last_response = None
+        # Time to first visible token of the last streamed reply
+        self.ttft = None
+        # Loaded on first use from the shared registry unless given
+        self._tokenizer = tokenizer
         # Used when debug is set to Ture
         self.debug_messages = []
 
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            self._tokenizer = get_tokenizer(self.model)
+        return self._tokenizer
+
     # Function to track tokens
     def _count_tokens(self, message):
         tokens = self.tokenizer.encode(message)
         return len(tokens.ids)
 
+    def _count_new_tokens(self):
+        """
+        Count tokens of messages added since the last call. Every message is
+        encoded only once and all pending messages go in one encode_batch call.
+        """
+        pending = self.messages[len(self.token_counts):]
+        if not pending:
+            return
+        encodings = self.tokenizer.encode_batch([msg['content'] for msg in pending])
+        counts = [len(e.ids) for e in encodings]
+        self.token_counts.extend(counts)
+        self.token_count += sum(counts)
+
      # Function to trim conversation history
     def _trim_conversation(self, max_tokens):
-        token_count = sum(self._count_tokens(msg['content']) for msg in self.messages)
-        print(f"Token count: {token_count}")
-        while token_count > max_tokens:
-            self.messages.pop(0)
-            token_count = sum(self._count_tokens(msg['content']) for msg in self.messages)
+        self._count_new_tokens()
+        if self.verbose:
+            print(f"Token count: {self.token_count}")
+        if self.token_count <= max_tokens:
+            return
+        # Evict the oldest unpinned messages as one block, but never the newest message
+        target = self.low_water * max_tokens
+        start = end = min(self.pinned, len(self.messages) - 1)
+        while self.token_count > target and end < len(self.messages) - 1:
+            self.token_count -= self.token_counts[end]
+            end += 1
+        del self.messages[start:end]
+        del self.token_counts[start:end]
+
+    def _record_prompt_eval(self, response):
+        """
+        Keep prompt evaluation stats of the response. Cached prompt tokens are not counted by Ollama.
+        Debug questions are not part of the conversation and are not counted.
+        """
+        self.last_response = response
+        if self.debug:
+            return
+        self.prompt_evals.append((response.prompt_eval_count or 0, response.prompt_eval_duration or 0))
+
+    def last_prompt_eval(self):
+        """Prompt evaluation stats of the last response"""
+        count = self.last_response.prompt_eval_count or 0
+        duration = self.last_response.prompt_eval_duration or 0
+        return f"Prompt eval: {count} tokens in {duration / 1e9:.2f}s"
+
+    def prompt_eval_summary(self):
+        count = sum(c for c, _ in self.prompt_evals)
+        duration = sum(d for _, d in self.prompt_evals)
+        return f"{len(self.prompt_evals)} responses, {count} prompt tokens evaluated in {duration / 1e9:.2f}s"
 
     def _add_message(self, message, role):
         if self.debug:
@@ -44,22 +162,98 @@ class Bot:
         else:
             self.messages.append({'role': role, 'content': message})
 
-    def _send_messages(self):
+    def _stream_chat(self, messages, on_token):
+        """
+        Stream the reply and pass visible text to on_token as it arrives.
+        Returns the whole reply including <think> blocks.
+        """
+        think = ThinkFilter()
+        parts = []
+        self.ttft = None
+        start = time.perf_counter()
+        for chunk in chat(model=self.model, messages=messages, stream=True):
+            parts.append(chunk.message.content)
+            if chunk.done:
+                # The final chunk carries the timing and token metadata
+                self._record_prompt_eval(chunk)
+            visible = think.feed(chunk.message.content)
+            if self.ttft is None:
+                # Whitespace left behind by a stripped <think> block is not a visible token
+                visible = visible.lstrip()
+                if not visible:
+                    continue
+                self.ttft = time.perf_counter() - start
+            on_token(visible)
+        # A short reply may be held back entirely as a possible partial tag
+        visible = think.flush()
+        if self.ttft is None:
+            visible = visible.lstrip()
+            if visible:
+                self.ttft = time.perf_counter() - start
+        if visible:
+            on_token(visible)
+        return ''.join(parts)
+
+    def _send_messages(self, on_token=None):
+        messages = self.debug_messages if self.debug else self.messages
+        if on_token:
+            content = self._stream_chat(messages, on_token)
+        else:
+            response: ChatResponse = chat(model=self.model, messages=messages)
+            self._record_prompt_eval(response)
+            content = response.message.content
         if self.debug:
-            response: ChatResponse = chat(model=self.model, messages=self.debug_messages)
             self.debug_messages = []
         else:
-            response: ChatResponse = chat(model=self.model, messages=self.messages)
-            self._add_message(response.message.content, 'assistant')
-        return response.message.content
+            self._add_message(content, 'assistant')
+        return content
 
-    def talk(self, input_data, max_tokens):
+    def talk(self, input_data, max_tokens, on_token=None):
+        """
+        Send input_data and return the reply without <think> blocks. When on_token
+        is given the reply is streamed and visible text is passed to it as it arrives.
+        """
         self._add_message(input_data, 'user')
         self._trim_conversation(max_tokens)
-        output_data = self._send_messages()
+        output_data = self._send_messages(on_token)
         output_data = re.sub(r'<think>.*?</think>', '', output_data, flags=re.DOTALL)
         return(output_data)
 
+    async def atalk(self, client, input_data, max_tokens):
+        """
+        Same as talk() but sends the messages with an ollama.AsyncClient
+        """
+        self._add_message(input_data, 'user')
+        self._trim_conversation(max_tokens)
+        response: ChatResponse = await client.chat(model=self.model, messages=self.messages)
+        self._record_prompt_eval(response)
+        self._add_message(response.message.content, 'assistant')
+        return re.sub(r'<think>.*?</think>', '', response.message.content, flags=re.DOTALL)
+
+def say(bot, name, color, input_data, max_tokens, stream):
+    """
+    Let the bot answer input_data and print the answer
+    """
+    if not stream:
+        r = bot.talk(input_data, max_tokens)
+        print(f"{color}{name}: {r}{bcolors.END}")
+        if bot.verbose:
+            print(bot.last_prompt_eval())
+        return r
+    # Name is printed with the first visible token so the token count stays above it
+    prefix = [f"{color}{name}: "]
+    def on_token(text):
+        print(*prefix, text, sep="", end="", flush=True)
+        prefix.clear()
+    r = bot.talk(input_data, max_tokens, on_token=on_token)
+    print(*prefix, bcolors.END, sep="")
+    # Printed once the reply line has ended, not in the middle of the stream
+    if bot.verbose and bot.last_response is not None:
+        print(bot.last_prompt_eval())
+    if bot.ttft is not None:
+        print(f"Time to first token: {bot.ttft:.2f}s")
+    return r
+
 def debug(bot, name, max_tokens):
     """
     Debug questions until an empty prompt is given
@@ -83,6 +277,8 @@ def interrupt(bot1, bot2, max_tokens):
     while True:
         ans = input("select> ")
         if ans.strip() == "1":
+            print(f"BOT1: {bot1.prompt_eval_summary()}")
+            print(f"BOT2: {bot2.prompt_eval_summary()}")
             sys.exit(0)
         elif ans.strip() == "2":
             debug(bot1, "BOT1", max_tokens)
@@ -102,6 +298,11 @@ def parse_args():
     parser.add_argument('--debug_model2', action='store_true', help="Debug prompt between the responses")
     parser.add_argument("--max_tokens", required=False, default="2048",
                         help="Max tokens. Default 8192")
+    parser.add_argument('--stream', action='store_true', help="Print responses as they are generated")
+    parser.add_argument("--system", required=False, help="System prompt for both bots")
+    parser.add_argument("--low_water", type=float, default=0.5,
+                        help="When max tokens is exceeded trim history down to this fraction of it. "
+                             "1.0 trims one message at a time. Default 0.5")
     args = parser.parse_args()
     return args
 
@@ -109,20 +310,17 @@ if __name__ == "__main__":
     args = parse_args()
     max_tokens = int(args.max_tokens)
     # Initialize bots
-    bot1 = Bot(args.model1)
-    bot2 = Bot(args.model2)
+    bot1 = Bot(args.model1, system=args.system, low_water=args.low_water)
+    bot2 = Bot(args.model2, system=args.system, low_water=args.low_water)
     # Initial promprt for bot1
     start = input("initial prompt> ")
-    r = bot1.talk(start, max_tokens)
-    print(f"{bcolors.BLUE}BOT1: {r}{bcolors.END}")
+    r = say(bot1, "BOT1", bcolors.BLUE, start, max_tokens, args.stream)
     while True:
         try:
-            r = bot2.talk(r,max_tokens)
-            print(f"{bcolors.RED}BOT2: {r}{bcolors.END}")
+            r = say(bot2, "BOT2", bcolors.RED, r, max_tokens, args.stream)
             if args.debug_model2:
                 debug(bot2, "bot2", max_tokens)
-            r = bot1.talk(r,max_tokens)
-            print(f"{bcolors.BLUE}BOT1: {r}{bcolors.END}")
+            r = say(bot1, "BOT1", bcolors.BLUE, r, max_tokens, args.stream)
             if args.debug_model1:
                 debug(bot1, "bot1", max_tokens)
         except KeyboardInterrupt:
@@ -0,0 +1,37 @@
+import os
+import sys
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import batch
+from fake_ollama import FakeOllama
+from bench_trim import local_tokenizer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Aggregate tokens/s of batch.py against a fake Ollama server")
+    parser.add_argument("--conversations", type=int, default=16)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--parallel", type=int, default=4, help="Slots of the fake server, like OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--tokens_per_s", type=float, default=200.0, help="Generation speed of one slot")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = FakeOllama(parallel=args.parallel, tokens_per_s=args.tokens_per_s).start()
+    seeds = [f"Seed prompt number {i}" for i in range(args.conversations)]
+    tokenizer = local_tokenizer()
+    with tempfile.TemporaryDirectory() as tmp:
+        for concurrency in (1, 2, 4, 8):
+            batch_args = batch.parse_args([
+                "--model1", "fake1", "--model2", "fake2", "--prompts_file", "-",
+                "--output", os.path.join(tmp, f"transcripts-{concurrency}.jsonl"),
+                "--concurrency", str(concurrency), "--turns", str(args.turns), "--host", server.url,
+            ])
+            stats = asyncio.run(batch.run_batch(seeds, batch_args, tokenizer))
+            print(f"concurrency {concurrency}: {stats['turns']} turns in {stats['seconds']:.2f}s, "
+                  f"{stats['tokens_per_s']:.1f} tokens/s, {stats['errors']} errors")
+    server.shutdown()
@@ -0,0 +1,37 @@
+import os
+import sys
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import batch
+from fake_ollama import FakeOllama
+from bench_trim import local_tokenizer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Prompt tokens evaluated with different trimming low water marks")
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--max_tokens", type=int, default=512)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    tokenizer = local_tokenizer()
+    with tempfile.TemporaryDirectory() as tmp:
+        for low_water in (1.0, 0.75, 0.5):
+            # Fresh server so every run starts with an empty prompt cache
+            server = FakeOllama(parallel=2, tokens_per_s=100000).start()
+            batch_args = batch.parse_args([
+                "--model1", "fake1", "--model2", "fake2", "--prompts_file", "-",
+                "--output", os.path.join(tmp, "transcripts.jsonl"), "--concurrency", "1",
+                "--turns", str(args.turns), "--max_tokens", str(args.max_tokens),
+                "--low_water", str(low_water), "--system", "You are a friendly chatbot", "--host", server.url,
+            ])
+            stats = asyncio.run(batch.run_batch(["Start casual conversation about anything"], batch_args, tokenizer))
+            print(f"low_water {low_water}: {stats['prompt_eval_count']} prompt tokens evaluated "
+                  f"({stats['prompt_eval_count'] / stats['turns']:.1f}/turn), "
+                  f"{stats['prompt_eval_duration'] / 1e9:.2f}s at 1ms/token")
+            server.shutdown()
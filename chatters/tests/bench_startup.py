@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from bench_trim import local_tokenizer
+
+CHATTERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Start up the way chatbot.py does before the first prompt is sent: import, two bots, first token count
+LEGACY = """
+from tokenizers import Tokenizer
+import chatbot
+t1 = Tokenizer.from_pretrained("gpt2")
+t2 = Tokenizer.from_pretrained("gpt2")
+t1.encode("initial prompt")
+"""
+REGISTRY = """
+import chatbot
+bot1 = chatbot.Bot("{model}")
+bot2 = chatbot.Bot("{model}")
+bot1.verbose = False
+bot1._add_message("initial prompt", "user")
+bot1._trim_conversation(2048)
+"""
+
+
+def measure(code, env, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], cwd=CHATTERS_DIR, env=env, capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            return timings[-1], result.stderr.strip().splitlines()[-1]
+    return statistics.median(timings), None
+
+
+def report(name, seconds, error):
+    if error:
+        print(f"{name}: failed after {seconds:.3f}s: {error}")
+    else:
+        print(f"{name}: {seconds:.3f}s")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cold start time of chatbot.py up to the first token count")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--model", default="dolphin-mistral", help="Model name, decides the tokenizer family")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    env = dict(os.environ)
+    report("from_pretrained per bot", *measure(LEGACY, env, args.repeat))
+    with tempfile.TemporaryDirectory() as tmp:
+        # Local tokenizer in an empty cache directory so this part works offline
+        local_tokenizer().save(os.path.join(tmp, "gpt2.json"))
+        env["CHATTERS_TOKENIZER_DIR"] = tmp
+        report("shared registry, cached file", *measure(REGISTRY.format(model=args.model), env, args.repeat))
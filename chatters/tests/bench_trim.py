@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import argparse
+import contextlib
+import io
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+from tokenizers.trainers import WordLevelTrainer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from chatbot import Bot
+
+SAMPLE = ("The quick brown fox jumps over the lazy dog while the bots keep talking "
+          "about anything they feel like, sometimes at length and sometimes briefly. ")
+
+
+def local_tokenizer():
+    """Small word level tokenizer so the benchmark runs without the Hugging Face hub"""
+    tokenizer = Tokenizer(WordLevel(unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.train_from_iterator([SAMPLE], WordLevelTrainer(special_tokens=["[UNK]"]))
+    return tokenizer
+
+
+def legacy_trim(bot, max_tokens):
+    """The old implementation that re-tokenized the whole history on every turn"""
+    token_count = sum(bot._count_tokens(msg['content']) for msg in bot.messages)
+    while token_count > max_tokens:
+        bot.messages.pop(0)
+        token_count = sum(bot._count_tokens(msg['content']) for msg in bot.messages)
+
+
+def run(trim, turns, max_tokens, window):
+    bot = Bot("bench", tokenizer=local_tokenizer())
+    timings = []
+    for turn in range(turns):
+        # One user message and one assistant reply per turn like Bot.talk does
+        bot._add_message(SAMPLE * (1 + turn % 5), 'user')
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            trim(bot, max_tokens)
+        timings.append(time.perf_counter() - start)
+        bot._add_message(SAMPLE * (1 + turn % 3), 'assistant')
+    for i in range(0, turns, window):
+        part = timings[i:i + window]
+        print(f"  turns {i:5d}-{i + len(part) - 1:5d}: {sum(part) / len(part) * 1e6:9.1f} us/turn")
+    return sum(timings)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Per-turn cost of Bot._trim_conversation")
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--max_tokens", type=int, default=2048)
+    parser.add_argument("--window", type=int, default=250, help="Turns per reported average")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print("incremental:")
+    total = run(Bot._trim_conversation, args.turns, args.max_tokens, args.window)
+    print(f"  total {total:.3f}s")
+    print("legacy:")
+    total = run(legacy_trim, args.turns, args.max_tokens, args.window)
+    print(f"  total {total:.3f}s")
@@ -0,0 +1,70 @@
+import os
+import re
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import chatbot
+from chatbot import Bot, ThinkFilter
+
+REPLIES = [
+    "Hello there",
+    "<think>reasoning</think>\n\nThe answer is 42",
+    "<think>a</think>one<think>b</think>two",
+    "<think>never closed",
+    "a < b and b <th c",
+    "ends with a partial <thi",
+    "ends with a partial tag <",
+    "<",
+    "<think></think>",
+    "<think>x</think>",
+    "",
+]
+
+
+def expected(reply):
+    # A block without </think> hides the rest of the reply while streaming
+    return re.sub(r'<think>.*?(</think>|$)', '', reply, flags=re.DOTALL)
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def splits(text):
+    """Every split of text into chunks of one size and into two chunks at every offset"""
+    for size in range(1, max(len(text), 1) + 1):
+        yield chunked(text, size)
+    for i in range(1, len(text)):
+        yield [text[:i], text[i:]]
+
+
+def filtered(chunks):
+    think = ThinkFilter()
+    return ''.join(think.feed(chunk) for chunk in chunks) + think.flush()
+
+
+def streamed(chunks):
+    """Visible text and ttft of Bot._stream_chat with the chunks as the streamed reply"""
+    def fake_chat(model, messages, stream):
+        for chunk in chunks:
+            yield SimpleNamespace(message=SimpleNamespace(content=chunk), done=False)
+    chatbot.chat = fake_chat
+    bot = Bot(model="test")
+    tokens = []
+    reply = bot._stream_chat([], tokens.append)
+    return reply, ''.join(tokens), bot.ttft
+
+
+if __name__ == "__main__":
+    checked = 0
+    for reply in REPLIES:
+        for chunks in splits(reply):
+            visible = filtered(chunks)
+            assert visible == expected(reply), (chunks, visible, expected(reply))
+            whole, tokens, ttft = streamed(chunks)
+            assert whole == reply, (chunks, whole)
+            assert tokens == expected(reply).lstrip(), (chunks, tokens, expected(reply))
+            assert (ttft is not None) == bool(tokens), (chunks, ttft, tokens)
+            checked += 1
+    print(f"ThinkFilter and _stream_chat: {checked} chunkings of {len(REPLIES)} replies OK")
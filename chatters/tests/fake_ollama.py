@@ -0,0 +1,133 @@
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "<think>Let me think about it.</think>\n\nThat is an interesting point, tell me more about it please"
+
+
+class FakeOllama(ThreadingHTTPServer):
+    """
+    Minimal stand-in for the Ollama /api/chat endpoint.
+    Requests wait for one of `parallel` slots like OLLAMA_NUM_PARALLEL and
+    generation takes eval_count / tokens_per_s seconds per request.
+    Like Ollama, every slot remembers its last prompt and reply and only the part
+    of a new prompt after the longest common prefix is counted in prompt_eval_count.
+    Tokens are words.
+    """
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), parallel=4, tokens_per_s=200.0, reply=REPLY):
+        super().__init__(address, Handler)
+        self.slots = threading.Semaphore(parallel)
+        self.tokens_per_s = tokens_per_s
+        self.reply = reply
+        self.requests = 0
+        self.cache_lock = threading.Lock()
+        self.cached = [[] for _ in range(parallel)]
+
+    def prompt_eval(self, tokens, reply):
+        """Number of prompt tokens not covered by a cached prefix. Stores the new prompt in the used slot."""
+        with self.cache_lock:
+            best, best_len = 0, 0
+            for slot, cached in enumerate(self.cached):
+                n = 0
+                for a, b in zip(cached, tokens):
+                    if a != b:
+                        break
+                    n += 1
+                if n > best_len:
+                    best, best_len = slot, n
+            if best_len < len(self.cached[best]) // 2:
+                # Poor match, take the least recently used slot instead of overwriting a good cache
+                best, best_len = 0, 0
+            # Slots are kept in least recently used first order
+            self.cached.pop(best)
+            self.cached.append(tokens + reply)
+        return len(tokens) - best_len
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if self.path != "/api/chat":
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.cache_lock:
+            self.server.requests += 1
+            # Numbered so that no two replies, and no two prompts, are the same
+            reply = f"{self.server.reply} ({self.server.requests})"
+        words = reply.split(" ")
+        tokens = []
+        for m in request['messages']:
+            tokens.append(f"<{m['role']}>")
+            tokens.extend(m['content'].split())
+        prompt_eval_count = self.server.prompt_eval(tokens, ["<assistant>"] + reply.split())
+        with self.server.slots:
+            start = time.perf_counter()
+            if request.get('stream', True):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                for i, word in enumerate(words):
+                    time.sleep(1 / self.server.tokens_per_s)
+                    chunk = word if i == 0 else " " + word
+                    self._write_line(self._message(request, chunk, done=False))
+            else:
+                time.sleep(len(words) / self.server.tokens_per_s)
+            duration = int((time.perf_counter() - start) * 1e9)
+        final = self._message(request, "" if request.get('stream', True) else reply, done=True)
+        final.update({
+            "done_reason": "stop",
+            "total_duration": duration,
+            "prompt_eval_count": prompt_eval_count,
+            "prompt_eval_duration": 1000000 * prompt_eval_count,
+            "eval_count": len(words),
+            "eval_duration": duration,
+        })
+        if request.get('stream', True):
+            self._write_line(final)
+        else:
+            body = json.dumps(final).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def _message(self, request, content, done):
+        return {
+            "model": request['model'],
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": content},
+            "done": done,
+        }
+
+    def _write_line(self, data):
+        self.wfile.write(json.dumps(data).encode() + b"\n")
+        self.wfile.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Ollama server for benchmarks")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--parallel", type=int, default=4, help="Like OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--tokens_per_s", type=float, default=200.0, help="Generation speed of one slot")
+    args = parser.parse_args()
+    server = FakeOllama(("127.0.0.1", args.port), args.parallel, args.tokens_per_s)
+    print(f"Fake Ollama listening on {server.url}")
+    server.serve_forever()
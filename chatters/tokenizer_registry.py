@@ -0,0 +1,57 @@
+import os
+import threading
+from tokenizers import Tokenizer
+
+# Hugging Face repositories with a tokenizer.json for each model family.
+# Model names are matched by prefix, anything else is counted with gpt2.
+FAMILIES = {
+    "llama3": "unsloth/Llama-3.2-1B-Instruct",
+    "deepseek-r1": "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B",
+    "qwen2.5": "Qwen/Qwen2.5-1.5B-Instruct",
+    "gpt2": "gpt2",
+}
+DEFAULT_FAMILY = "gpt2"
+
+# Tokenizer files are looked up as <family>.json from the cache directory before
+# falling back to the Hugging Face hub, so the first run of a family needs network access.
+CACHE_DIR = os.environ.get("CHATTERS_TOKENIZER_DIR", os.path.join(os.path.expanduser("~"), ".cache", "chatters", "tokenizers"))
+
+_tokenizers = {}
+_lock = threading.RLock()
+
+
+def model_family(model):
+    name = model.lower()
+    for family in FAMILIES:
+        if name.startswith(family):
+            return family
+    return DEFAULT_FAMILY
+
+
+def _load(family):
+    filename = f"{family}.json"
+    path = os.path.join(CACHE_DIR, filename)
+    if os.path.isfile(path):
+        return Tokenizer.from_file(path)
+    tokenizer = Tokenizer.from_pretrained(FAMILIES[family])
+    # Save it so the next start does not need the hub
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tokenizer.save(os.path.join(CACHE_DIR, filename))
+    return tokenizer
+
+
+def get_tokenizer(model):
+    """
+    Tokenizer for the model's family. Loaded on first use and shared by every caller in the process.
+    """
+    family = model_family(model)
+    with _lock:
+        if family not in _tokenizers:
+            try:
+                _tokenizers[family] = _load(family)
+            except Exception as e:
+                if family == DEFAULT_FAMILY:
+                    raise
+                print(f"Could not load {family} tokenizer ({e}), counting tokens with {DEFAULT_FAMILY}")
+                _tokenizers[family] = get_tokenizer(DEFAULT_FAMILY)
+        return _tokenizers[family]
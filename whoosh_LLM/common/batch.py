@@ -0,0 +1,65 @@
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .ollama_client import get_client
+
+# Prompts sent to Ollama at once. Ollama answers OLLAMA_NUM_PARALLEL requests
+# per model in parallel (4 by default with enough memory), the rest wait in its queue.
+CONCURRENCY = 4
+
+
+def read_prompts(path):
+    """Prompts of a file, one per line. Empty lines and lines starting with # are skipped."""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def run_batch(prompts, augmented_prompts, generate, output, concurrency=CONCURRENCY):
+    """
+    Answer augmented_prompts with at most concurrency calls of generate(prompt)
+    at once. generate returns (response, cached). One JSON line per prompt is
+    written to the file object output in the order of prompts, as soon as it
+    and the prompts before it are answered, with the timings of the call.
+    Returns a summary of the batch.
+    """
+    start = time.perf_counter()
+
+    def answer(i):
+        started = time.perf_counter()
+        record = {"index": i, "prompt": prompts[i]}
+        try:
+            record["response"], record["cached"] = generate(augmented_prompts[i])
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["queued_ms"] = round((started - start) * 1000, 1)
+        record["llm_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        metrics = get_client().last_metrics()
+        if metrics and not record.get("cached") and "error" not in record:
+            record.update({key: value for key, value in metrics.items() if key != "model"})
+        return record
+
+    summary = {"prompts": len(prompts), "errors": 0, "cached": 0, "llm_seconds": 0.0}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for record in pool.map(answer, range(len(prompts))):
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            summary["errors"] += "error" in record
+            summary["cached"] += bool(record.get("cached"))
+            summary["llm_seconds"] += record["llm_ms"] / 1000
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def format_summary(summary):
+    return (f"Batch: {summary['prompts']} prompts in {summary['seconds']:.1f}s "
+            f"({summary['llm_seconds']:.1f}s of Ollama calls), {summary['cached']} cached, {summary['errors']} failed")
+
+
+def open_output(path):
+    """File object for path, stdout for -. Closing it does not close stdout."""
+    if path == "-":
+        sys.stdout.flush()
+        return open(sys.stdout.fileno(), "w", closefd=False)
+    return open(path, "w")
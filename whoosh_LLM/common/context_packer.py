@@ -0,0 +1,106 @@
+import re
+import math
+
+# Fraction of num_ctx that retrieved documents may use. The rest is left for the
+# question, the prompt template and the answer.
+CONTEXT_FRACTION = 0.75
+
+PROMPT_TEMPLATE = "Context: {context}\n\nQuestion: {prompt}\nAnswer:"
+
+_pieces = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    """
+    Estimate the token count of text without loading a tokenizer. Words of up to
+    four characters count as one token, longer words one per four characters and
+    every punctuation character as one. This errs on the high side for English.
+    """
+    return sum(1 if len(piece) <= 4 else math.ceil(len(piece) / 4) for piece in _pieces.findall(text))
+
+
+def drop_duplicate_fields(doc, fields):
+    """
+    Copy of doc without the fields whose text is already contained in an earlier
+    field of fields, for example an RSS summary cut from the description.
+    """
+    doc = dict(doc)
+    kept = []
+    for field in fields:
+        value = doc.get(field)
+        if not isinstance(value, str):
+            continue
+        text = value.strip().rstrip(".").strip()
+        if any(text in other for other in kept):
+            del doc[field]
+        else:
+            kept.append(value)
+    return doc
+
+
+def pack_context(docs, format_doc, context_size, prompt="", fraction=CONTEXT_FRACTION, count_tokens=estimate_tokens):
+    """
+    Format ranked docs into a context that fits fraction of context_size tokens
+    together with the prompt template and prompt. Docs are taken in order, a doc
+    that does not fit is dropped and smaller ones after it may still be added.
+    Docs with the same text as an included one are dropped as duplicates.
+    Returns the augmented prompt and a report of what was included and dropped.
+    """
+    context, report = _pack(docs, format_doc, context_size, prompt, fraction, count_tokens)
+    return PROMPT_TEMPLATE.format(context=context, prompt=prompt), report
+
+
+def pack_context_batch(docs, format_doc, context_size, prompts, fraction=CONTEXT_FRACTION, count_tokens=estimate_tokens):
+    """
+    Pack one context for several prompts. The context is packed for the longest
+    prompt, so it fits with every prompt, and all augmented prompts start with
+    the same context: Ollama only evaluates it once per slot and reuses it from
+    its prompt cache for the next prompts. Returns the augmented prompts and the report.
+    """
+    longest = max(prompts, key=count_tokens)
+    context, report = _pack(docs, format_doc, context_size, longest, fraction, count_tokens)
+    return [PROMPT_TEMPLATE.format(context=context, prompt=prompt) for prompt in prompts], report
+
+
+def _pack(docs, format_doc, context_size, prompt, fraction, count_tokens):
+    budget = int(context_size * fraction) - count_tokens(PROMPT_TEMPLATE.format(context="", prompt=prompt))
+    parts = []
+    seen = set()
+    report = {"budget": budget, "tokens": 0, "included": 0, "dropped": 0, "duplicates": 0, "dropped_ids": []}
+    for doc in docs:
+        if report["tokens"] >= budget:
+            # Every doc takes at least one token, the rest is dropped without formatting it
+            report["dropped"] += 1
+            report["dropped_ids"].append(doc_id(doc))
+            continue
+        text = format_doc(doc)
+        if text in seen:
+            report["duplicates"] += 1
+            continue
+        tokens = count_tokens(text) + 1
+        if report["tokens"] + tokens > budget:
+            report["dropped"] += 1
+            report["dropped_ids"].append(doc_id(doc))
+            continue
+        seen.add(text)
+        parts.append(text)
+        report["tokens"] += tokens
+        report["included"] += 1
+    context = "\n\n".join(parts) if parts else "No relevant documents found."
+    return context, report
+
+
+def doc_id(doc):
+    if isinstance(doc, dict):
+        return doc.get('id') or doc.get('link') or doc.get('title')
+    return None
+
+
+def format_report(report):
+    line = (f"Context: {report['included']} documents included ({report['tokens']} of {report['budget']} tokens), "
+            f"{report['dropped']} dropped, {report['duplicates']} duplicates removed")
+    if report['dropped_ids']:
+        shown = ", ".join(str(i) for i in report['dropped_ids'][:10])
+        more = len(report['dropped_ids']) - 10
+        line += f"\nDropped: {shown}" + (f" and {more} more" if more > 0 else "")
+    return line
@@ -0,0 +1,94 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .context_packer import estimate_tokens, CONTEXT_FRACTION
+from .batch import CONCURRENCY
+
+MAP_TEMPLATE = ("Summarize what these documents say that helps to answer the question. Keep names, versions, "
+                "CVE ids, dates and links. If nothing is relevant, answer 'Nothing relevant.'\n\n"
+                "Documents:\n{context}\n\nQuestion: {prompt}\nSummary:")
+REDUCE_TEMPLATE = ("These are summaries of different documents. Combine them into one {kind}, keep the details "
+                   "that help to answer the question.\n\nSummaries:\n{context}\n\nQuestion: {prompt}\n{label}:")
+
+
+def partition(texts, budget, keys=None, count_tokens=estimate_tokens):
+    """
+    Split texts into groups of at most budget tokens, in order. A group never
+    holds texts of different keys, so with stable keys (for example the day a
+    document was published) new documents only change the groups of their own
+    key and the other groups, and their cached summaries, stay the same.
+    A text longer than budget is cut to fit.
+    """
+    groups = []
+    group, tokens, key = [], 0, None
+    for i, text in enumerate(texts):
+        size = count_tokens(text) + 1
+        if size > budget:
+            # Tokens are at least four characters apart in the estimate
+            text = text[:budget * 4]
+            size = min(count_tokens(text) + 1, budget)
+        text_key = keys[i] if keys else None
+        if group and (tokens + size > budget or text_key != key):
+            groups.append(group)
+            group, tokens = [], 0
+        group.append(text)
+        tokens += size
+        key = text_key
+    if group:
+        groups.append(group)
+    return groups
+
+
+def map_reduce(docs, format_doc, prompt, generate, context_size, fraction=CONTEXT_FRACTION, concurrency=CONCURRENCY,
+               group_key=None, count_tokens=estimate_tokens):
+    """
+    Answer prompt about more documents than fit into one context. The documents
+    are split into groups that fit fraction of context_size, each group is
+    summarized with respect to the prompt (map, concurrency calls at once) and
+    the summaries are combined in groups that fit the context, level by level,
+    until one call gives the answer (reduce).
+
+    generate(prompt) returns (response, cached). The prompt of a group only
+    depends on its documents and the question, so with a content addressed
+    cache the map results of unchanged groups are reused on the next run.
+    Returns the answer and a report of the calls.
+    """
+    report = {"documents": len(docs), "groups": 0, "levels": 0, "calls": 0, "cached": 0}
+
+    def budget(template, **kwargs):
+        return int(context_size * fraction) - count_tokens(template.format(context="", prompt=prompt, **kwargs))
+
+    def run(prompts):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(generate, prompts))
+        report["calls"] += len(results)
+        report["cached"] += sum(1 for response, cached in results if cached)
+        return [response.strip() for response, cached in results]
+
+    texts = [format_doc(doc) for doc in docs]
+    keys = [group_key(doc) for doc in docs] if group_key else None
+    groups = partition(texts, budget(MAP_TEMPLATE), keys, count_tokens)
+    report["groups"] = len(groups)
+    if groups:
+        summaries = run([MAP_TEMPLATE.format(context="\n\n".join(group), prompt=prompt) for group in groups])
+        report["levels"] = 1
+    else:
+        summaries = ["No relevant documents found."]
+    reduce_budget = budget(REDUCE_TEMPLATE, kind="summary", label="Summary")
+    while True:
+        groups = partition(summaries, reduce_budget, count_tokens=count_tokens)
+        if len(groups) == 1:
+            break
+        if len(groups) == len(summaries):
+            # Every summary fills a context on its own, combine them in pairs
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+        summaries = run([REDUCE_TEMPLATE.format(kind="summary", context="\n\n".join(group), prompt=prompt, label="Summary")
+                         for group in groups])
+        report["levels"] += 1
+    answer = run([REDUCE_TEMPLATE.format(kind="answer", context="\n\n".join(groups[0]), prompt=prompt, label="Answer")])[0]
+    report["levels"] += 1
+    return answer, report
+
+
+def format_map_reduce_report(report):
+    return (f"Map-reduce: {report['documents']} documents in {report['groups']} groups, {report['levels']} levels, "
+            f"{report['calls']} Ollama calls, {report['cached']} from the cache")
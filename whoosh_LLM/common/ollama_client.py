@@ -0,0 +1,119 @@
+import os
+import time
+import threading
+from collections import deque
+
+# How long Ollama keeps a model loaded after a request, Ollama's own default is 5m
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+
+class OllamaClient:
+    """
+    Ollama client shared by the query scripts and the query server. One HTTP
+    connection pool is reused for all requests and every request asks Ollama to
+    keep the model loaded for keep_alive, so only the first request after a long
+    idle time pays for loading the model. warm() loads a model ahead of time.
+
+    Responses are always streamed, so the time to the first token is known. The
+    metrics of the latest call of the current thread are returned by last_metrics().
+    """
+
+    def __init__(self, host=None, keep_alive=KEEP_ALIVE, timeout=None):
+        self.host = host
+        self.keep_alive = keep_alive
+        # Imported here so that format_metrics can be used without the ollama package
+        import ollama
+        self.client = ollama.Client(host=host, timeout=timeout)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.history = deque(maxlen=1000)
+
+    def warm(self, model):
+        """Load model into memory without generating, returns the load time in seconds"""
+        start = time.perf_counter()
+        self.client.generate(model=model, prompt="", keep_alive=self.keep_alive)
+        return time.perf_counter() - start
+
+    def generate(self, model, prompt, options=None, on_token=None):
+        """Response of model to prompt, on_token is called with every piece of text as it arrives"""
+        options = {k: v for k, v in (options or {}).items() if v is not None}
+        start = time.perf_counter()
+        first = None
+        parts = []
+        final = None
+        for part in self.client.generate(model=model, prompt=prompt, options=options,
+                                         keep_alive=self.keep_alive, stream=True):
+            if part["response"]:
+                if first is None:
+                    first = time.perf_counter()
+                parts.append(part["response"])
+                if on_token:
+                    on_token(part["response"])
+            if part["done"]:
+                final = part
+        metrics = call_metrics(model, final, start, first, time.perf_counter())
+        self.local.metrics = metrics
+        with self.lock:
+            self.history.append(metrics)
+        return "".join(parts)
+
+    def last_metrics(self):
+        return getattr(self.local, "metrics", None)
+
+    def stats(self):
+        """Calls, median time to first token and mean token rates per model of the latest calls"""
+        with self.lock:
+            history = list(self.history)
+        result = {}
+        for model in sorted({m["model"] for m in history}):
+            calls = [m for m in history if m["model"] == model]
+            ttft = sorted(m["ttft_ms"] for m in calls if m["ttft_ms"] is not None)
+            prompt_rates = [m["prompt_eval_tps"] for m in calls if m["prompt_eval_tps"]]
+            eval_rates = [m["eval_tps"] for m in calls if m["eval_tps"]]
+            result[model] = {
+                "calls": len(calls),
+                "loads": sum(1 for m in calls if m["load_ms"] > 100),
+                "p50_ttft_ms": ttft[len(ttft) // 2] if ttft else None,
+                "prompt_eval_tps": round(sum(prompt_rates) / len(prompt_rates), 1) if prompt_rates else None,
+                "eval_tps": round(sum(eval_rates) / len(eval_rates), 1) if eval_rates else None,
+            }
+        return result
+
+
+def call_metrics(model, final, start, first, end):
+    """Metrics of one call from the timings of the client and the durations (ns) Ollama reports when done"""
+    final = final or {}
+
+    def rate(count, duration):
+        return round(count / (duration / 1e9), 1) if count and duration else None
+
+    return {
+        "model": model,
+        "ttft_ms": round((first - start) * 1000, 1) if first else None,
+        "total_ms": round((end - start) * 1000, 1),
+        "load_ms": round((final.get("load_duration") or 0) / 1e6, 1),
+        "prompt_eval_tokens": final.get("prompt_eval_count") or 0,
+        "prompt_eval_tps": rate(final.get("prompt_eval_count"), final.get("prompt_eval_duration")),
+        "eval_tokens": final.get("eval_count") or 0,
+        "eval_tps": rate(final.get("eval_count"), final.get("eval_duration")),
+    }
+
+
+def format_metrics(metrics):
+    if not metrics:
+        return "No Ollama metrics"
+    return (f"Ollama {metrics['model']}: first token after {metrics['ttft_ms']}ms, total {metrics['total_ms']}ms, "
+            f"load {metrics['load_ms']}ms, prompt {metrics['prompt_eval_tokens']} tokens at {metrics['prompt_eval_tps']} tokens/s, "
+            f"answer {metrics['eval_tokens']} tokens at {metrics['eval_tps']} tokens/s")
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(host=None):
+    """The OllamaClient of this process for host (default OLLAMA_HOST or localhost)"""
+    with _clients_lock:
+        if host not in _clients:
+            _clients[host] = OllamaClient(host)
+        return _clients[host]
@@ -0,0 +1,113 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Entries older than this are not used
+CACHE_TTL = 7 * 24 * 3600
+# Least recently used entries are evicted above this total response size
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ResponseCache:
+    """
+    SQLite cache of LLM responses keyed on model, options and a hash of the prompt.
+    Each entry records the scope (index directory) and index generation it was
+    answered from. A lookup with a newer generation removes the entries of the
+    old one, so answers are never served from an index that has changed since.
+    Hits, misses and the generation time saved by hits are kept in the database
+    so they add up over cron runs.
+    """
+
+    def __init__(self, path='.llm_cache.sqlite', ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, scope TEXT, generation INTEGER,
+                response TEXT, size INTEGER, seconds REAL, created REAL, last_used REAL) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+            CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value REAL) WITHOUT ROWID;
+        """)
+
+    @staticmethod
+    def key(model, options, prompt):
+        prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()
+        return hashlib.sha256(json.dumps([model, options, prompt_hash], sort_keys=True).encode()).hexdigest()
+
+    def get(self, model, options, prompt, scope=None, generation=None):
+        """Cached response or None"""
+        now = time.time()
+        key = self.key(model, options, prompt)
+        with self.lock, self.conn:
+            if scope is not None:
+                self.conn.execute("DELETE FROM responses WHERE scope = ? AND generation IS NOT ?", (scope, generation))
+            row = self.conn.execute("SELECT response, seconds, created FROM responses WHERE key = ? AND scope IS ?",
+                                    (key, scope)).fetchone()
+            if row is None or now - row[2] > self.ttl:
+                self._count("misses", 1)
+                return None
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._count("hits", 1)
+            self._count("saved_seconds", row[1])
+            return row[0]
+
+    def put(self, model, options, prompt, response, seconds, scope=None, generation=None):
+        """Store a response that took seconds to generate and evict expired and least recently used entries"""
+        now = time.time()
+        size = len(response.encode())
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                              (self.key(model, options, prompt), scope, generation, response, size, seconds, now, now))
+            self.conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+                    self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    total -= size
+                    if total <= self.max_bytes:
+                        break
+
+    def call(self, model, options, prompt, generate, scope=None, generation=None):
+        """
+        Return the cached response or call generate() and cache its result.
+        The second value tells if the response came from the cache.
+        """
+        response = self.get(model, options, prompt, scope, generation)
+        if response is not None:
+            return response, True
+        start = time.perf_counter()
+        response = generate()
+        self.put(model, options, prompt, response, time.perf_counter() - start, scope, generation)
+        return response, False
+
+    def _count(self, name, value):
+        self.conn.execute("INSERT INTO stats VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + ?",
+                          (name, value, value))
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.conn.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        hits = int(counts.get("hits", 0))
+        misses = int(counts.get("misses", 0))
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+            "saved_seconds": round(counts.get("saved_seconds", 0), 1),
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+def format_stats(stats, hit=None):
+    rate = f"{stats['hit_rate']:.0%}" if stats['hit_rate'] is not None else "n/a"
+    result = "" if hit is None else ("hit, " if hit else "miss, ")
+    return (f"Response cache: {result}hit rate {rate} "
+            f"({stats['hits']} of {stats['hits'] + stats['misses']}), {stats['saved_seconds']}s saved")
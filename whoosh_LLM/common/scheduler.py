@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import random
+import traceback
+
+# Failing sources are retried after interval * 2 ** failures, up to this many seconds
+MAX_BACKOFF = 24 * 3600
+
+
+class Source:
+    """
+    A refresh job run every interval seconds. refresh() returns the number of
+    documents it added and raises when the source could not be refreshed.
+    """
+
+    def __init__(self, name, refresh, interval, jitter=0.1, max_backoff=MAX_BACKOFF):
+        self.name = name
+        self.refresh = refresh
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.next_run = None
+        self.failures = 0
+        self.last_attempt = None
+        self.last_success = None
+        self.last_error = None
+        self.last_added = 0
+        self.total_added = 0
+        self.runs = 0
+
+
+class Scheduler:
+    """
+    Runs the refresh of every source on its own interval with jitter, so sources
+    with the same interval do not all hit the network at once, and backs off
+    exponentially while a source fails. Each refresh commits to its index, so
+    queries in other processes keep reading the last committed generation and
+    never wait for fetching or indexing.
+
+    clock, sleep and rand can be replaced, tests use a fake clock whose sleep
+    only moves the time forward. After every run the status of all sources is
+    written as JSON to status_path.
+    """
+
+    def __init__(self, sources, status_path=None, clock=time.time, sleep=time.sleep, rand=random.random):
+        self.sources = sources
+        self.status_path = status_path
+        self.clock = clock
+        self.sleep = sleep
+        self.rand = rand
+        now = self.clock()
+        for source in self.sources:
+            # Spread the first runs over the jitter window
+            source.next_run = now + source.interval * source.jitter * self.rand()
+
+    def delay(self, source):
+        """Seconds until the next run of the source after the current one"""
+        if source.failures:
+            return min(source.interval * 2 ** source.failures, max(source.max_backoff, source.interval))
+        return source.interval * (1 + source.jitter * (2 * self.rand() - 1))
+
+    def run_source(self, source):
+        source.last_attempt = self.clock()
+        source.runs += 1
+        try:
+            added = source.refresh()
+        except Exception as e:
+            source.failures += 1
+            source.last_error = f"{type(e).__name__}: {e}"
+            print(f"Refresh of {source.name} failed ({source.failures} in a row): {source.last_error}")
+            if not isinstance(e, OSError):
+                traceback.print_exc()
+        else:
+            source.failures = 0
+            source.last_success = self.clock()
+            source.last_added = added or 0
+            source.total_added += source.last_added
+        source.next_run = self.clock() + self.delay(source)
+
+    def run_pending(self):
+        """Run the sources that are due and return how many ran"""
+        due = [source for source in self.sources if source.next_run <= self.clock()]
+        for source in sorted(due, key=lambda source: source.next_run):
+            self.run_source(source)
+        if due:
+            self.write_status()
+        return len(due)
+
+    def run(self, until=None):
+        """Run sources when they are due, forever or until the clock reaches until"""
+        while until is None or self.clock() < until:
+            self.run_pending()
+            wake = min(source.next_run for source in self.sources)
+            if until is not None:
+                wake = min(wake, until)
+            self.sleep(max(0, wake - self.clock()))
+
+    def status(self):
+        """Health of every source. lag is the seconds since the last successful refresh."""
+        now = self.clock()
+        result = {}
+        for source in self.sources:
+            if source.failures:
+                health = "failing"
+            elif source.last_success is None:
+                health = "pending"
+            elif now - source.last_success > 2 * source.interval:
+                health = "stale"
+            else:
+                health = "ok"
+            result[source.name] = {
+                "health": health,
+                "interval": source.interval,
+                "runs": source.runs,
+                "failures": source.failures,
+                "last_attempt": source.last_attempt,
+                "last_success": source.last_success,
+                "lag": round(now - source.last_success, 1) if source.last_success is not None else None,
+                "last_error": source.last_error,
+                "last_added": source.last_added,
+                "total_added": source.total_added,
+                "next_run": round(source.next_run, 1),
+            }
+        return result
+
+    def write_status(self):
+        if not self.status_path:
+            return
+        status = {"updated": self.clock(), "sources": self.status()}
+        tmp = self.status_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(status, f, indent=2)
+        os.replace(tmp, self.status_path)
+
+
+def print_status(status_path, clock=time.time):
+    """Print the status file written by a scheduler in another process"""
+    if not os.path.isfile(status_path):
+        print(f"No refresh status in {status_path}, is the scheduler running?")
+        return
+    with open(status_path) as f:
+        status = json.load(f)
+    now = clock()
+    for name, source in status["sources"].items():
+        last = source["last_success"]
+        lag = f"{now - last:.0f}s ago" if last is not None else "never"
+        line = (f"{name}: {source['health']}, last success {lag}, {source['last_added']} documents added "
+                f"({source['total_added']} in total), next run in {max(0, source['next_run'] - now):.0f}s")
+        if source["failures"]:
+            line += f", {source['failures']} failures: {source['last_error']}"
+        print(line)
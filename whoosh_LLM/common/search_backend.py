@@ -0,0 +1,140 @@
+import os
+
+# Backend of the indexes when none is given, whoosh or sqlite
+DEFAULT_BACKEND = os.environ.get("SEARCH_BACKEND", "whoosh")
+BACKENDS = ("whoosh", "sqlite")
+# Constant of reciprocal rank fusion, 60 as in the original paper
+RRF_K = 60
+
+# Field types of a backend schema
+TEXT = "text"
+KEYWORD = "keyword"
+ID = "id"
+INT = "int"
+FLOAT = "float"
+DATETIME = "datetime"
+BOOLEAN = "bool"
+
+
+class Field:
+    """
+    Field of a backend schema. TEXT and KEYWORD fields are searched by words,
+    ID and BOOLEAN fields by their whole value and INT, FLOAT and DATETIME
+    fields also by ranges. A unique field identifies documents for update(),
+    sortable fields can be given to sort_by.
+    """
+
+    def __init__(self, type, stored=True, unique=False, sortable=False):
+        self.type = type
+        self.stored = stored
+        self.unique = unique
+        self.sortable = sortable
+
+    def __repr__(self):
+        return f"Field({self.type!r}, stored={self.stored}, unique={self.unique}, sortable={self.sortable})"
+
+
+class SearchBackend:
+    """
+    Index of documents with a schema, a dict of field names to Fields, stored
+    under path. Documents are dicts of field values.
+
+    writer() returns a writer with add(fields), update(fields) (replaces the
+    documents with the same unique field), delete(field, value),
+    delete_range(field, low, high), commit() and cancel(). Nothing is visible
+    to searchers before commit().
+
+    searcher() returns a searcher with search(query_text, limit, sort_by,
+    reverse, ranges) giving (score, fields) pairs, document(**term),
+    documents(), up_to_date(), refresh() and close(). query_text uses the
+    Whoosh query syntax, words search default_field, "field:word" another
+    field and numeric and date fields take ranges like "score:>=9". None or
+    "all" matches every document. ranges maps fields to inclusive (low, high)
+    bounds, None for an open end.
+    """
+
+    kind = None
+
+    def __init__(self, path, schema, default_field):
+        self.path = path
+        self.schema = schema
+        self.default_field = default_field
+
+    @classmethod
+    def exists(cls, path):
+        raise NotImplementedError
+
+    def field_names(self):
+        """Fields of the index on disk, which may be from an older schema"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Create the index again, empty and with the current schema"""
+        raise NotImplementedError
+
+    def doc_count(self):
+        raise NotImplementedError
+
+    def generation(self):
+        """Number that changes with every commit"""
+        raise NotImplementedError
+
+    def writer(self, **options):
+        raise NotImplementedError
+
+    def searcher(self):
+        raise NotImplementedError
+
+    def search(self, query_text, limit=10, sort_by=None, reverse=False, ranges=None):
+        with self.searcher() as searcher:
+            return searcher.search(query_text, limit, sort_by, reverse, ranges)
+
+    def close(self):
+        pass
+
+
+class Searcher:
+    """Base of the searchers, closed at the end of a with block"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+
+def backend_class(kind):
+    # Imported here so that one backend can be used without the dependencies of the other
+    if kind == "whoosh":
+        from .whoosh_backend import WhooshBackend
+        return WhooshBackend
+    if kind == "sqlite":
+        from .sqlite_backend import SqliteBackend
+        return SqliteBackend
+    raise ValueError(f"Unknown search backend {kind}, use one of {', '.join(BACKENDS)}")
+
+
+def backend_exists(kind, path):
+    """True if path holds an index of the backend"""
+    return backend_class(kind or DEFAULT_BACKEND).exists(path)
+
+
+def open_backend(kind, path, schema, default_field):
+    """The index of the backend kind (default DEFAULT_BACKEND) in the directory path, created if missing"""
+    return backend_class(kind or DEFAULT_BACKEND)(path, schema, default_field)
+
+
+def rrf(rankings, k=RRF_K):
+    """
+    Ids of several rankings ordered by reciprocal rank fusion, sum of 1 / (k + rank).
+    Rankings of different indexes can be merged this way, their scores can not be compared.
+    Ties keep the order of the rankings.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, id in enumerate(ranking):
+            scores[id] = scores.get(id, 0) + 1 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,378 @@
+import os
+import re
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+from .search_backend import SearchBackend, Searcher, TEXT, KEYWORD, ID, INT, FLOAT, DATETIME, BOOLEAN
+
+# Words of TEXT and KEYWORD fields are indexed by FTS5, the other fields are columns of the docs table
+FTS_TYPES = (TEXT, KEYWORD)
+SQL_TYPES = {ID: "TEXT", INT: "INTEGER", FLOAT: "REAL", DATETIME: "TEXT", BOOLEAN: "INTEGER"}
+# Fixed width, so that stored dates compare as strings
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+# A clause of the query syntax: an operator, a parenthesis or an optionally
+# field qualified word, quoted phrase or [low TO high] range
+_clause = re.compile(r'\s*(?:(\(|\))|(?:(\w+):)?("[^"]*"|\[[^\]]*\]|[^\s()]+))')
+_comparison = re.compile(r'^(>=|<=|>|<)?(.+)$')
+_true = {"true", "yes", "1", "t", "y"}
+
+
+def format_date(value):
+    return value.strftime(DATE_FORMAT)
+
+
+def parse_date(text):
+    """First and last moment of a date like 2025, 202501, 20250105, 2025-01-05 or 2025-01-05 12:30"""
+    digits = re.sub(r"\D", "", text)
+    if len(digits) not in (4, 6, 8, 10, 12, 14):
+        raise ValueError(f"Cannot parse the date {text}")
+    parts = [int(digits[:4])] + [int(digits[i:i + 2]) for i in range(4, len(digits), 2)]
+    start = datetime(*(parts + [1, 1])[:max(3, len(parts))])
+    if len(parts) == 1:
+        end = start.replace(year=start.year + 1)
+    elif len(parts) == 2:
+        end = (start + timedelta(days=32)).replace(day=1)
+    else:
+        end = start + [timedelta(days=1), timedelta(hours=1), timedelta(minutes=1), timedelta(seconds=1)][len(parts) - 3]
+    return start, end - timedelta(microseconds=1)
+
+
+def fts_string(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+class SqliteBackend(SearchBackend):
+    """
+    SQLite index in the file index.sqlite of the directory path. Words are
+    searched in an FTS5 table and ranked by BM25, the other fields are columns
+    of a docs table with the same rowid, filtered and sorted in SQL.
+
+    The Whoosh query syntax is translated to FTS5 with a few limits: fields
+    that are not searched by words (ranges, ids and booleans) are filters that
+    can only be combined with AND, and a query cannot start with NOT.
+    """
+
+    kind = "sqlite"
+
+    def __init__(self, path, schema, default_field):
+        super().__init__(path, schema, default_field)
+        os.makedirs(path, exist_ok=True)
+        self.directory = path
+        self.path = os.path.join(path, "index.sqlite")
+        self.fts_fields = [name for name, field in schema.items() if field.type in FTS_TYPES]
+        self.sql_fields = [name for name, field in schema.items() if field.type not in FTS_TYPES]
+        self.conn = self.connect()
+        if not self.field_names():
+            self.create()
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(os.path.join(path, "index.sqlite"))
+
+    def connect(self):
+        # Searchers may be used from the request threads of the query server, one at a time
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        # Searches in other processes read the last commit while a writer is open
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def create(self):
+        columns = "".join(f", {name} {SQL_TYPES[self.schema[name].type]}" for name in self.sql_fields)
+        statements = [
+            "DROP TABLE IF EXISTS docs", "DROP TABLE IF EXISTS fts", "DROP TABLE IF EXISTS meta",
+            "CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT)",
+            f"CREATE TABLE docs (rowid INTEGER PRIMARY KEY{columns})",
+            f"CREATE VIRTUAL TABLE fts USING fts5({', '.join(self.fts_fields)})",
+        ]
+        for name in self.sql_fields:
+            field = self.schema[name]
+            # Unique fields are looked up by update(), ids by delete() and sortable fields by sort_by
+            if field.unique or field.sortable or field.type == ID:
+                unique = "UNIQUE " if field.unique else ""
+                statements.append(f"CREATE {unique}INDEX docs_{name} ON docs ({name})")
+        self.conn.execute("BEGIN IMMEDIATE")
+        for statement in statements:
+            self.conn.execute(statement)
+        self.conn.executemany("INSERT INTO meta (name, value) VALUES (?, ?)",
+                              [("fields", json.dumps(list(self.schema))), ("generation", "1")])
+        self.conn.execute("COMMIT")
+
+    def field_names(self):
+        try:
+            row = self.conn.execute("SELECT value FROM meta WHERE name = 'fields'").fetchone()
+        except sqlite3.OperationalError:
+            return []
+        return json.loads(row[0]) if row else []
+
+    def clear(self):
+        self.create()
+
+    def doc_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def generation(self):
+        return read_generation(self.conn)
+
+    def writer(self, **options):
+        """options of the Whoosh writer (procs, limitmb) are ignored"""
+        return SqliteWriter(self)
+
+    def searcher(self):
+        return SqliteSearcher(self)
+
+    def close(self):
+        self.conn.close()
+
+    def to_sql(self, name, value):
+        kind = self.schema[name].type
+        if value is None:
+            return None
+        if kind == DATETIME:
+            return format_date(value)
+        if kind == BOOLEAN:
+            return int(bool(value))
+        return value
+
+    def from_row(self, row, names):
+        fields = {}
+        for name, value in zip(names, row):
+            field = self.schema[name]
+            if value is None or not field.stored:
+                continue
+            if field.type == DATETIME:
+                value = datetime.strptime(value, DATE_FORMAT)
+            elif field.type == BOOLEAN:
+                value = bool(value)
+            fields[name] = value
+        return fields
+
+    def compile(self, query_text, ranges=None):
+        """FTS5 match expression (None for none) and SQL conditions with their parameters of a query"""
+        conditions = []
+        params = []
+        for name, (low, high) in (ranges or {}).items():
+            if low is not None:
+                conditions.append(f"docs.{name} >= ?")
+                params.append(self.to_sql(name, low))
+            if high is not None:
+                conditions.append(f"docs.{name} <= ?")
+                params.append(self.to_sql(name, high))
+        if query_text is None or query_text.strip().lower() in ("all", ""):
+            return None, conditions, params
+        parts = []
+        pos = 0
+        query_text = query_text.strip()
+        while pos < len(query_text):
+            match = _clause.match(query_text, pos)
+            if not match or match.end() == pos:
+                raise ValueError(f"Cannot parse the query {query_text!r} at {query_text[pos:]!r}")
+            pos = match.end()
+            paren, name, value = match.groups()
+            if paren:
+                parts.append(paren)
+            elif name is None and value in ("AND", "OR", "NOT"):
+                parts.append(value)
+            else:
+                if name not in self.schema:
+                    # Like Whoosh, a word with a colon that is not a field is searched as it is
+                    value = f"{name}:{value}" if name else value
+                    name = self.default_field
+                if self.schema[name].type in FTS_TYPES:
+                    parts.append(self.fts_term(name, value))
+                else:
+                    condition, values = self.condition(name, value)
+                    conditions.append(condition)
+                    params.extend(values)
+                    parts.append(None)
+        # Filters are taken out of the expression, they must not be operands of OR or NOT
+        for i, part in enumerate(parts):
+            if part is None and (parts[i - 1:i] in (["OR"], ["NOT"]) or parts[i + 1:i + 2] == ["OR"]
+                                 or "(" in parts[:i] and ")" in parts[i:]):
+                raise ValueError(f"Filters on {', '.join(self.sql_fields)} can only be combined with AND")
+        parts = [part for part in parts if part is not None]
+        # Operators left dangling by removed filters
+        while parts and parts[0] in ("AND", "OR"):
+            parts.pop(0)
+        while parts and parts[-1] in ("AND", "OR", "NOT"):
+            parts.pop()
+        expression = " ".join(parts)
+        if not expression:
+            return None, conditions, params
+        if expression.startswith("NOT "):
+            raise ValueError(f"The query {query_text!r} cannot start with NOT in the sqlite backend")
+        return expression, conditions, params
+
+    def fts_term(self, name, value):
+        if value.startswith('"'):
+            term = fts_string(value.strip('"'))
+        elif value.endswith("*") and len(value) > 1:
+            term = fts_string(value.rstrip("*")) + " *"
+        else:
+            term = fts_string(value)
+        return f"{name} : {term}"
+
+    def condition(self, name, value):
+        """SQL condition and parameters of a value, comparison or [low TO high] range of a column"""
+        kind = self.schema[name].type
+        column = f"docs.{name}"
+        if kind in (ID, BOOLEAN):
+            value = value.strip('"')
+            if kind == BOOLEAN:
+                return f"{column} = ?", [int(value.lower() in _true)]
+            return f"{column} = ?", [value]
+        if value.startswith("["):
+            low, _, high = value[1:-1].partition(" TO ")
+            conditions, params = [], []
+            if low.strip():
+                conditions.append(f"{column} >= ?")
+                params.append(self.bound(kind, low.strip(), first=True))
+            if high.strip():
+                conditions.append(f"{column} <= ?")
+                params.append(self.bound(kind, high.strip(), first=False))
+            return " AND ".join(conditions) or "1", params
+        op, operand = _comparison.match(value.strip('"')).groups()
+        if kind == DATETIME:
+            start, end = parse_date(operand)
+            start, end = format_date(start), format_date(end)
+            if op is None:
+                return f"{column} BETWEEN ? AND ?", [start, end]
+            # Like Whoosh, a date is the whole period it names, also for > and <
+            if op in ("<", "<="):
+                return f"{column} <= ?", [end]
+            return f"{column} >= ?", [start]
+        number = int(operand) if kind == INT and re.fullmatch(r"-?\d+", operand) else float(operand)
+        return f"{column} {op or '='} ?", [number]
+
+    def bound(self, kind, text, first):
+        if kind == DATETIME:
+            return format_date(parse_date(text)[0 if first else 1])
+        return float(text)
+
+
+def read_generation(conn):
+    row = conn.execute("SELECT value FROM meta WHERE name = 'generation'").fetchone()
+    return int(row[0]) if row else None
+
+
+class SqliteWriter:
+    """Changes in one transaction, the index is locked for other writers until commit() or cancel()"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.conn = backend.connect()
+        self.conn.execute("BEGIN IMMEDIATE")
+        names = backend.sql_fields
+        self.insert_doc = f"INSERT INTO docs ({', '.join(['rowid'] + names)}) VALUES ({', '.join('?' * (len(names) + 1))})"
+        names = backend.fts_fields
+        self.insert_fts = f"INSERT INTO fts ({', '.join(['rowid'] + names)}) VALUES ({', '.join('?' * (len(names) + 1))})"
+        self.rowid = self.conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM docs").fetchone()[0]
+        self.unique = next((name for name, field in backend.schema.items() if field.unique), None)
+
+    def add(self, fields):
+        backend = self.backend
+        for name in fields:
+            if name not in backend.schema:
+                raise ValueError(f"Unknown field {name}")
+        self.rowid += 1
+        self.conn.execute(self.insert_doc, [self.rowid] + [backend.to_sql(name, fields.get(name))
+                                                           for name in backend.sql_fields])
+        self.conn.execute(self.insert_fts, [self.rowid] + [fields.get(name) for name in backend.fts_fields])
+
+    def update(self, fields):
+        if self.unique is None:
+            raise ValueError("The schema has no unique field to update by")
+        self.delete(self.unique, fields[self.unique])
+        self.add(fields)
+
+    def delete_rows(self, where, params):
+        rowids = [(rowid,) for rowid, in self.conn.execute(f"SELECT rowid FROM docs WHERE {where}", params)]
+        self.conn.executemany("DELETE FROM docs WHERE rowid = ?", rowids)
+        self.conn.executemany("DELETE FROM fts WHERE rowid = ?", rowids)
+
+    def delete(self, field, value):
+        if field not in self.backend.sql_fields:
+            raise ValueError(f"Documents can only be deleted by {', '.join(self.backend.sql_fields)}")
+        self.delete_rows(f"{field} = ?", [self.backend.to_sql(field, value)])
+
+    def delete_range(self, field, low, high):
+        _, conditions, params = self.backend.compile(None, {field: (low, high)})
+        self.delete_rows(" AND ".join(conditions) or "1", params)
+
+    def commit(self):
+        self.conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'generation'")
+        self.conn.execute("COMMIT")
+        self.conn.close()
+
+    def cancel(self):
+        self.conn.execute("ROLLBACK")
+        self.conn.close()
+
+
+class SqliteSearcher(Searcher):
+    """Searches on a connection of its own, they see every commit"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.conn = backend.connect()
+        self.seen = read_generation(self.conn)
+        stored = [name for name in backend.schema if backend.schema[name].stored]
+        self.names = stored
+        self.columns = ", ".join(f"{'fts' if name in backend.fts_fields else 'docs'}.{name}" for name in stored)
+
+    def search(self, query_text, limit=10, sort_by=None, reverse=False, ranges=None):
+        expression, conditions, params = self.backend.compile(query_text, ranges)
+        if expression:
+            conditions.insert(0, "fts MATCH ?")
+            params.insert(0, expression)
+            score = "-bm25(fts)"
+        else:
+            score = "1.0"
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        if sort_by:
+            # NULL sorts below every value, like the default 0 of Whoosh below the
+            # scores, ranks and dates here. A plain column can be read from its index.
+            direction = "DESC" if reverse else "ASC"
+            order = f"docs.{sort_by} {direction}, docs.rowid {direction}"
+        elif expression:
+            order = "bm25(fts), docs.rowid"
+        else:
+            order = "docs.rowid"
+        # Without a match the docs table leads, so that its indexes serve the filters and the sort
+        tables = "fts JOIN docs" if expression else "docs CROSS JOIN fts"
+        sql = (f"SELECT {score}, {self.columns} FROM {tables} ON fts.rowid = docs.rowid {where} "
+               f"ORDER BY {order}")
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        try:
+            rows = self.conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            # Syntax errors of the FTS5 expression
+            raise ValueError(f"Cannot search {query_text!r}: {e}") from e
+        return [(row[0], self.backend.from_row(row[1:], self.names)) for row in rows]
+
+    def document(self, **term):
+        (name, value), = term.items()
+        row = self.conn.execute(f"SELECT {self.columns} FROM docs CROSS JOIN fts ON fts.rowid = docs.rowid "
+                                f"WHERE docs.{name} = ? LIMIT 1", [self.backend.to_sql(name, value)]).fetchone()
+        return self.backend.from_row(row, self.names) if row else None
+
+    def documents(self):
+        for row in self.conn.execute(f"SELECT {self.columns} FROM docs CROSS JOIN fts ON fts.rowid = docs.rowid "
+                                     f"ORDER BY docs.rowid"):
+            yield self.backend.from_row(row, self.names)
+
+    def up_to_date(self):
+        return read_generation(self.conn) == self.seen
+
+    def refresh(self):
+        self.seen = read_generation(self.conn)
+        return self
+
+    def generation(self):
+        return self.seen
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, os.path.join(base_dir, "cve_indexer"))
+sys.path.insert(0, os.path.join(base_dir, "doc_indexer"))
+sys.path.insert(0, base_dir)
+import cve_query
+from engine import engine
+from common.search_backend import open_backend, BACKENDS
+
+WORDS = ("remote attacker execute arbitrary code crafted request buffer overflow memory corruption privilege "
+         "escalation authentication bypass injection cross site scripting denial service kernel driver firmware "
+         "router vpn gateway plugin library parser heap stack null pointer dereference").split()
+PRODUCTS = ["openssl", "nginx", "apache", "linux", "chrome", "firefox", "exchange", "fortios", "ivanti", "jenkins"]
+SEVERITIES = [(3.1, "LOW", 1), (5.4, "MEDIUM", 2), (7.5, "HIGH", 3), (9.8, "CRITICAL", 4)]
+
+CVE_QUERIES = [
+    ("word", "overflow", {}),
+    ("two words", "openssl overflow", {}),
+    ("phrase", '"remote attacker"', {}),
+    ("word and range", "router score:>=7", {}),
+    ("range by score", "score:>=9", {"sort_by": "score", "reverse": True}),
+    ("date range", "published:>20250601", {}),
+    ("all by published", "all", {"sort_by": "published", "reverse": True}),
+]
+DOC_QUERIES = [
+    ("word", "firmware", {}),
+    ("two words", "kernel driver", {}),
+    ("OR", "vpn OR gateway", {}),
+]
+
+
+def cve_docs(count, rng):
+    start = datetime(2025, 1, 1)
+    for i in range(count):
+        score, severity, rank = rng.choice(SEVERITIES)
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(15, 40)))
+        published = start + timedelta(minutes=rng.randrange(365 * 24 * 60))
+        yield dict(id=f"CVE-2025-{i:06d}", description=f"{rng.choice(PRODUCTS)} {words}", score=score,
+                   vector="CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H", cwe=f"CWE-{rng.randint(20, 900)}",
+                   severity=severity, severity_rank=rank, published=published, modified=published + timedelta(days=3),
+                   exploited=rng.random() < 0.05)
+
+
+def chunk_docs(count, rng):
+    for i in range(count):
+        path = f"/docs/dir{i % 50}/doc{i // 20}.txt"
+        yield dict(title=f"doc{i // 20}", path=path, content=" ".join(rng.choice(WORDS) for _ in range(100)),
+                   chunk=f"{path}#{i % 20}")
+
+
+def size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, dirs, files in os.walk(path) for name in files)
+
+
+def bench(kind, path, schema, default_field, docs, updates, queries, repeat):
+    ix = open_backend(kind, path, schema, default_field)
+    start = time.perf_counter()
+    writer = ix.writer()
+    for doc in docs:
+        writer.add(doc)
+    writer.commit()
+    elapsed = time.perf_counter() - start
+    print(f"  {kind:6s} bulk write: {len(docs) / elapsed:8.0f} docs/s, {size(path) / 1e6:.1f} MB on disk")
+    if updates:
+        start = time.perf_counter()
+        writer = ix.writer()
+        for doc in updates:
+            writer.update(doc)
+        writer.commit()
+        print(f"  {kind:6s} update by id: {len(updates) / (time.perf_counter() - start):6.0f} docs/s")
+    total = 0
+    with ix.searcher() as searcher:
+        for name, query_text, kwargs in queries:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                hits = searcher.search(query_text, limit=10, **kwargs)
+                timings.append(time.perf_counter() - start)
+            total += sum(timings)
+            print(f"  {kind:6s} {name:17s} {statistics.median(timings) * 1000:7.2f} ms, {len(hits)} hits, "
+                  f"top {hits[0][1].get('id', hits[0][1].get('chunk')) if hits else None}")
+    print(f"  {kind:6s} query throughput: {len(queries) * repeat / total:.0f} queries/s")
+    ix.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indexing and query throughput of the Whoosh and the SQLite FTS5 backend")
+    parser.add_argument("--cves", type=int, default=50000)
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--updates", type=int, default=1000, help="CVEs updated by id after the bulk write")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs of every query")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    args = parser.parse_args()
+    cves = list(cve_docs(args.cves, random.Random(1)))
+    updates = [dict(doc, description=doc["description"] + " updated") for doc in random.Random(2).sample(cves, args.updates)]
+    chunks = list(chunk_docs(args.chunks, random.Random(3)))
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{args.cves} CVEs (cve_query schema):")
+        for kind in args.backends:
+            bench(kind, os.path.join(tmp, "cve_" + kind), cve_query.schema, "description", cves, updates, CVE_QUERIES,
+                  args.repeat)
+        print(f"{args.chunks} document chunks (doc_indexer schema):")
+        for kind in args.backends:
+            bench(kind, os.path.join(tmp, "doc_" + kind), engine.schema, "content", chunks, [], DOC_QUERIES, args.repeat)
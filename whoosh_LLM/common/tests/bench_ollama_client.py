@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+import argparse
+
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(tests_dir, '..', '..'))
+from langchain_ollama import OllamaLLM
+from fake_ollama import FakeOllama
+from common.ollama_client import OllamaClient
+
+MODEL = "llama3.2:3b"
+
+
+def run(name, server, call, calls, idle):
+    """Mean latency of calls separated by idle seconds, and the connections and model loads they caused"""
+    connections = server.connections
+    latencies = []
+    for i in range(calls):
+        if i:
+            time.sleep(idle)
+        start = time.perf_counter()
+        call(f"Question {i}: which CVEs affect routers?")
+        latencies.append(time.perf_counter() - start)
+    print(f"  {name}: mean {sum(latencies) / calls * 1000:.0f}ms, first {latencies[0] * 1000:.0f}ms, "
+          f"max {max(latencies) * 1000:.0f}ms, {server.connections - connections} new connections")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="New OllamaLLM per call against the shared, warmed client, on a fake Ollama")
+    parser.add_argument("--calls", type=int, default=5)
+    parser.add_argument("--idle", type=float, default=3.0, help="Seconds between calls")
+    parser.add_argument("--load_time", type=float, default=1.0, help="Seconds the fake Ollama takes to load the model")
+    parser.add_argument("--server_keep_alive", type=float, default=2.0,
+                        help="keep_alive of the fake Ollama when the client sends none, stands in for Ollama's 5 minutes")
+    args = parser.parse_args()
+    print(f"{args.calls} calls {args.idle}s apart, model load {args.load_time}s, server keep_alive {args.server_keep_alive}s")
+
+    server = FakeOllama(load_time=args.load_time, keep_alive=args.server_keep_alive).start()
+    run("new OllamaLLM per call", server,
+        lambda prompt: OllamaLLM(model=MODEL, base_url=server.url, num_ctx=2048).invoke(prompt), args.calls, args.idle)
+    server.shutdown()
+
+    server = FakeOllama(load_time=args.load_time, keep_alive=args.server_keep_alive).start()
+    client = OllamaClient(server.url, keep_alive="30m")
+    print(f"  warm-up at startup: {client.warm(MODEL) * 1000:.0f}ms")
+    run("shared client, keep_alive 30m", server,
+        lambda prompt: client.generate(MODEL, prompt, {"num_ctx": 2048}), args.calls, args.idle)
+    stats = client.stats()[MODEL]
+    print(f"  time to first token p50 {stats['p50_ttft_ms']}ms, prompt {stats['prompt_eval_tps']} tokens/s, "
+          f"answer {stats['eval_tps']} tokens/s, {stats['loads']} model loads")
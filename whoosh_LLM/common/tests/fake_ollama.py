@@ -0,0 +1,208 @@
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def parse_keep_alive(value, default):
+    """Seconds of an Ollama keep_alive value such as 300, "5m", "30s" or -1 (forever)"""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    value = value.strip()
+    if value.startswith("-"):
+        return float("inf")
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    for unit in ("ms", "s", "m", "h"):
+        if value.endswith(unit):
+            return float(value[:-len(unit)]) * units[unit]
+    return float(value)
+
+
+class FakeOllama(ThreadingHTTPServer):
+    """
+    Local stand-in for Ollama's /api/generate. A model that is not loaded, or
+    whose keep_alive has run out, takes load_time seconds to load. The prompt is
+    read at prompt_tps tokens (words) per second and the answer is streamed at
+    eval_tps tokens per second, answer_tokens long unless num_predict is set.
+    With ctx_scale, reading a token gets slower the further into the context it
+    is, like attention on a CPU: token n costs (1 + n / ctx_scale) / prompt_tps.
+    Only parallel requests are processed at once, like OLLAMA_NUM_PARALLEL. Each
+    slot keeps the tokens of its last prompt and, like Ollama's prompt cache, a
+    request only evaluates the tokens after the prefix it shares with them.
+    Answers are deterministic: the same prompt always gets the same answer.
+    The server records every request as (model, prompt) and counts connections.
+    """
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), load_time=1.0, prompt_tps=500.0, eval_tps=50.0,
+                 answer_tokens=20, keep_alive=300.0, parallel=1, ctx_scale=None):
+        super().__init__(address, Handler)
+        self.load_time = load_time
+        self.prompt_tps = prompt_tps
+        self.eval_tps = eval_tps
+        self.answer_tokens = answer_tokens
+        self.ctx_scale = ctx_scale
+        self.keep_alive = keep_alive
+        self.free = threading.Semaphore(parallel)
+        self.slots = [[] for _ in range(parallel)]
+        self.busy = [False] * parallel
+        self.lock = threading.Lock()
+        self.loaded = {}
+        self.log = []
+        self.connections = 0
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def load(self, model, keep_alive):
+        """Seconds spent loading model, 0 if it was still loaded"""
+        with self.lock:
+            loaded = self.loaded.get(model, 0) > time.monotonic()
+        seconds = 0.0 if loaded else self.load_time
+        time.sleep(seconds)
+        with self.lock:
+            self.loaded[model] = time.monotonic() + parse_keep_alive(keep_alive, self.keep_alive)
+        return seconds
+
+    def prompt_seconds(self, shared, total):
+        """Seconds to evaluate the prompt tokens from shared to total"""
+        seconds = (total - shared) / self.prompt_tps
+        if self.ctx_scale:
+            seconds += (total ** 2 - shared ** 2) / (2 * self.ctx_scale * self.prompt_tps)
+        return seconds
+
+    def take_slot(self, tokens):
+        """Free slot whose cached prompt shares the longest prefix with tokens, and the length of that prefix"""
+        self.free.acquire()
+        with self.lock:
+            best, shared = None, -1
+            for i, cached in enumerate(self.slots):
+                if self.busy[i]:
+                    continue
+                n = 0
+                for a, b in zip(cached, tokens):
+                    if a != b:
+                        break
+                    n += 1
+                if n > shared:
+                    best, shared = i, n
+            self.busy[best] = True
+            return best, shared
+
+    def release_slot(self, slot, tokens):
+        with self.lock:
+            self.slots[slot] = tokens
+            self.busy[slot] = False
+        self.free.release()
+
+    def answer(self, prompt, tokens):
+        digest = hashlib.blake2b(prompt.encode(), digest_size=4).hexdigest()
+        return [f"{digest}-{i} " for i in range(tokens)]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chunk(self, data):
+        line = json.dumps(data).encode() + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._json(200, {"version": "0.0.0-fake"})
+        elif self.path == "/api/tags":
+            self._json(200, {"models": [{"name": model} for model in self.server.loaded]})
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._json(404, {"error": "not found"})
+            return
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        model = request.get("model", "")
+        prompt = request.get("prompt", "")
+        with server.lock:
+            server.log.append((model, prompt))
+        prompt_tokens = prompt.split()
+        slot, shared = server.take_slot(prompt_tokens)
+        try:
+            start = time.perf_counter()
+            load = server.load(model, request.get("keep_alive"))
+            if not prompt:
+                # Loading only, like Ollama with an empty prompt
+                self._json(200, {"model": model, "response": "", "done": True,
+                                 "load_duration": int(load * 1e9), "total_duration": int(load * 1e9)})
+                return
+            # At least one token is evaluated even if the whole prompt is cached
+            shared = min(shared, len(prompt_tokens) - 1)
+            evaluated = len(prompt_tokens) - shared
+            prompt_seconds = server.prompt_seconds(shared, len(prompt_tokens))
+            time.sleep(prompt_seconds)
+            tokens = server.answer(prompt, (request.get("options") or {}).get("num_predict") or server.answer_tokens)
+            eval_start = time.perf_counter()
+            done = {"model": model, "response": "", "done": True, "done_reason": "stop",
+                    "load_duration": int(load * 1e9), "prompt_eval_count": evaluated,
+                    "prompt_eval_duration": int(prompt_seconds * 1e9), "eval_count": len(tokens)}
+            if request.get("stream", True):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for token in tokens:
+                    time.sleep(1 / server.eval_tps)
+                    self._chunk({"model": model, "response": token, "done": False})
+                done["eval_duration"] = int((time.perf_counter() - eval_start) * 1e9)
+                done["total_duration"] = int((time.perf_counter() - start) * 1e9)
+                self._chunk(done)
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                time.sleep(len(tokens) / server.eval_tps)
+                done["response"] = "".join(tokens)
+                done["eval_duration"] = int((time.perf_counter() - eval_start) * 1e9)
+                done["total_duration"] = int((time.perf_counter() - start) * 1e9)
+                self._json(200, done)
+        finally:
+            server.release_slot(slot, prompt_tokens)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Ollama server for benchmarks and offline checks")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--load_time", type=float, default=1.0)
+    parser.add_argument("--eval_tps", type=float, default=50.0)
+    parser.add_argument("--parallel", type=int, default=1)
+    args = parser.parse_args()
+    server = FakeOllama(("127.0.0.1", args.port), args.load_time, eval_tps=args.eval_tps, parallel=args.parallel)
+    print(f"Fake Ollama on {server.url}, use OLLAMA_HOST={server.url}")
+    sys.stdout.flush()
+    server.serve_forever()
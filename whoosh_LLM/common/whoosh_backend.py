@@ -0,0 +1,139 @@
+import os
+from whoosh import index, fields
+from whoosh.qparser import QueryParser, GtLtPlugin
+from whoosh.query import And, Every, DateRange, NumericRange
+
+from .search_backend import SearchBackend, Searcher, TEXT, KEYWORD, ID, INT, FLOAT, DATETIME, BOOLEAN
+
+
+def whoosh_schema(schema):
+    """Whoosh Schema of a backend schema"""
+    whoosh_fields = {}
+    for name, field in schema.items():
+        if field.type == TEXT:
+            whoosh_fields[name] = fields.TEXT(stored=field.stored)
+        elif field.type == KEYWORD:
+            whoosh_fields[name] = fields.KEYWORD(stored=field.stored, sortable=field.sortable)
+        elif field.type == ID:
+            whoosh_fields[name] = fields.ID(stored=field.stored, unique=field.unique, sortable=field.sortable)
+        elif field.type in (INT, FLOAT):
+            # Sortable float columns need an explicit default in Whoosh 2.7, 0 sorts documents without a value last
+            whoosh_fields[name] = fields.NUMERIC(int if field.type == INT else float, stored=field.stored,
+                                                 unique=field.unique, sortable=field.sortable, default=0)
+        elif field.type == DATETIME:
+            whoosh_fields[name] = fields.DATETIME(stored=field.stored, sortable=field.sortable)
+        elif field.type == BOOLEAN:
+            whoosh_fields[name] = fields.BOOLEAN(stored=field.stored)
+        else:
+            raise ValueError(f"Unknown field type {field.type} of {name}")
+    return fields.Schema(**whoosh_fields)
+
+
+class WhooshBackend(SearchBackend):
+    """Whoosh index in the directory path"""
+
+    kind = "whoosh"
+
+    def __init__(self, path, schema, default_field):
+        super().__init__(path, schema, default_field)
+        if not os.path.exists(path):
+            os.makedirs(path)
+        if index.exists_in(path):
+            self.ix = index.open_dir(path)
+        else:
+            self.ix = index.create_in(path, whoosh_schema(schema))
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.isdir(path) and index.exists_in(path)
+
+    def field_names(self):
+        return self.ix.schema.names()
+
+    def clear(self):
+        self.ix = index.create_in(self.path, whoosh_schema(self.schema))
+
+    def doc_count(self):
+        return self.ix.doc_count()
+
+    def generation(self):
+        return self.ix.latest_generation()
+
+    def writer(self, **options):
+        """options are given to the Whoosh writer, for example procs, multisegment and limitmb"""
+        return WhooshWriter(self.ix, self.schema, **options)
+
+    def searcher(self):
+        return WhooshSearcher(self.ix.searcher(), self.schema, self.default_field)
+
+
+def range_query(schema, name, low, high):
+    if schema[name].type == DATETIME:
+        return DateRange(name, low, high)
+    return NumericRange(name, low, high)
+
+
+class WhooshWriter:
+
+    def __init__(self, ix, schema, **options):
+        self.writer = ix.writer(**options)
+        self.schema = schema
+
+    def add(self, fields):
+        self.writer.add_document(**fields)
+
+    def update(self, fields):
+        self.writer.update_document(**fields)
+
+    def delete(self, field, value):
+        self.writer.delete_by_term(field, value)
+
+    def delete_range(self, field, low, high):
+        self.writer.delete_by_query(range_query(self.schema, field, low, high))
+
+    def commit(self):
+        self.writer.commit()
+
+    def cancel(self):
+        self.writer.cancel()
+
+
+class WhooshSearcher(Searcher):
+
+    def __init__(self, searcher, schema, default_field):
+        self.searcher = searcher
+        self.schema = schema
+        self.default_field = default_field
+
+    def parse(self, query_text, ranges=None):
+        queries = [range_query(self.schema, name, low, high) for name, (low, high) in (ranges or {}).items()]
+        if query_text and query_text.lower() != "all":
+            qp = QueryParser(self.default_field, self.searcher.schema)
+            qp.add_plugin(GtLtPlugin())
+            queries.append(qp.parse(query_text))
+        if not queries:
+            return Every()
+        return queries[0] if len(queries) == 1 else And(queries)
+
+    def search(self, query_text, limit=10, sort_by=None, reverse=False, ranges=None):
+        results = self.searcher.search(self.parse(query_text, ranges), limit=limit, sortedby=sort_by, reverse=reverse)
+        return [(hit.score, hit.fields()) for hit in results]
+
+    def document(self, **term):
+        return self.searcher.document(**term)
+
+    def documents(self):
+        return self.searcher.all_stored_fields()
+
+    def up_to_date(self):
+        return self.searcher.up_to_date()
+
+    def refresh(self):
+        # Unchanged segments are reused, the old searcher must not be closed
+        return WhooshSearcher(self.searcher.refresh(), self.schema, self.default_field)
+
+    def generation(self):
+        return self.searcher.ixreader.generation()
+
+    def close(self):
+        self.searcher.close()
@@ -1,77 +1,221 @@
 import os
-import sys
+import io
 import json
 import requests
+import tempfile
 import zipfile
 import re
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from .store import open_store, UNCHANGED
 
-def download(url):
-    local_filename = url.split('/')[-1]
-    with requests.get(url, stream=True) as r:
-        r.raise_for_status()
-        with open(local_filename, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192): 
-                f.write(chunk)
-    return local_filename
+NVD_URL = os.environ.get("NVD_FEED_URL", "https://nvd.nist.gov/feeds/json/cve/1.1/nvdcve-1.1-recent.json.zip")
+KEV_URL = os.environ.get("KEV_FEED_URL", "https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulnerabilities.json")
 
-def known_exploited():
+# Downloads are kept in memory up to this size and spill to an anonymous temporary file after it
+SPOOL_MAX_SIZE = 32 * 1024 * 1024
+
+def conditional_get(url, state, **kwargs):
+    """GET url with the ETag/Last-Modified validators in state. Returns None on 304 Not Modified."""
+    headers = {}
+    if state.get('etag'):
+        headers['If-None-Match'] = state['etag']
+    if state.get('last_modified'):
+        headers['If-Modified-Since'] = state['last_modified']
+    r = requests.get(url, headers=headers, timeout=60, **kwargs)
+    if r.status_code == 304:
+        r.close()
+        return None
+    r.raise_for_status()
+    return r
+
+def validators(r):
+    return {'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified')}
+
+def download(url, state=None):
+    """
+    Download url into a temporary file object. Nothing is written to the working directory.
+    Returns the file and the new validators, or None and the old ones if the file has not changed.
+    """
+    r = conditional_get(url, state or {}, stream=True)
+    if r is None:
+        return None, state
+    f = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    with r:
+        for chunk in r.iter_content(chunk_size=65536):
+            f.write(chunk)
+    f.seek(0)
+    return f, validators(r)
+
+def meta_sha256(url):
+    """sha256 of the feed from the small .meta file NVD publishes next to every feed"""
+    r = requests.get(re.sub(r'\.json\.zip$', '.meta', url), timeout=60)
+    r.raise_for_status()
+    for line in r.text.splitlines():
+        if line.lower().startswith('sha256:'):
+            return line.split(':', 1)[1].strip().upper()
+    return None
+
+def download_nvd(state, url=NVD_URL):
+    """
+    Download the NVD feed unless its .meta sha256 or its validators show it has not changed.
+    Returns the zip file and the new state, or None and the old state.
+    """
+    sha256 = meta_sha256(url)
+    if sha256 and sha256 == state.get('sha256'):
+        return None, state
+    cve_zip, new_state = download(url, state)
+    if cve_zip is None:
+        return None, state
+    return cve_zip, dict(new_state, sha256=sha256)
+
+def iter_json_array(stream, key, chunk_size=65536):
+    """
+    Yield the items of array `key` from a JSON text stream one at a time.
+    Only the item being parsed is held in memory, not the whole document.
+    """
+    decoder = json.JSONDecoder()
+    marker = f'"{key}"'
+    buffer = ''
+    # Skip everything up to the opening bracket of the array
+    while True:
+        idx = buffer.find(marker)
+        if idx >= 0 and '[' in buffer[idx:]:
+            buffer = buffer[buffer.index('[', idx) + 1:]
+            break
+        data = stream.read(chunk_size)
+        if not data:
+            return
+        # Keep a possibly split marker
+        buffer = buffer[idx:] if idx >= 0 else buffer[-len(marker):]
+        buffer += data
+    eof = False
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,')
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+            # A number may continue in the next chunk, an item ends at a separator
+            complete = eof or buffer[end:end + 1] in (' ', '\t', '\r', '\n', ',', ']')
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            data = stream.read(chunk_size)
+            eof = not data
+            buffer += data
+            continue
+        yield item
+        buffer = buffer[end:]
+
+def known_exploited(state=None):
+    """
+    CVE IDs of the CISA known exploited vulnerabilities and the new validators,
+    or None and the old validators if the list has not changed.
+    """
     result = []
-    r = requests.get("https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulnerabilities.json")
+    r = conditional_get(KEV_URL, state or {})
+    if r is None:
+        return None, state
     for vuln in r.json()['vulnerabilities']:
         result.append(vuln['cveID'])
-    return result
+    return result, validators(r)
+
+def get_cve_data(cve_zip):
+    """Yield CVE items of an NVD JSON feed. The JSON is read straight from the zip member without extracting it."""
+    with cve_zip:
+        with zipfile.ZipFile(cve_zip, 'r') as zip_ref:
+            member = next(name for name in zip_ref.namelist() if name.endswith('.json'))
+            with zip_ref.open(member) as j:
+                yield from iter_json_array(io.TextIOWrapper(j, encoding='utf-8'), 'CVE_Items')
 
-def get_cve_data():
-    cve_zip = download("https://nvd.nist.gov/feeds/json/cve/1.1/nvdcve-1.1-recent.json.zip")
-    #cve_zip = "nvdcve-1.1-recent.json.zip"
-    cve_json = cve_zip.split('.zip')[0]
-    with zipfile.ZipFile(cve_zip, 'r') as zip_ref:
-        zip_ref.extractall('./')
-    with open(cve_json) as j:
-        cve_data = json.loads(j.read())
-    os.remove('nvdcve-1.1-recent.json.zip')
-    os.remove('nvdcve-1.1-recent.json')
-    return cve_data
 
+# Sortable rank of each severity, 0 is left for CVEs without one
+SEVERITY_RANK = {"NONE": 1, "LOW": 2, "MEDIUM": 3, "HIGH": 4, "CRITICAL": 5}
+
+def parse_date(value):
+    """NVD 1.1 dates look like 2025-01-01T00:00Z"""
+    return datetime.strptime(value, "%Y-%m-%dT%H:%MZ") if value else None
 
 def parse_cve_data(c):
+    """
+    Compact typed fields of a CVE item. Score, vector and severity come from
+    CVSS v3 when available and from CVSS v2 otherwise. Missing values are None.
+    """
     cve_res = {}
     cve_res['id'] = c["cve"]["CVE_data_meta"]["ID"]
     for descr in c['cve']['description']['description_data']:
         if descr['lang'] == 'en':
             cve_res['description'] = descr['value']
-    if c['impact']:
-        cve_res[f"impact"] = str(c['impact'])
-        cve_res[f"severity"] = str(c['impact']['baseMetricV3']['cvssV3']['baseSeverity'])
+    cwes = []
+    for problem in c['cve'].get('problemtype', {}).get('problemtype_data', []):
+        cwes.extend(d['value'] for d in problem['description'] if d['value'].startswith('CWE-'))
+    cve_res['cwe'] = " ".join(cwes) or None
+    impact = c.get('impact') or {}
+    if 'baseMetricV3' in impact:
+        cvss = impact['baseMetricV3']['cvssV3']
+        severity = cvss['baseSeverity']
+    elif 'baseMetricV2' in impact:
+        cvss = impact['baseMetricV2']['cvssV2']
+        severity = impact['baseMetricV2'].get('severity')
     else:
-        cve_res[f"impact"] = "N/A"
-        cve_res[f"severity"] = "N/A"
+        cvss = {}
+        severity = None
+    cve_res['score'] = cvss.get('baseScore')
+    cve_res['vector'] = cvss.get('vectorString')
+    cve_res['severity'] = severity or "N/A"
+    cve_res['severity_rank'] = SEVERITY_RANK.get(severity, 0)
+    cve_res['published'] = parse_date(c.get('publishedDate'))
+    cve_res['modified'] = parse_date(c.get('lastModifiedDate'))
     return cve_res
 
-def fetch():
-    exploited = known_exploited()
-    result = []
-    cve_data = get_cve_data()
-    if os.path.isfile('.seen_cve_ids.json'):
-        with open('.seen_cve_ids.json', 'r') as s:
-            seen_ids = json.load(s)
+def fetch(store=None, url=NVD_URL):
+    """
+    Yield parsed CVEs that are new, modified since they were indexed or newly
+    known to be exploited. Seen CVEs are only queued in the store, the caller
+    saves it once the CVEs are committed to the index. The 'status' of every
+    CVE tells if it is NEW to the store. url can be any NVD 1.1 JSON feed, for
+    example a yearly feed for a backfill.
+    """
+    store = store or open_store()
+    nvd_state = store.feed_state(url)
+    kev_state = store.feed_state(KEV_URL)
+    # Both feeds are downloaded at the same time. The store is only used from this thread.
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        kev_future = pool.submit(known_exploited, kev_state)
+        nvd_future = pool.submit(download_nvd, nvd_state, url)
+        kev_ids, kev_state = kev_future.result()
+        cve_zip, nvd_state = nvd_future.result()
+    store.set_feed_state(KEV_URL, kev_state)
+    store.set_feed_state(url, nvd_state)
+    if kev_ids is None:
+        exploited = store.kev_ids()
+        newly_exploited = set()
     else:
-        seen_ids = []
-    for cve_res in cve_data['CVE_Items']:
+        exploited = set(kev_ids)
+        newly_exploited = store.set_kev(exploited)
+    if cve_zip is None and newly_exploited:
+        # The feed has not changed but CVEs in it may have been added to the KEV list
+        cve_zip, nvd_state = download_nvd({}, url)
+        store.set_feed_state(url, nvd_state)
+    if cve_zip is None:
+        print("NVD feed has not changed")
+        return
+    for cve_res in get_cve_data(cve_zip):
         cve_id = cve_res["cve"]["CVE_data_meta"]["ID"]
-        if cve_id not in seen_ids:
-            seen_ids.append(cve_id)
-            val = {"id": cve_id, "description": cve_res['cve']['description']['description_data'], }
-            cve_parsed = parse_cve_data(cve_res)
-            if cve_id in exploited:
-                cve_parsed['exploited'] = True
-            else:
-                cve_parsed['exploited'] = False
-            result.append(cve_parsed)
-
-    with open('.seen_cve_ids.json', 'w+') as s:
-        s.write(json.dumps(seen_ids))
-    return result
+        status = store.status(cve_id, cve_res.get('lastModifiedDate'))
+        if status == UNCHANGED and cve_id not in newly_exploited:
+            continue
+        cve_parsed = parse_cve_data(cve_res)
+        cve_parsed['exploited'] = cve_id in exploited
+        cve_parsed['status'] = status
+        yield cve_parsed
 
 if __name__=="__main__":
-    print(cve())
+    store = open_store()
+    for cve_parsed in fetch(store):
+        print(cve_parsed)
+    store.save()
+    store.close()
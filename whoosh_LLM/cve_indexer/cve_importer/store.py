@@ -0,0 +1,104 @@
+import os
+import json
+import sqlite3
+
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+
+
+class SeenStore:
+    """
+    SQLite store of already indexed CVEs with their last modified date, of
+    CISA known exploited vulnerability IDs and of HTTP validators of the feeds.
+    Lookups use the primary key index and updates are queued and written in one
+    transaction by save(), so nothing is marked done before the CVEs are indexed.
+    """
+
+    def __init__(self, path='.seen_cve.sqlite'):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS seen (id TEXT PRIMARY KEY, last_modified TEXT) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS kev (id TEXT PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS feeds (url TEXT PRIMARY KEY, state TEXT) WITHOUT ROWID;
+        """)
+        self.pending = []
+        self.pending_kev = None
+        self.pending_feeds = {}
+
+    def status(self, cve_id, last_modified):
+        """
+        NEW if the CVE has not been indexed, CHANGED if it has been modified since
+        and UNCHANGED otherwise. New and changed CVEs are queued to be saved as seen.
+        """
+        row = self.conn.execute("SELECT last_modified FROM seen WHERE id = ?", (cve_id,)).fetchone()
+        if row is None:
+            status = NEW
+        elif row[0] is None or row[0] == last_modified:
+            # IDs imported from the old JSON list have no date, take the current one
+            status = UNCHANGED
+        else:
+            status = CHANGED
+        if status != UNCHANGED or row[0] is None:
+            self.pending.append((cve_id, last_modified))
+        return status
+
+    def reset(self):
+        """Forget seen CVEs and feed validators so that everything is indexed again"""
+        with self.conn:
+            self.conn.execute("DELETE FROM seen")
+            self.conn.execute("DELETE FROM feeds")
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def save(self):
+        """Write queued updates in one transaction"""
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO seen (id, last_modified) VALUES (?, ?)", self.pending)
+            if self.pending_kev is not None:
+                self.conn.execute("DELETE FROM kev")
+                self.conn.executemany("INSERT INTO kev (id) VALUES (?)", ((i,) for i in self.pending_kev))
+            self.conn.executemany("INSERT OR REPLACE INTO feeds (url, state) VALUES (?, ?)",
+                                  ((url, json.dumps(state)) for url, state in self.pending_feeds.items()))
+        self.pending = []
+        self.pending_kev = None
+        self.pending_feeds = {}
+
+    def set_kev(self, ids):
+        """Queue new known exploited IDs and return the ones that were not known before"""
+        self.pending_kev = set(ids)
+        return self.pending_kev - self.kev_ids()
+
+    def kev_ids(self):
+        return {row[0] for row in self.conn.execute("SELECT id FROM kev")}
+
+    def feed_state(self, url):
+        """Saved validators of a feed: etag, last_modified and sha256 when known"""
+        row = self.conn.execute("SELECT state FROM feeds WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def set_feed_state(self, url, state):
+        self.pending_feeds[url] = state
+
+    def import_json(self, path):
+        """Import a .seen_cve_ids.json list. Imported CVEs are treated as unchanged."""
+        with open(path) as f:
+            seen_ids = json.load(f)
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO seen (id, last_modified) VALUES (?, NULL)",
+                                  ((i,) for i in seen_ids))
+        return len(seen_ids)
+
+    def close(self):
+        self.conn.close()
+
+
+def open_store(path='.seen_cve.sqlite', legacy_path='.seen_cve_ids.json'):
+    """Open the store and import the old JSON list once if it still exists"""
+    store = SeenStore(path)
+    if os.path.isfile(legacy_path):
+        count = store.import_json(legacy_path)
+        os.rename(legacy_path, legacy_path + '.imported')
+        print(f"Imported {count} seen CVE IDs from {legacy_path}")
+    return store
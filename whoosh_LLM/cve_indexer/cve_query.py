@@ -1,92 +1,302 @@
 import argparse
 import os
+import sys
+import time
+from datetime import datetime
 from cve_importer import cve
-from langchain_ollama import OllamaLLM
-from whoosh import index
-from whoosh.fields import Schema, TEXT, ID, BOOLEAN, KEYWORD
-from whoosh.qparser import QueryParser
-from whoosh.query import Every
+from cve_importer.store import open_store, NEW
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.context_packer import pack_context, pack_context_batch, format_report, CONTEXT_FRACTION
+from common.response_cache import ResponseCache, format_stats
+from common.scheduler import Scheduler, Source, print_status
+from common.ollama_client import get_client, format_metrics
+from common.batch import run_batch, read_prompts, open_output, format_summary, CONCURRENCY
+from common.mapreduce import map_reduce, format_map_reduce_report
+from common.search_backend import open_backend, Field, TEXT, ID, KEYWORD, INT, FLOAT, DATETIME, BOOLEAN, BACKENDS, DEFAULT_BACKEND
 
 # Define the LLM model to be used
 llm_model = "llama3.2:3b"
 
-# Define the schema for Whoosh
-schema = Schema(
-    id=ID(stored=True, unique=True),
-    description=TEXT(stored=True),
-    impact=TEXT(stored=True),
-    severity=KEYWORD(stored=True),
-    exploited=BOOLEAN(stored=True)
-)
+# Define the schema of the index
+# score and severity_rank are sortable columns, CVEs without a score sort as 0, last.
+schema = {
+    "id": Field(ID, unique=True),
+    "description": Field(TEXT),
+    "score": Field(FLOAT, sortable=True),
+    "vector": Field(ID),
+    "cwe": Field(KEYWORD),
+    "severity": Field(KEYWORD),
+    "severity_rank": Field(INT, stored=False, sortable=True),
+    "published": Field(DATETIME, sortable=True),
+    "modified": Field(DATETIME, sortable=True),
+    "exploited": Field(BOOLEAN),
+}
 
-# Create an index directory
+# Index directory, created on first update
 index_dir = os.path.join(os.getcwd(), "whoosh_cve_index")
-if not os.path.exists(index_dir):
-    os.mkdir(index_dir)
-
-def create_index():
-    """Create or update a Whoosh index with CVE data."""
-    cve_data = cve.fetch()
-    # Check if the index exists
-    if index.exists_in(index_dir):
-        ix = index.open_dir(index_dir)
+# Search backend of the index, whoosh or sqlite (SQLite FTS5 in index_dir/index.sqlite)
+backend = DEFAULT_BACKEND
+# Ollama responses of unchanged indexes are answered from this cache
+cache_path = os.path.join(os.getcwd(), ".llm_cache.sqlite")
+# Health of the feed refreshed by --schedule
+status_path = os.path.join(os.getcwd(), ".cve_refresh_status.json")
+# Seconds between refreshes in --schedule mode, NVD updates the recent feed about every two hours
+REFRESH_INTERVAL = 7200
+
+def open_index():
+    """The CVE index of the configured backend, created if missing"""
+    return open_backend(backend, index_dir, schema, "description")
+
+def create_index(feed_url=cve.NVD_URL, bulk=False, procs=4, limitmb=128):
+    """
+    Create or update the CVE index with CVE data.
+    With bulk the documents are written by procs processes into separate segments (Whoosh only).
+    limitmb is the indexing memory limit of each writer process.
+    """
+    store = open_store()
+    ix = open_index()
+    if 'score' not in ix.field_names():
+        print("Index has the old schema, creating it again")
+        ix.clear()
+        store.reset()
+    elif ix.doc_count() == 0 and store.count() > 0:
+        # A new index, for example of the other backend, is filled from the whole feed
+        store.reset()
+    # CVEs that are new to the seen store can be added without the delete lookup
+    # of update(), unless the store was lost and the index was not
+    trust_store = ix.doc_count() == 0 or store.count() > 0
+    if bulk and ix.kind == "whoosh":
+        writer = ix.writer(procs=procs, multisegment=True, limitmb=limitmb)
     else:
-        ix = index.create_in(index_dir, schema)
-    writer = ix.writer()
-    for cve_item in cve_data:
-        print("writing item")
-        writer.update_document(
-            id=cve_item['id'],
-            description=cve_item['description'].strip(),
-            impact=cve_item['impact'],
-            severity=cve_item['severity'],
-            exploited=cve_item['exploited']
-        )
-    writer.commit()
-    print("CVE data has been indexed into Whoosh")
-
-def search_index(query_text, n_results=5):
-    """Search the Whoosh index for relevant documents."""
-    ix = index.open_dir(index_dir)
-    
-    if query_text.lower() == "all":
-        query = Every()
+        writer = ix.writer(limitmb=limitmb)
+    start = time.perf_counter()
+    count = 0
+    try:
+        for cve_item in cve.fetch(store, feed_url):
+            cve_item['description'] = cve_item.get('description', '').strip()
+            fields = {name: value for name, value in cve_item.items() if name in schema and value is not None}
+            if trust_store and cve_item['status'] == NEW:
+                writer.add(fields)
+            else:
+                writer.update(fields)
+            count += 1
+            if count % 5000 == 0:
+                print(f"{count} CVEs written")
+    except BaseException:
+        # Release the index lock, the next run starts over from the seen store
+        writer.cancel()
+        store.close()
+        raise
+    if count == 0:
+        # Nothing new, keep the generation and with it the cached searchers and answers
+        writer.cancel()
     else:
-        qp = QueryParser("description", ix.schema)
-        query = qp.parse(query_text)
-    
-    with ix.searcher() as searcher:
-        results = searcher.search(query, limit=n_results)
-        documents = [hit.fields() for hit in results]
-        return documents
-
-def query_ollama(prompt, context_size):
-    """Send a query to Ollama and retrieve the response."""
-    llm = OllamaLLM(model=llm_model, num_ctx=context_size)
-    return llm.invoke(prompt)
-
-def get_response(whoosh_query, ollama_prompt, context_size):
-    retrieved_docs = search_index(whoosh_query, n_results=None if whoosh_query.lower() == "all" else 5)
-    context = " ".join([f"ID: {doc['id']}\nDescription: {doc['description']}\nSeverity: {doc['severity']}\nImpact: {doc['impact']}" for doc in retrieved_docs]) if retrieved_docs else "No relevant documents found."
-    augmented_prompt = f"Context: {context}\n\nQuestion: {ollama_prompt}\nAnswer:"
+        writer.commit()
+    # Seen CVEs and feed validators are saved only once the index has them
+    store.save()
+    store.close()
+    elapsed = time.perf_counter() - start
+    print(f"{count} CVEs have been indexed into {ix.kind} in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f} docs/s)")
+    return count
+
+def search_index(query_text, n_results=5, sort_by=None, searcher=None):
+    """
+    Search the index for relevant documents. Numeric and date fields can be
+    range filtered, for example "score:>=9" or "published:>20250101".
+    sort_by is a sortable field (score, severity_rank, published, modified), highest first.
+    An open searcher of the backend can be given to avoid opening the index.
+    """
+    if searcher is None:
+        with open_index().searcher() as searcher:
+            return search_index(query_text, n_results, sort_by, searcher)
+
+    results = searcher.search(query_text, limit=n_results, sort_by=sort_by, reverse=bool(sort_by))
+    documents = [fields for score, fields in results]
+    return documents
+
+def query_ollama(prompt, context_size, temperature=None, cache=None, on_token=None):
+    """
+    Send a query to Ollama and retrieve the response.
+    With a cache, the response to the same prompt and options is reused until the index changes.
+    on_token is called with the text of the response as it is generated.
+    """
+    options = {"num_ctx": context_size, "temperature": temperature}
+    client = get_client()
+    generate = lambda: client.generate(llm_model, prompt, options, on_token)
+    if cache is None:
+        response = generate()
+        print(format_metrics(client.last_metrics()), file=sys.stderr)
+        return response
+    ix = open_index()
+    response, hit = cache.call(llm_model, options, prompt, generate, ix.path, ix.generation())
+    if hit and on_token:
+        on_token(response)
+    elif not hit:
+        print(format_metrics(client.last_metrics()), file=sys.stderr)
+    print(format_stats(cache.stats(), hit))
+    return response
+
+def format_doc(doc):
+    lines = [f"ID: {doc['id']}", f"Description: {doc['description']}"]
+    if 'score' in doc:
+        lines.append(f"Severity: {doc['severity']} (CVSS {doc['score']})")
+    else:
+        lines.append(f"Severity: {doc['severity']}")
+    if 'vector' in doc:
+        lines.append(f"Vector: {doc['vector']}")
+    if 'cwe' in doc:
+        lines.append(f"CWE: {doc['cwe']}")
+    if 'published' in doc:
+        lines.append(f"Published: {doc['published']:%Y-%m-%d}")
+    lines.append(f"Known exploited: {'yes' if doc.get('exploited') else 'no'}")
+    return "\n".join(lines)
+
+def rank_key(doc):
+    """Known exploited first, then by CVSS score and most recently published"""
+    published = doc.get('published')
+    return (bool(doc.get('exploited')), doc.get('score', 0), published.timestamp() if published else 0)
+
+def build_prompt(retrieved_docs, ollama_prompt, context_size=2048, context_fraction=CONTEXT_FRACTION, ranked=False):
+    """
+    Pack the documents that fit context_fraction of context_size into the prompt.
+    Unless ranked, the documents are ordered by rank_key first.
+    Returns the prompt and a report of included and dropped documents.
+    """
+    if not ranked:
+        retrieved_docs = sorted(retrieved_docs, key=rank_key, reverse=True)
+    return pack_context(retrieved_docs, format_doc, context_size, ollama_prompt, context_fraction)
+
+def build_prompts(retrieved_docs, ollama_prompts, context_size=2048, context_fraction=CONTEXT_FRACTION, ranked=False):
+    """Like build_prompt for several prompts that share one packed context"""
+    if not ranked:
+        retrieved_docs = sorted(retrieved_docs, key=rank_key, reverse=True)
+    return pack_context_batch(retrieved_docs, format_doc, context_size, ollama_prompts, context_fraction)
+
+def get_response(whoosh_query, ollama_prompt, context_size, sort_by=None, context_fraction=CONTEXT_FRACTION,
+                 temperature=None, cache=None, on_token=None):
+    retrieved_docs = search_index(whoosh_query, n_results=None if whoosh_query.lower() == "all" else 5, sort_by=sort_by)
+    # Whoosh order is kept when it is meaningful: an explicit sort or relevance of a query
+    ranked = bool(sort_by) or whoosh_query.lower() != "all"
+    augmented_prompt, report = build_prompt(retrieved_docs, ollama_prompt, context_size, context_fraction, ranked)
     print(augmented_prompt)
+    print(format_report(report))
+
+    response = query_ollama(augmented_prompt, context_size, temperature, cache, on_token)
+    return response
+
+def get_map_reduce_response(whoosh_query, ollama_prompt, map_context_size=4096, context_fraction=CONTEXT_FRACTION,
+                            temperature=None, cache=None, concurrency=CONCURRENCY):
+    """
+    Answer from all CVEs matching whoosh_query, summarized in groups of map_context_size
+    and combined. Groups hold the CVEs of one publication day, so the cached summaries
+    of earlier days are reused after updates.
+    """
+    retrieved_docs = search_index(whoosh_query, n_results=None)
+    retrieved_docs.sort(key=lambda doc: (doc.get('published') or datetime.min, doc['id']))
+    options = {"num_ctx": map_context_size, "temperature": temperature}
+    client = get_client()
 
-    response = query_ollama(augmented_prompt, context_size)
+    def generate(prompt):
+        if cache is None:
+            return client.generate(llm_model, prompt, options), False
+        # The prompt holds the CVEs it summarizes, it stays valid while the index changes
+        return cache.call(llm_model, options, prompt, lambda: client.generate(llm_model, prompt, options))
+
+    response, report = map_reduce(retrieved_docs, format_doc, ollama_prompt, generate, map_context_size, context_fraction,
+                                  concurrency, group_key=lambda doc: doc['published'].date() if doc.get('published') else None)
+    print(format_map_reduce_report(report))
+    if cache:
+        print(format_stats(cache.stats()))
     return response
 
+def get_responses(whoosh_query, ollama_prompts, output, context_size, sort_by=None, context_fraction=CONTEXT_FRACTION,
+                  temperature=None, cache=None, concurrency=CONCURRENCY):
+    """
+    Batch mode: search and pack the context once, then answer all prompts with at
+    most concurrency Ollama calls at once. Results are written as JSON lines to output.
+    """
+    retrieved_docs = search_index(whoosh_query, n_results=None if whoosh_query.lower() == "all" else 5, sort_by=sort_by)
+    ranked = bool(sort_by) or whoosh_query.lower() != "all"
+    augmented_prompts, report = build_prompts(retrieved_docs, ollama_prompts, context_size, context_fraction, ranked)
+    print(format_report(report), file=sys.stderr)
+
+    options = {"num_ctx": context_size, "temperature": temperature}
+    client = get_client()
+    ix = open_index()
+    generation = ix.generation()
+
+    def generate(prompt):
+        if cache is None:
+            return client.generate(llm_model, prompt, options), False
+        return cache.call(llm_model, options, prompt, lambda: client.generate(llm_model, prompt, options),
+                          ix.path, generation)
+
+    summary = run_batch(ollama_prompts, augmented_prompts, generate, output, concurrency)
+    print(format_summary(summary), file=sys.stderr)
+    return summary
+
 def main():
     parser = argparse.ArgumentParser(description="Manage CVE data and query Ollama.")
-    parser.add_argument('--update', action='store_true', help="Update Whoosh index with new CVE data.")
-    parser.add_argument('--whoosh_query', type=str, required=True, help="The query for Whoosh.")
-    parser.add_argument('--ollama_prompt', type=str, required=True, help="The prompt for Ollama.")
+    parser.add_argument('--update', action='store_true', help="Update the index with new CVE data.")
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help="Search backend of the index, Whoosh or SQLite FTS5. The default is $SEARCH_BACKEND or whoosh.")
+    parser.add_argument('--feed_url', type=str, default=cve.NVD_URL, help="NVD JSON 1.1 feed to index, for example a yearly feed.")
+    parser.add_argument('--bulk', action='store_true', help="Index with multiple writer processes. Use for large feeds.")
+    parser.add_argument('--procs', type=int, default=4, help="Writer processes with --bulk.")
+    parser.add_argument('--limitmb', type=int, default=128, help="Indexing memory limit of each writer process in MB.")
+    parser.add_argument('--schedule', action='store_true',
+                        help="Keep refreshing the CVE index in the background instead of querying. Queries in other processes read the last commit.")
+    parser.add_argument('--interval', type=int, default=REFRESH_INTERVAL, help="Seconds between refreshes with --schedule.")
+    parser.add_argument('--status', action='store_true', help="Print the health of the feed refreshed by --schedule.")
+    parser.add_argument('--whoosh_query', type=str, help="The query for Whoosh.")
+    parser.add_argument('--sort_by', type=str, choices=['score', 'severity_rank', 'published', 'modified'],
+                        help="Sort Whoosh results by this field, highest first.")
+    parser.add_argument('--ollama_prompt', type=str, help="The prompt for Ollama.")
+    parser.add_argument('--map_reduce', action='store_true',
+                        help="Summarize the retrieved CVEs in groups that fit --map_context_size and combine the summaries, instead of one prompt.")
+    parser.add_argument('--map_context_size', type=int, default=4096, help="Context size of each Ollama call with --map_reduce.")
+    parser.add_argument('--prompts_file', type=str,
+                        help="Answer every prompt of this file (one per line) with the same retrieved context instead of --ollama_prompt.")
+    parser.add_argument('--output', type=str, default="-", help="JSON lines file for the answers of --prompts_file, - for stdout.")
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help="Prompts of --prompts_file sent to Ollama at once.")
     parser.add_argument('--context_size', type=int, default=2048, help="The context size for Ollama.")
+    parser.add_argument('--context_fraction', type=float, default=CONTEXT_FRACTION,
+                        help="Fraction of the context size that retrieved CVEs may use.")
+    parser.add_argument('--temperature', type=float, help="Sampling temperature, the model default if not given.")
+    parser.add_argument('--no_cache', action='store_true', help="Always ask Ollama instead of reusing cached responses.")
+    parser.add_argument('--stream', action='store_true', help="Print the response as it is generated.")
     args = parser.parse_args()
+    global backend
+    backend = args.backend
 
+    if args.status:
+        print_status(status_path)
+        return
+    if args.schedule:
+        source = Source(f"nvd {args.feed_url}", lambda: create_index(args.feed_url, args.bulk, args.procs, args.limitmb),
+                        args.interval)
+        Scheduler([source], status_path).run()
+        return
+    if args.whoosh_query is None or (args.ollama_prompt is None and args.prompts_file is None):
+        parser.error("--whoosh_query and --ollama_prompt or --prompts_file are required unless --schedule or --status is given")
     if args.update:
-        create_index()
+        create_index(args.feed_url, args.bulk, args.procs, args.limitmb)
 
-    response = get_response(args.whoosh_query, args.ollama_prompt, args.context_size)
-    print(response)
+    cache = None if args.no_cache else ResponseCache(cache_path)
+    if args.prompts_file:
+        with open_output(args.output) as output:
+            get_responses(args.whoosh_query, read_prompts(args.prompts_file), output, args.context_size, args.sort_by,
+                          args.context_fraction, args.temperature, cache, args.concurrency)
+        return
+    if args.map_reduce:
+        print(get_map_reduce_response(args.whoosh_query, args.ollama_prompt, args.map_context_size, args.context_fraction,
+                                      args.temperature, cache, args.concurrency))
+        return
+    on_token = (lambda text: print(text, end="", flush=True)) if args.stream else None
+    response = get_response(args.whoosh_query, args.ollama_prompt, args.context_size, args.sort_by, args.context_fraction,
+                            args.temperature, cache, on_token)
+    print("" if args.stream else response)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import importlib.util
+
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+cve_dir = os.path.join(tests_dir, '..')
+sys.path.insert(0, tests_dir)
+sys.path.insert(0, cve_dir)
+from feed_server import FeedServer, NVD_PATH, KEV_PATH
+
+# The fake Ollama lives with the tests of the shared modules
+spec = importlib.util.spec_from_file_location("fake_ollama", os.path.join(cve_dir, '..', 'common', 'tests', 'fake_ollama.py'))
+fake_ollama = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(fake_ollama)
+
+QUESTIONS = [
+    "Which of these vulnerabilities should be patched first?",
+    "Which CVEs are known to be exploited?",
+    "Summarize the affected products.",
+    "Which weaknesses (CWE) are most common?",
+    "Which vulnerabilities can be exploited over the network without authentication?",
+    "Write a short briefing for the security team.",
+    "Which CVEs have a CVSS score of 9 or more?",
+    "What mitigations apply to most of these vulnerabilities?",
+    "Which vulnerabilities were published most recently?",
+    "Group the vulnerabilities by severity.",
+    "Which of these affect web servers?",
+    "Which ones need a reboot to patch?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="One cve_query.py process per prompt against --prompts_file batch mode, on a fake Ollama")
+    parser.add_argument("--prompts", type=int, default=12)
+    parser.add_argument("--parallel", type=int, default=4, help="Parallel slots of the fake Ollama")
+    parser.add_argument("--prompt_tps", type=float, default=1000.0, help="Prompt tokens per second of the fake Ollama")
+    args = parser.parse_args()
+    prompts = (QUESTIONS * (args.prompts // len(QUESTIONS) + 1))[:args.prompts]
+    nvd = FeedServer(count=300).start()
+    os.environ["KEV_FEED_URL"] = nvd.url + KEV_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        # cve_query keeps its index in the working directory
+        os.chdir(tmp)
+        import cve_query
+        cve_query.create_index(nvd.url + NVD_PATH)
+        prompts_file = os.path.join(tmp, "prompts.txt")
+        with open(prompts_file, "w") as f:
+            f.write("\n".join(prompts))
+
+        ollama = fake_ollama.FakeOllama(load_time=0, prompt_tps=args.prompt_tps, parallel=args.parallel).start()
+        env = dict(os.environ, OLLAMA_HOST=ollama.url)
+        start = time.perf_counter()
+        for prompt in prompts:
+            subprocess.run([sys.executable, os.path.join(cve_dir, "cve_query.py"), "--whoosh_query", "all",
+                            "--ollama_prompt", prompt, "--no_cache"], env=env, cwd=tmp, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        print(f"one process per prompt: {len(prompts)} prompts in {time.perf_counter() - start:.1f}s")
+        ollama.shutdown()
+
+        for concurrency in (1, args.parallel):
+            ollama = fake_ollama.FakeOllama(load_time=0, prompt_tps=args.prompt_tps, parallel=args.parallel).start()
+            env = dict(os.environ, OLLAMA_HOST=ollama.url)
+            output = os.path.join(tmp, f"answers{concurrency}.jsonl")
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(cve_dir, "cve_query.py"), "--whoosh_query", "all",
+                            "--prompts_file", prompts_file, "--output", output, "--concurrency", str(concurrency),
+                            "--no_cache"], env=env, cwd=tmp, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            elapsed = time.perf_counter() - start
+            with open(output) as f:
+                records = [json.loads(line) for line in f]
+            evaluated = sum(r["prompt_eval_tokens"] for r in records)
+            print(f"--prompts_file, concurrency {concurrency}: {len(records)} prompts in {elapsed:.1f}s, "
+                  f"{evaluated} prompt tokens evaluated, first answer after {records[0]['llm_ms']:.0f}ms, "
+                  f"median answer {sorted(r['llm_ms'] for r in records)[len(records) // 2]:.0f}ms")
+            ollama.shutdown()
+        os.chdir(tests_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from whoosh import index
+from whoosh.fields import Schema, TEXT, ID, BOOLEAN, KEYWORD
+from whoosh.qparser import QueryParser, GtLtPlugin
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from cve_importer.cve import parse_cve_data
+from feed_server import cve_item
+
+# The schema before typed fields, impact was stored as str() of the whole impact dict
+OLD_SCHEMA = Schema(
+    id=ID(stored=True, unique=True),
+    description=TEXT(stored=True),
+    impact=TEXT(stored=True),
+    severity=KEYWORD(stored=True),
+    exploited=BOOLEAN(stored=True)
+)
+SEVERITIES = [(3.0, "LOW"), (5.5, "MEDIUM"), (7.5, "HIGH"), (9.8, "CRITICAL")]
+
+
+def fixture_items(count):
+    random.seed(1)
+    items = []
+    for i in range(count):
+        score, severity = random.choice(SEVERITIES)
+        item = cve_item(i, score=score, severity=severity)
+        # Real impact dicts carry CVSS v2 metrics and exploitability data too
+        item['impact']['baseMetricV2'] = {
+            "cvssV2": {"version": "2.0", "vectorString": "AV:N/AC:L/Au:N/C:P/I:N/A:N", "accessVector": "NETWORK",
+                       "accessComplexity": "LOW", "authentication": "NONE", "baseScore": 5.0},
+            "severity": "MEDIUM", "exploitabilityScore": 10.0, "impactScore": 2.9, "acInsufInfo": False,
+        }
+        item['impact']['baseMetricV3']['exploitabilityScore'] = 3.9
+        item['impact']['baseMetricV3']['impactScore'] = 3.6
+        items.append(item)
+    return items
+
+
+def build(path, schema, docs):
+    ix = index.create_in(path, schema)
+    writer = ix.writer()
+    for doc in docs:
+        writer.add_document(**doc)
+    writer.commit()
+    size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    return ix, size
+
+
+def latency(ix, query_text, repeat, **kwargs):
+    qp = QueryParser("description", ix.schema)
+    qp.add_plugin(GtLtPlugin())
+    timings = []
+    with ix.searcher() as searcher:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = searcher.search(qp.parse(query_text), **kwargs)
+            docs = [hit.fields() for hit in results]
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, len(docs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index size and query latency of the old and the typed CVE schema")
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    # Imported late, cve_query creates its index directory in the working directory
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        import cve_query
+        from common.whoosh_backend import whoosh_schema
+        items = fixture_items(args.count)
+        old_docs = [dict(id=p['id'], description=p['description'], impact=str(i['impact']), severity=p['severity'],
+                         exploited=False) for i, p in ((i, parse_cve_data(i)) for i in items)]
+        new_docs = []
+        for item in items:
+            doc = parse_cve_data(item)
+            doc['exploited'] = False
+            new_docs.append({k: v for k, v in doc.items() if v is not None})
+        os.mkdir("old")
+        os.mkdir("new")
+        old_ix, old_size = build("old", OLD_SCHEMA, old_docs)
+        new_ix, new_size = build("new", whoosh_schema(cve_query.schema), new_docs)
+        print(f"index size: old {old_size / 1e6:.1f} MB, typed {new_size / 1e6:.1f} MB")
+        ms, n = latency(old_ix, "severity:CRITICAL", args.repeat, limit=None)
+        print(f"old   'severity:CRITICAL' ({n} hits, no score sort possible): {ms:.1f} ms")
+        ms, n = latency(new_ix, "severity:CRITICAL", args.repeat, limit=None)
+        print(f"typed 'severity:CRITICAL' ({n} hits): {ms:.1f} ms")
+        ms, n = latency(new_ix, "score:>=9", args.repeat, limit=None, sortedby="score", reverse=True)
+        print(f"typed 'score:>=9' sorted by score ({n} hits): {ms:.1f} ms")
+        ms, n = latency(new_ix, "score:>=9", args.repeat, limit=10, sortedby="score", reverse=True)
+        print(f"typed 'score:>=9' sorted by score, top 10: {ms:.1f} ms")
@@ -0,0 +1,48 @@
+import io
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from cve_importer.cve import iter_json_array
+
+ITEMS = [
+    {"cve": {"CVE_data_meta": {"ID": "CVE-2025-0001"}}, "lastModifiedDate": "2025-01-01T00:00Z"},
+    "a string with ] and , and \" inside",
+    12345,
+    -1.5e3,
+    [1, [2, 3]],
+    True,
+    None,
+    {"CVE_Items": "not the array"},
+]
+
+DOCUMENTS = [
+    ("items", json.dumps({"CVE_data_type": "CVE", "CVE_Items": ITEMS}), ITEMS),
+    ("items, indented", json.dumps({"CVE_data_type": "CVE", "CVE_Items": ITEMS}, indent=2), ITEMS),
+    ("key after other arrays", json.dumps({"other": [1, 2], "CVE_Items": ITEMS[:3]}), ITEMS[:3]),
+    ("single number", '{"CVE_Items": [1234567]}', [1234567]),
+    ("empty array", '{"CVE_Items": []}', []),
+    ("empty array with spaces", '{"CVE_Items" : [ \n ] }', []),
+    ("missing key", '{"CVE_data_type": "CVE", "other": [1, 2]}', []),
+    ("empty document", '', []),
+]
+
+
+def check(name, text, expected):
+    """Parse text with every chunk size, so the marker, the bracket and every item are split once"""
+    for chunk_size in range(1, len(text) + 2):
+        items = list(iter_json_array(io.StringIO(text), "CVE_Items", chunk_size))
+        assert items == expected, (name, chunk_size, items)
+    print(f"{name}: {len(expected)} items with chunk sizes 1 to {len(text) + 1} OK")
+
+
+if __name__ == "__main__":
+    for name, text, expected in DOCUMENTS:
+        check(name, text, expected)
+    try:
+        list(iter_json_array(io.StringIO('{"CVE_Items": [{"a": 1}, {"b"'), "CVE_Items", 4))
+    except json.JSONDecodeError:
+        print("truncated array: JSONDecodeError OK")
+    else:
+        raise AssertionError("truncated array was not reported")
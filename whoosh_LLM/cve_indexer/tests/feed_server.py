@@ -0,0 +1,130 @@
+import os
+import io
+import sys
+import json
+import hashlib
+import argparse
+import tempfile
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NVD_PATH = "/nvdcve-1.1-recent.json.zip"
+META_PATH = "/nvdcve-1.1-recent.meta"
+KEV_PATH = "/known_exploited_vulnerabilities.json"
+
+
+def cve_item(i, modified="2025-01-01T00:00Z", score=7.5, severity="HIGH"):
+    return {
+        "cve": {
+            "CVE_data_meta": {"ID": f"CVE-2025-{i:05d}"},
+            "problemtype": {"problemtype_data": [{"description": [{"lang": "en", "value": "CWE-79"}]}]},
+            "description": {"description_data": [{"lang": "en", "value": f"Fixture vulnerability number {i} in example software"}]},
+        },
+        "impact": {
+            "baseMetricV3": {
+                "cvssV3": {
+                    "vectorString": "CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:N/A:N",
+                    "baseScore": score,
+                    "baseSeverity": severity,
+                }
+            }
+        },
+        "publishedDate": "2025-01-01T00:00Z",
+        "lastModifiedDate": modified,
+    }
+
+
+class FeedServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the NVD and CISA KEV feeds. Serves fixture feeds with
+    ETag/Last-Modified headers, answers 304 to matching conditional requests
+    and records every request as (path, status, bytes).
+    """
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), count=100):
+        super().__init__(address, Handler)
+        self.items = [cve_item(i) for i in range(count)]
+        self.kev = [self.items[0]["cve"]["CVE_data_meta"]["ID"]]
+        self.log = []
+        self.build()
+
+    def build(self):
+        """Render the feeds from self.items and self.kev. Call again after changing them."""
+        data = json.dumps({"CVE_data_type": "CVE", "CVE_Items": self.items}).encode()
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as z:
+            z.writestr("nvdcve-1.1-recent.json", data)
+        meta = f"lastModifiedDate:2025-01-01T00:00:00-05:00\r\nsize:{len(data)}\r\nsha256:{hashlib.sha256(data).hexdigest().upper()}\r\n"
+        kev = json.dumps({"vulnerabilities": [{"cveID": i} for i in self.kev]}).encode()
+        self.files = {NVD_PATH: buf.getvalue(), META_PATH: meta.encode(), KEV_PATH: kev}
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        body = self.server.files.get(self.path)
+        if body is None:
+            self.send_error(404)
+            self.server.log.append((self.path, 404, 0))
+            return
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            self.server.log.append((self.path, 304, 0))
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", "Wed, 01 Jan 2025 00:00:00 GMT")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.log.append((self.path, 200, len(body)))
+
+
+def check(server):
+    """Run fetch() against the stand-in: a first run, a run without changes and a run after one CVE changed"""
+    os.environ["NVD_FEED_URL"] = server.url + NVD_PATH
+    os.environ["KEV_FEED_URL"] = server.url + KEV_PATH
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from cve_importer import cve
+    from cve_importer.store import SeenStore
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "seen.sqlite")
+        for name in ("first run", "no changes", "one CVE modified"):
+            if name == "one CVE modified":
+                server.items[1] = cve_item(1, modified="2025-02-01T00:00Z")
+                server.build()
+            server.log.clear()
+            store = SeenStore(path)
+            indexed = [c['id'] for c in cve.fetch(store)]
+            store.save()
+            store.close()
+            print(f"{name}: {len(indexed)} CVEs yielded, requests: {server.log}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the NVD and KEV feeds")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--count", type=int, default=100, help="Number of fixture CVEs")
+    parser.add_argument("--check", action='store_true', help="Run cve.fetch() against the server and print the requests")
+    args = parser.parse_args()
+    server = FeedServer(("127.0.0.1", 0 if args.check else args.port), args.count)
+    if args.check:
+        check(server.start())
+    else:
+        print(f"NVD_FEED_URL={server.url}{NVD_PATH} KEV_FEED_URL={server.url}{KEV_PATH}")
+        server.serve_forever()
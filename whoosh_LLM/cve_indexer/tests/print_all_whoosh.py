@@ -1,6 +1,6 @@
 import os
 from whoosh import index
-from whoosh.fields import Schema, TEXT, ID, BOOLEAN, KEYWORD
+from whoosh.fields import Schema, TEXT, ID, BOOLEAN, KEYWORD, NUMERIC, DATETIME
 from whoosh.qparser import QueryParser
 from whoosh.query import Every
 
@@ -8,8 +8,13 @@ from whoosh.query import Every
 schema = Schema(
     id=ID(stored=True, unique=True),
     description=TEXT(stored=True),
-    impact=TEXT(stored=True),
+    score=NUMERIC(float, stored=True, sortable=True, default=0),
+    vector=ID(stored=True),
+    cwe=KEYWORD(stored=True),
     severity=KEYWORD(stored=True),
+    severity_rank=NUMERIC(int, bits=8, signed=False, sortable=True, default=0),
+    published=DATETIME(stored=True, sortable=True),
+    modified=DATETIME(stored=True, sortable=True),
     exploited=BOOLEAN(stored=True)
 )
 
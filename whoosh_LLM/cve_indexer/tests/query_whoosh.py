@@ -1,15 +1,20 @@
 import os
 from whoosh import index
-from whoosh.fields import Schema, TEXT, ID, BOOLEAN, KEYWORD
-from whoosh.qparser import QueryParser
+from whoosh.fields import Schema, TEXT, ID, BOOLEAN, KEYWORD, NUMERIC, DATETIME
+from whoosh.qparser import QueryParser, GtLtPlugin
 from whoosh.qparser import MultifieldParser
 
 # Define the schema for Whoosh
 schema = Schema(
     id=ID(stored=True, unique=True),
     description=TEXT(stored=True),
-    impact=TEXT(stored=True),
+    score=NUMERIC(float, stored=True, sortable=True, default=0),
+    vector=ID(stored=True),
+    cwe=KEYWORD(stored=True),
     severity=KEYWORD(stored=True),
+    severity_rank=NUMERIC(int, bits=8, signed=False, sortable=True, default=0),
+    published=DATETIME(stored=True, sortable=True),
+    modified=DATETIME(stored=True, sortable=True),
     exploited=BOOLEAN(stored=True)
 )
 
@@ -21,6 +26,7 @@ def search_index(query_text, n_results=5):
     ix = index.open_dir(index_dir)
     # Use MultiFieldParser to allow querying multiple fields
     qp = QueryParser("description", schema=ix.schema)
+    qp.add_plugin(GtLtPlugin())
     q = qp.parse(query_text)
     with ix.searcher() as searcher:
         results = searcher.search(q, limit=n_results)
@@ -0,0 +1,126 @@
+import re
+import string
+from collections import deque
+
+BLOCK_SIZE = 1 << 20
+# Longer lines are cut, so that memory stays bounded on files without newlines
+MAX_LINE = 1 << 20
+
+# Every byte that is not printable ASCII. Multi-byte UTF-8 characters are
+# dropped whole, like filtering the decoded text with string.printable.
+_DELETE = bytes(b for b in range(256) if chr(b) not in string.printable)
+_letter = re.compile(rb'[A-z]')
+_letter_str = re.compile(r'[A-z]')
+
+
+def read_blocks(f, size=BLOCK_SIZE):
+    """Blocks of bytes read from a binary file object"""
+    while True:
+        block = f.read(size)
+        if not block:
+            return
+        yield block
+
+
+def has_letters(line):
+    return _letter_str.search(line) is not None
+
+
+def normalized_lines(blocks, letters_only=True, max_line=MAX_LINE):
+    """
+    Lines of byte blocks reduced to printable ASCII, lines without letters are skipped
+    unless letters_only is False. Only the current block and one partial line are held
+    in memory.
+    """
+    rest = b''
+    for block in blocks:
+        lines = (rest + block.translate(None, _DELETE)).split(b'\n')
+        rest = lines.pop()
+        if len(rest) > max_line:
+            lines.append(rest)
+            rest = b''
+        for line in lines:
+            if not letters_only or _letter.search(line):
+                yield line.decode('ascii')
+    if rest and (not letters_only or _letter.search(rest)):
+        yield rest.decode('ascii')
+
+
+def join_wrapped(lines, max_line=MAX_LINE):
+    """Join wrapped lines into paragraphs, empty lines end a paragraph. Used for pdftotext output."""
+    paragraph = []
+    length = 0
+    for line in lines:
+        if not line:
+            if paragraph:
+                yield ' '.join(paragraph)
+            paragraph = []
+            length = 0
+            continue
+        paragraph.append(line)
+        length += len(line)
+        if length > max_line:
+            yield ' '.join(paragraph)
+            paragraph = []
+            length = 0
+    if paragraph:
+        yield ' '.join(paragraph)
+
+
+def word_tokens(word):
+    """Estimated tokens of a word, one per four characters"""
+    return (len(word) + 3) // 4 or 1
+
+
+def chunk_words(lines, chunk_size=100, overlap=0, max_tokens=None, count_tokens=word_tokens):
+    """
+    Chunks of at most chunk_size words from an iterable of lines. With max_tokens a
+    chunk is also closed before it would exceed that many estimated tokens. Each
+    chunk starts with the last overlap words of the previous one.
+    """
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap must be smaller than chunk_size")
+    if not max_tokens:
+        yield from _chunk_words(lines, chunk_size, overlap)
+        return
+    chunk = deque()
+    tokens = deque()
+    total = 0
+    fresh = 0
+    for line in lines:
+        for word in line.split():
+            cost = count_tokens(word)
+            if fresh and total + cost > max_tokens:
+                yield ' '.join(chunk)
+                while len(chunk) > overlap or (chunk and total + cost > max_tokens):
+                    chunk.popleft()
+                    total -= tokens.popleft()
+                fresh = 0
+            chunk.append(word)
+            tokens.append(cost)
+            total += cost
+            fresh += 1
+            if len(chunk) >= chunk_size:
+                yield ' '.join(chunk)
+                while len(chunk) > overlap:
+                    chunk.popleft()
+                    total -= tokens.popleft()
+                fresh = 0
+    if fresh:
+        yield ' '.join(chunk)
+
+
+def _chunk_words(lines, chunk_size, overlap):
+    """chunk_words without a token limit, words are sliced by count"""
+    words = []
+    fresh = 0
+    for line in lines:
+        new = line.split()
+        words.extend(new)
+        fresh += len(new)
+        while len(words) >= chunk_size:
+            yield ' '.join(words[:chunk_size])
+            words = words[chunk_size - overlap:]
+            fresh = len(words) - overlap
+    if fresh > 0:
+        yield ' '.join(words)
@@ -1,71 +1,171 @@
 import os
-from whoosh import index
-from whoosh.fields import Schema, TEXT, ID
-from whoosh.index import open_dir
-from whoosh.qparser import QueryParser
-from langchain_ollama import OllamaLLM
+import sys
+from .manifest import Manifest
+from .chunking import chunk_words
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.ollama_client import get_client
+from common.search_backend import open_backend, backend_exists, rrf, Field, TEXT, ID
+
+# Chunks of the indexed documents, chunk is the id of a chunk, path#number
+schema = {"title": Field(TEXT), "path": Field(ID), "content": Field(TEXT), "chunk": Field(ID)}
 
 class Engine:
 
-    def __init__(self, index_conf, model="llama3.2:1b"):
+    def __init__(self, index_conf, model="llama3.2:1b", cache=None):
         self.index_dir = index_conf['index_dir']
-        if not os.path.isdir(self.index_dir):
+        # Optional ResponseCache for Ollama responses
+        self.cache = cache
+        # Search backend of the chunks, whoosh or sqlite (default $SEARCH_BACKEND or whoosh)
+        kind = index_conf.get('backend')
+        os.makedirs(self.index_dir, exist_ok=True)
+        # Indexed files, kept with the index so that both are deleted together
+        self.manifest = Manifest(os.path.join(self.index_dir, "manifest.sqlite"))
+        if not backend_exists(kind, self.index_dir):
+            if self.manifest.count():
+                raise ValueError(f"{self.index_dir} holds an index of the other backend, use a new index directory")
             print("Creating index")
-            os.mkdir(self.index_dir)
-            self.create_index()
-        self.ix = open_dir(self.index_dir)
+        self.backend = open_backend(kind, self.index_dir, schema, "content")
         self.ollama_model = model
+        # Words per chunk, words repeated from the previous chunk and optional token limit per chunk
+        self.chunk_size = index_conf.get('chunk_size', 100)
+        self.chunk_overlap = index_conf.get('chunk_overlap', 0)
+        self.chunk_tokens = index_conf.get('chunk_tokens')
+        # Optional dense vectors of the chunks, fused with BM25 in search()
+        self.vectors = None
+        vectors_dir = os.path.join(self.index_dir, "vectors")
+        if index_conf.get('embedder') or os.path.isdir(vectors_dir):
+            from .vectors import VectorStore, make_embedder
+            embedder = make_embedder(index_conf['embedder']) if index_conf.get('embedder') else None
+            if 'chunk' not in self.backend.field_names():
+                raise ValueError(f"{self.index_dir} has no chunk ids, rebuild it to add vectors")
+            self.vectors = VectorStore(vectors_dir, embedder)
+        # Chunks given to the LLM after fusing BM25 and vector results
+        self.hybrid_limit = index_conf.get('hybrid_limit', 8)
 
-    def create_index(self):
-        schema = Schema(title=TEXT(stored=True), path=ID(stored=True), content=TEXT(stored=True))
-        index.create_in(self.index_dir, schema)
-
-    def chunk_text(self, text, chunk_size=100):
-        chunks = []
-        current_chunk = []
-        words = text.split()
-        for word in words:
-            current_chunk.append(word)
-            if len(current_chunk) >= chunk_size:
-                chunks.append(" ".join(current_chunk))
-                current_chunk = []
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
-        return chunks
+    def chunk_text(self, text, chunk_size=None):
+        """
+        Generator of the chunks of text, a string or an iterable of lines.
+        Lines are consumed as chunks are written, so a streamed document is never held whole.
+        """
+        lines = [text] if isinstance(text, str) else text
+        return chunk_words(lines, chunk_size or self.chunk_size, self.chunk_overlap, self.chunk_tokens)
 
     def index_doc(self, title, content, path):
         print(f"[*] Indexing document with title: {title}")
-        writer = self.ix.writer()
-        chunks = self.chunk_text(content)
-        for chunk in chunks:
-            writer.add_document(title=title, content=chunk.strip(), path=path)
-        writer.commit()
+        self.index_docs([(title, content, path)])
+
+    def index_docs(self, docs, replace=(), delete=(), limitmb=256):
+        """
+        Chunk and write (title, content, path) documents with one writer and one commit.
+        content is a string or an iterable of lines.
+        Old chunks of documents whose path is in replace and all chunks of the paths in
+        delete are removed in the same commit. Returns the number of chunks per path.
+        With vectors, chunks are embedded in batches while they are written.
+        """
+        writer = self.backend.writer(limitmb=limitmb)
+        chunks = {}
+        batch = []
+        has_ids = 'chunk' in self.backend.field_names()
+        try:
+            for path in delete:
+                writer.delete('path', path)
+                if self.vectors:
+                    self.vectors.delete(path)
+            for title, content, path in docs:
+                if path in replace:
+                    writer.delete('path', path)
+                    if self.vectors:
+                        self.vectors.delete(path)
+                chunks[path] = 0
+                for chunk in self.chunk_text(content):
+                    fields = {"title": title, "content": chunk, "path": path}
+                    if has_ids:
+                        fields["chunk"] = f"{path}#{chunks[path]}"
+                    writer.add(fields)
+                    chunks[path] += 1
+                    if self.vectors:
+                        batch.append(fields)
+                        if len(batch) >= 64:
+                            self.add_vectors(batch)
+                            batch = []
+            if batch:
+                self.add_vectors(batch)
+        except BaseException:
+            writer.cancel()
+            if self.vectors:
+                self.vectors.rollback()
+            raise
+        if chunks or delete:
+            writer.commit()
+            if self.vectors:
+                # Vector rows are saved after the index commit, like the manifest
+                self.vectors.save()
+        else:
+            # Nothing changed, keep the index generation
+            writer.cancel()
+        return chunks
 
-    def search(self, query_str):
+    def add_vectors(self, batch):
+        self.vectors.add([f["chunk"] for f in batch], [f["path"] for f in batch], [f["content"] for f in batch])
+
+    def search(self, query_str, searcher=None, vector_query=None, hybrid=True):
+        """
+        Contents of the top 30 BM25 chunks. With vectors, the BM25 ranking and the
+        vector ranking for vector_query (default query_str) are fused by reciprocal
+        rank and only the top hybrid_limit chunks are returned.
+        """
+        if searcher is None:
+            with self.backend.searcher() as searcher:
+                return self.search(query_str, searcher, vector_query, hybrid)
         results = []
-        with self.ix.searcher() as searcher:
-            query = QueryParser("content", self.ix.schema).parse(query_str)
-            hits = searcher.search(query, limit=30)
+        hits = [fields for score, fields in searcher.search(query_str, limit=30)]
+        if not (self.vectors and hybrid):
             for hit in hits:
                 results.append(hit['content'])
+            return results
+        contents = {hit.get('chunk', i): hit['content'] for i, hit in enumerate(hits)}
+        nearest = [chunk for chunk, score in self.vectors.search(vector_query or query_str, k=30)]
+        for chunk in rrf([list(contents), nearest])[:self.hybrid_limit]:
+            if chunk not in contents:
+                doc = searcher.document(chunk=chunk)
+                if doc is None:
+                    continue
+                contents[chunk] = doc['content']
+            results.append(contents[chunk])
         return results
 
-    def query_ollama(self, prompt, context_size):
-        """Send a query to Ollama and retrieve the response."""
-        llm = OllamaLLM(model=self.ollama_model, num_ctx=context_size)
-        return llm.invoke(prompt)
-
-    def generate_response(self, query, prompt, context_size=4096):
-        retrieved_docs = self.search(query)
+    def build_prompt(self, retrieved_docs, prompt):
         context = " ".join(retrieved_docs)
         # Separate the prompt and the retrieved context
-        augmented_prompt = f"Context: {context}\n\nQuestion: {prompt}\nAnswer:"
+        return f"Context: {context}\n\nQuestion: {prompt}\nAnswer:"
+
+    def query_ollama(self, prompt, context_size, temperature=None, on_token=None):
+        """
+        Send a query to Ollama and retrieve the response.
+        With a cache, the response to the same prompt and options is reused until the index changes.
+        on_token is called with the text of the response as it is generated.
+        """
+        options = {"num_ctx": context_size, "temperature": temperature}
+        generate = lambda: get_client().generate(self.ollama_model, prompt, options, on_token)
+        if self.cache is None:
+            return generate()
+        response, hit = self.cache.call(self.ollama_model, options, prompt, generate,
+                                        os.path.abspath(self.backend.path), self.backend.generation())
+        if hit and on_token:
+            on_token(response)
+        return response
+
+    def generate_response(self, query, prompt, context_size=4096, on_token=None):
+        retrieved_docs = self.search(query, vector_query=prompt)
+        augmented_prompt = self.build_prompt(retrieved_docs, prompt)
         print(augmented_prompt)
-        ollama_response = self.query_ollama(prompt=augmented_prompt, context_size=context_size)
+        ollama_response = self.query_ollama(prompt=augmented_prompt, context_size=context_size, on_token=on_token)
         return ollama_response
 
 # Usage example
 if __name__ == "__main__":
+    # engine is a package, run the example from doc_indexer with: python -m engine.engine
     conf = {'index_dir': 'whoosh_doc_index'}
     engine = Engine(conf)
 
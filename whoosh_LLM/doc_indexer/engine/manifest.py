@@ -0,0 +1,55 @@
+import sqlite3
+from collections import namedtuple
+
+Entry = namedtuple("Entry", "size mtime hash chunks")
+
+
+class Manifest:
+    """
+    SQLite list of the indexed files with their size, mtime (ns), content hash
+    and number of chunks. Files whose size and mtime have not changed are
+    skipped without reading them. Updates are queued and written in one
+    transaction by save(), after the index commit.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER,
+                hash TEXT, chunks INTEGER) WITHOUT ROWID;
+        """)
+        self.pending = {}
+        self.pending_deletes = set()
+
+    def get(self, path):
+        row = self.conn.execute("SELECT size, mtime, hash, chunks FROM files WHERE path = ?", (path,)).fetchone()
+        return Entry(*row) if row else None
+
+    def files(self, root):
+        """Entries of the files under the directory root"""
+        prefix = root.rstrip("/") + "/"
+        rows = self.conn.execute("SELECT path, size, mtime, hash, chunks FROM files WHERE substr(path, 1, ?) = ?",
+                                 (len(prefix), prefix))
+        return {row[0]: Entry(*row[1:]) for row in rows}
+
+    def set(self, path, size, mtime, hash, chunks):
+        self.pending_deletes.discard(path)
+        self.pending[path] = (size, mtime, hash, chunks)
+
+    def delete(self, path):
+        self.pending.pop(path, None)
+        self.pending_deletes.add(path)
+
+    def save(self):
+        with self.conn:
+            self.conn.executemany("DELETE FROM files WHERE path = ?", ((p,) for p in self.pending_deletes))
+            self.conn.executemany("INSERT OR REPLACE INTO files (path, size, mtime, hash, chunks) VALUES (?, ?, ?, ?, ?)",
+                                  ((p, *row) for p, row in self.pending.items()))
+        self.pending = {}
+        self.pending_deletes = set()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
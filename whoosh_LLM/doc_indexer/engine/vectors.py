@@ -0,0 +1,263 @@
+import os
+import re
+import zlib
+import sqlite3
+import threading
+import numpy as np
+
+# Exhaustive search is fast enough below this many vectors, above it an IVF
+# partitioning is built when enough rows were added since the last build
+IVF_MIN_ROWS = 50000
+# Number of IVF lists searched per query
+NPROBE = 8
+
+_words = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    """
+    Deterministic embedder for tests and offline use. Words and word pairs are
+    hashed into dim buckets with a random sign and the vector is L2 normalized,
+    so the similarity of two texts grows with the words they share.
+    """
+
+    def __init__(self, dim=1024):
+        self.dim = dim
+        self.name = f"hash:{dim}"
+        self._buckets = {}
+
+    def bucket(self, feature):
+        if feature not in self._buckets:
+            h = zlib.crc32(feature.encode())
+            self._buckets[feature] = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+        return self._buckets[feature]
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            words = _words.findall(text.lower())
+            features = words + [a + " " + b for a, b in zip(words, words[1:])]
+            for feature in features:
+                bucket, sign = self.bucket(feature)
+                vectors[i, bucket] += sign
+        return normalize(vectors)
+
+
+class OllamaEmbedder:
+    """Embeddings from an Ollama embedding model, for example nomic-embed-text"""
+
+    def __init__(self, model="nomic-embed-text", host=None):
+        import ollama
+        self.model = model
+        self.name = "ollama:" + model
+        self.client = ollama.Client(host=host)
+        self.dim = len(self.client.embed(model=model, input=["dimension"])["embeddings"][0])
+
+    def embed(self, texts):
+        response = self.client.embed(model=self.model, input=list(texts))
+        return normalize(np.asarray(response["embeddings"], dtype=np.float32))
+
+
+def make_embedder(name):
+    """Embedder by name: 'hash', 'hash:<dim>' or 'ollama:<model>'"""
+    kind, _, arg = name.partition(":")
+    if kind == "hash":
+        return HashingEmbedder(int(arg) if arg else 1024)
+    if kind == "ollama":
+        return OllamaEmbedder(arg or "nomic-embed-text")
+    raise ValueError(f"Unknown embedder {name}, use hash or ollama:<model>")
+
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+class VectorStore:
+    """
+    Chunk embeddings next to the Whoosh index. Vectors are appended to a raw
+    float32 file that is memory-mapped for search, SQLite maps each row to its
+    chunk id and path. Deleted chunks are marked and masked out of the results,
+    their space is reclaimed by rebuilding the index.
+    New vectors are written to the file as chunks are indexed, their rows are
+    saved by save() after the index commit and rollback() truncates them away.
+    Rows, deletions and the IVF saved by another process, for example index.py
+    while the query server runs, are reloaded by search() once SQLite reports a change.
+    """
+
+    def __init__(self, path, embedder=None):
+        os.makedirs(path, exist_ok=True)
+        self.matrix_path = os.path.join(path, "vectors.f32")
+        self.ivf_path = os.path.join(path, "ivf.npz")
+        # Searches may come from the request threads of the query server at the same time.
+        # They share the connection, rows, deleted and ivf, so they hold self.lock to use them.
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(os.path.join(path, "rows.sqlite"), check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS rows (row INTEGER PRIMARY KEY, chunk TEXT, path TEXT, deleted INTEGER DEFAULT 0);
+            CREATE INDEX IF NOT EXISTS rows_path ON rows (path);
+        """)
+        meta = dict(self.conn.execute("SELECT name, value FROM meta"))
+        if embedder is None:
+            if "embedder" not in meta:
+                raise ValueError(f"No embedder given for the new vector store in {path}")
+            embedder = make_embedder(meta["embedder"])
+        elif meta.get("embedder", embedder.name) != embedder.name:
+            raise ValueError(f"Vectors in {path} were made by {meta['embedder']}, not {embedder.name}")
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                                  [("embedder", embedder.name), ("dim", str(embedder.dim))])
+        self.embedder = embedder
+        self.dim = embedder.dim
+        self.version = None
+        self.ivf = None
+        self.ivf_mtime = None
+        self.reload()
+        self.pending = []
+        self.pending_deletes = set()
+
+    def reload(self):
+        """Load the saved rows, deletions and IVF again if another connection changed them"""
+        with self.lock:
+            # data_version changes with every commit of another connection to the database
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self.version:
+                return
+            self.version = version
+            self.rows = self._saved_rows()
+            self._load_deleted()
+            self._load_ivf()
+            if self.ivf is not None and self.ivf["rows"] > self.rows:
+                # The IVF was built after a commit that happened while reloading
+                self.rows = self._saved_rows()
+
+    def _saved_rows(self):
+        return self.conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM rows").fetchone()[0]
+
+    def _truncate(self, rows):
+        size = rows * self.dim * 4
+        if os.path.exists(self.matrix_path) and os.path.getsize(self.matrix_path) > size:
+            os.truncate(self.matrix_path, size)
+
+    def _load_deleted(self):
+        deleted = [row for row, in self.conn.execute("SELECT row FROM rows WHERE deleted = 1")]
+        self.deleted = np.array(deleted, dtype=np.int64)
+
+    def _load_ivf(self):
+        mtime = os.stat(self.ivf_path).st_mtime_ns if os.path.exists(self.ivf_path) else None
+        if mtime != self.ivf_mtime:
+            self.ivf = dict(np.load(self.ivf_path)) if mtime is not None else None
+            self.ivf_mtime = mtime
+
+    def add(self, chunks, paths, texts):
+        if not self.pending:
+            # Rows saved by another process since the last save, and vectors written
+            # before a crash but never saved. Readers never truncate, the writer may be running.
+            self.reload()
+            self._truncate(self.rows)
+        vectors = self.embedder.embed(texts)
+        with open(self.matrix_path, "ab") as f:
+            f.write(vectors.astype(np.float32).tobytes())
+        for chunk, path in zip(chunks, paths):
+            self.pending.append((self.rows + len(self.pending), chunk, path))
+
+    def delete(self, path):
+        """Mark the saved vectors of path as deleted, vectors added since the last save are kept"""
+        self.pending_deletes.add(path)
+
+    def save(self):
+        with self.lock:
+            with self.conn:
+                self.conn.executemany("UPDATE rows SET deleted = 1 WHERE path = ?", ((p,) for p in self.pending_deletes))
+                self.conn.executemany("INSERT INTO rows (row, chunk, path) VALUES (?, ?, ?)", self.pending)
+            self.rows += len(self.pending)
+            self.pending = []
+            self.pending_deletes = set()
+            self._load_deleted()
+            indexed = self.ivf["rows"] if self.ivf else 0
+            if self.rows >= IVF_MIN_ROWS and self.rows - indexed > self.rows // 4:
+                self.build_ivf()
+
+    def rollback(self):
+        self._truncate(self.rows)
+        self.pending = []
+        self.pending_deletes = set()
+
+    def matrix(self):
+        if not self.rows:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(self.matrix_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+
+    def build_ivf(self, lists=None, iterations=10, sample=50000):
+        """Partition the rows into lists by k-means, a query then only scores the rows of its nearest lists"""
+        matrix = self.matrix()
+        lists = lists or max(1, int(np.sqrt(self.rows)))
+        rng = np.random.default_rng(0)
+        train = matrix[np.sort(rng.choice(self.rows, min(self.rows, max(sample, lists * 40)), replace=False))]
+        centroids = train[rng.choice(len(train), lists, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(train @ centroids.T, axis=1)
+            for i in range(lists):
+                members = train[assign == i]
+                if len(members):
+                    centroids[i] = members.mean(axis=0)
+            centroids = normalize(centroids)
+        assign = np.concatenate([np.argmax(matrix[start:start + 65536] @ centroids.T, axis=1)
+                                 for start in range(0, self.rows, 65536)])
+        order = np.argsort(assign, kind="stable")
+        offsets = np.searchsorted(assign[order], np.arange(lists + 1))
+        self.ivf = {"centroids": centroids, "order": order, "offsets": offsets, "rows": np.int64(self.rows)}
+        # Replaced in one step so that readers in other processes never load a partial file
+        tmp_path = self.ivf_path + ".tmp.npz"
+        np.savez(tmp_path, **self.ivf)
+        os.replace(tmp_path, self.ivf_path)
+        self.ivf_mtime = os.stat(self.ivf_path).st_mtime_ns
+        # Tells the readers to reload
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('ivf_rows', ?)", (str(self.rows),))
+
+    def search(self, text, k=30, nprobe=NPROBE, min_similarity=0.0):
+        """(chunk id, similarity) of the k rows nearest to the embedding of text, above min_similarity"""
+        # Embedding may wait for Ollama and needs no lock
+        query = self.embedder.embed([text])[0]
+        with self.lock:
+            self.reload()
+            return self._search(query, k, nprobe, min_similarity)
+
+    def _search(self, query, k, nprobe, min_similarity):
+        if not self.rows:
+            return []
+        matrix = self.matrix()
+        if self.ivf is not None:
+            nearest = np.argsort(self.ivf["centroids"] @ query)[::-1][:nprobe]
+            offsets = self.ivf["offsets"]
+            candidates = np.concatenate([self.ivf["order"][offsets[i]:offsets[i + 1]] for i in nearest] +
+                                        [np.arange(self.ivf["rows"], self.rows)])
+            candidates.sort()
+            scores = matrix[candidates] @ query
+        else:
+            candidates = np.arange(self.rows)
+            scores = matrix @ query
+        if len(self.deleted):
+            scores[np.isin(candidates, self.deleted)] = -np.inf
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[scores[top] > min_similarity]
+        rows = [int(candidates[i]) for i in top]
+        if not rows:
+            return []
+        chunks = dict(self.conn.execute(f"SELECT row, chunk FROM rows WHERE row IN ({','.join('?' * len(rows))})", rows))
+        return [(chunks[row], float(scores[i])) for row, i in zip(rows, top)]
+
+    def count(self):
+        with self.lock:
+            self.reload()
+            return self.rows - len(self.deleted)
+
+    def close(self):
+        self.conn.close()
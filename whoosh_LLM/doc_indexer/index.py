@@ -1,54 +1,204 @@
-import string
-import re
 import os
+import time
+import hashlib
 import subprocess
 import sys
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from engine.engine import Engine
+from engine.chunking import read_blocks, normalized_lines, join_wrapped, has_letters
 
-def recursive(doc_type):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.search_backend import BACKENDS, DEFAULT_BACKEND
+
+DEFAULT_EXTENSIONS = [".pdf", ".txt", ".md"]
+
+def find_files(target_path, extensions):
+    """Paths of the files under target_path with one of the extensions"""
     docs = []
     for root, dirs, files in os.walk(target_path):
-        for file in files:
-            path = os.path.join(root,file)
-            if path.endswith(doc_type):
+        dirs.sort()
+        for file in sorted(files):
+            path = os.path.join(root, file)
+            if path.lower().endswith(tuple(extensions)):
                 docs.append(path)
     return docs
 
+def hashed(blocks, h):
+    """Pass blocks through, updating the hash h"""
+    for block in blocks:
+        h.update(block)
+        yield block
+
+def file_hash(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in read_blocks(f):
+            h.update(block)
+    return h.hexdigest()
+
+def pdf_lines(path):
+    """Paragraphs of a PDF with wrapped lines joined, streamed from pdftotext"""
+    proc = subprocess.Popen(["pdftotext", path, "-"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        for paragraph in join_wrapped(normalized_lines(read_blocks(proc.stdout), letters_only=False)):
+            if has_letters(paragraph):
+                yield paragraph
+    finally:
+        proc.stdout.close()
+        if proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, "pdftotext")
+
+def text_lines(path, h=None):
+    """Normalized lines of a text file or PDF, read block by block. Text files update the hash h."""
+    if path.lower().endswith('.pdf'):
+        yield from pdf_lines(path)
+        return
+    with open(path, 'rb') as f:
+        blocks = read_blocks(f)
+        yield from normalized_lines(hashed(blocks, h) if h else blocks)
+
+def extract(path):
+    """
+    (path, text, size, mtime, hash) of a file, text is None if it could not be read.
+    Runs in the worker processes.
+    """
+    try:
+        st = os.stat(path)
+        if path.lower().endswith('.pdf'):
+            content = '\n'.join(text_lines(path))
+            content_hash = file_hash(path)
+        else:
+            h = hashlib.blake2b(digest_size=16)
+            content = '\n'.join(text_lines(path, h))
+            content_hash = h.hexdigest()
+        return path, content, st.st_size, st.st_mtime_ns, content_hash
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"[!] Could not read {path}: {e}", file=sys.stderr)
+        return path, None, 0, 0, None
+
+def stream(path):
+    """
+    Like extract, but the text is a generator of lines read while the chunks are
+    written, so memory does not grow with the size of the file. The file is hashed
+    first to skip touched but unchanged files without indexing them.
+    """
+    try:
+        st = os.stat(path)
+        return path, text_lines(path), st.st_size, st.st_mtime_ns, file_hash(path)
+    except OSError as e:
+        print(f"[!] Could not read {path}: {e}", file=sys.stderr)
+        return path, None, 0, 0, None
+
+def sync(engine, paths, deleted=(), workers=None, title=None):
+    """
+    Index the files in paths that are new or have changed since they were indexed
+    and remove the chunks of the deleted paths. Files whose size and mtime match
+    the manifest are skipped without reading them, files with a new mtime but the
+    same content hash are not indexed again. Old chunks of changed files are
+    deleted by path in the same commit as their new chunks. With workers 0 the
+    text is streamed from the files into the writer in this process.
+    """
+    start = time.perf_counter()
+    manifest = engine.manifest
+    stats = {"files": 0, "bytes": 0, "unchanged": 0, "deleted": len(deleted), "failed": 0}
+    changed = []
+    for path in paths:
+        entry = manifest.get(path)
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            # Removed since the directory was walked, its chunks are deleted by the next run
+            print(f"[!] Could not read {path}: {e}", file=sys.stderr)
+            stats["failed"] += 1
+            continue
+        if entry and entry.size == st.st_size and entry.mtime == st.st_mtime_ns:
+            stats["unchanged"] += 1
+        else:
+            changed.append(path)
+    replace = set()
+    hashes = {}
+
+    def documents(results):
+        for path, content, size, mtime, content_hash in results:
+            if content is None:
+                stats["failed"] += 1
+                continue
+            entry = manifest.get(path)
+            if entry and entry.hash == content_hash:
+                # Touched but not changed
+                manifest.set(path, size, mtime, content_hash, entry.chunks)
+                stats["unchanged"] += 1
+                continue
+            if entry:
+                replace.add(path)
+            hashes[path] = (size, mtime, content_hash)
+            stats["files"] += 1
+            stats["bytes"] += size
+            yield title or os.path.basename(path), content, path
+
+    chunks = {}
+    if changed or deleted:
+        if workers == 0:
+            chunks = engine.index_docs(documents(map(stream, changed)), replace, deleted)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunksize = max(1, min(64, len(changed) // (4 * (workers or os.cpu_count() or 1))))
+                chunks = engine.index_docs(documents(pool.map(extract, changed, chunksize=chunksize)), replace, deleted)
+    for path, count in chunks.items():
+        manifest.set(path, *hashes[path], count)
+    for path in deleted:
+        manifest.delete(path)
+    # The manifest is saved only after the index commit
+    manifest.save()
+    elapsed = time.perf_counter() - start
+    print(f"[*] Indexed {stats['files']} files ({stats['bytes'] / 1e6:.1f} MB, {sum(chunks.values())} chunks) in {elapsed:.1f}s: "
+          f"{stats['files'] / elapsed:.0f} files/s, {stats['bytes'] / 1e6 / elapsed:.1f} MB/s. "
+          f"{stats['unchanged']} unchanged, {stats['deleted']} deleted, {stats['failed']} failed")
+    return stats
+
 def index_pdf(engine, path, title):
-    content = []
-    printable = set(string.printable)
-    for line in subprocess.check_output(f"pdftotext '{path}' -|perl -0pe 's/([^\\n])\\n([^\\n])/\\1 \\2/g;'", shell=True).decode('UTF-8').split('\n'):
-        if re.match(r'.*[A-z]+.*', line) and len(line) >= 1:
-            content.append(''.join(filter(lambda x: x in printable, line)))
-    if not title:
-        title = os.path.basename(path)
-    engine.index_doc(title, '\n'.join(content), path)
+    return sync(engine, [os.path.abspath(path)], workers=0, title=title)
 
 def index_text(engine, path, title):
-    content = []
-    printable = set(string.printable)
-    with open(path, 'r') as f:
-        for line in f.readlines():
-            if re.match(r'.*[A-z]+.*', line) and len(line) >= 1:
-                content.append(''.join(filter(lambda x: x in printable, line)))
-    if not title:
-        title = os.path.basename(path)
-    engine.index_doc(title, '\n'.join(content), path)
+    return sync(engine, [os.path.abspath(path)], workers=0, title=title)
 
+def index_directory(engine, target_path, extensions=DEFAULT_EXTENSIONS, workers=None):
+    """
+    Index the new and changed files under target_path with one of the extensions
+    and purge the files that were deleted. Text is extracted by a pool of workers
+    processes and all chunks are written with one writer and one commit.
+    """
+    root = os.path.abspath(target_path)
+    paths = find_files(root, extensions)
+    deleted = [path for path in engine.manifest.files(root) if not os.path.exists(path)]
+    return sync(engine, paths, deleted, workers)
 
 
 def parse_args():
     parser = argparse.ArgumentParser(
                     prog='Doc Indexer')
     parser.add_argument('--title', help="Title of the document. If empty filename=title with textfile.", required=False)
-    parser.add_argument('--path', help="Path to file", required=True)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--path', help="Path to file")
+    source.add_argument('--dir', help="Index every file with one of --ext under this directory")
+    parser.add_argument('--ext', nargs='+', default=DEFAULT_EXTENSIONS, help="File extensions indexed with --dir (default .pdf .txt .md)")
+    parser.add_argument('--workers', type=int, help="Text extraction processes with --dir (default number of CPUs)")
+    parser.add_argument('--chunk_size', type=int, default=100, help="Words per chunk")
+    parser.add_argument('--chunk_overlap', type=int, default=0, help="Words repeated from the previous chunk")
+    parser.add_argument('--chunk_tokens', type=int, help="Close a chunk before it exceeds this many estimated tokens")
+    parser.add_argument('--embedder', help="Also store chunk vectors for hybrid search: hash or ollama:<model> (e.g. ollama:nomic-embed-text)")
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND, help="Search backend of the index: whoosh or sqlite (SQLite FTS5)")
     return parser.parse_args()
 
 if __name__=="__main__":
     args = parse_args()
-    e = Engine({"index_dir": "whoosh_doc_index"})
-    if args.path.endswith('.pdf'):
+    e = Engine({"index_dir": "whoosh_doc_index", "chunk_size": args.chunk_size,
+                "chunk_overlap": args.chunk_overlap, "chunk_tokens": args.chunk_tokens, "embedder": args.embedder,
+                "backend": args.backend})
+    if args.dir:
+        index_directory(e, args.dir, args.ext, args.workers)
+    elif args.path.endswith('.pdf'):
         index_pdf(e, args.path, args.title)
     else:
         index_text(e, args.path, args.title)
@@ -6,16 +6,35 @@ import sys
 import argparse
 from engine.engine import Engine
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.response_cache import ResponseCache, format_stats
+from common.ollama_client import get_client, format_metrics
+from common.search_backend import BACKENDS, DEFAULT_BACKEND
+
 def parse_args():
     parser = argparse.ArgumentParser(
                     prog='Doc Indexer')
     parser.add_argument('--model', default="llama3.2:3b", help="LLM to use (default 'llama3.2:3b')", required=False)
     parser.add_argument('--whoosh_query', help="Whoosh query to search context for prompt", required=True)
     parser.add_argument('--ollama_prompt', help="Ollama prompt that is combined with context", required=True)
+    parser.add_argument('--no_cache', action='store_true', help="Always ask Ollama instead of reusing cached responses")
+    parser.add_argument('--stream', action='store_true', help="Print the response as it is generated")
+    parser.add_argument('--no_hybrid', action='store_true', help="Only use BM25 even if the index has vectors")
+    parser.add_argument('--limit', type=int, default=8, help="Chunks in the prompt after fusing BM25 and vector results (default 8)")
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND, help="Search backend of the index: whoosh or sqlite (SQLite FTS5)")
     return parser.parse_args()
 
 if __name__=="__main__":
     args = parse_args()
-    engine = Engine({"index_dir": "whoosh_doc_index"}, model=args.model)
-    response = engine.generate_response(query=args.whoosh_query, prompt=args.ollama_prompt)
-    print(response)
+    cache = None if args.no_cache else ResponseCache(".llm_cache.sqlite")
+    engine = Engine({"index_dir": "whoosh_doc_index", "hybrid_limit": args.limit, "backend": args.backend},
+                    model=args.model, cache=cache)
+    if args.no_hybrid:
+        engine.vectors = None
+    on_token = (lambda text: print(text, end="", flush=True)) if args.stream else None
+    response = engine.generate_response(query=args.whoosh_query, prompt=args.ollama_prompt, on_token=on_token)
+    print("" if args.stream else response)
+    if get_client().last_metrics():
+        print(format_metrics(get_client().last_metrics()), file=sys.stderr)
+    if cache:
+        print(format_stats(cache.stats()))
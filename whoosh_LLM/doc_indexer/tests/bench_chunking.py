@@ -0,0 +1,87 @@
+import os
+import re
+import sys
+import time
+import random
+import string
+import hashlib
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from engine.chunking import chunk_words
+from index import text_lines
+from bench_ingest import WORDS
+
+
+def make_text(path, size):
+    """Text file of about size bytes with some non-ASCII characters and lines without letters"""
+    rng = random.Random(1)
+    extra = ["naïve", "café", "—", "\x07", "12345", "«»"]
+    with open(path, "w") as f:
+        written = 0
+        while written < size:
+            line = " ".join(rng.choice(WORDS) if rng.random() > 0.05 else rng.choice(extra) for _ in range(12))
+            if rng.random() < 0.05:
+                line = "---- 42 ----"
+            f.write(line + "\n")
+            written += len(line.encode()) + 1
+
+
+def old_path(path):
+    """Chunks as index_text and Engine.chunk_text made them before streaming"""
+    with open(path, 'r', errors='replace') as f:
+        lines = f.read().split('\n')
+    content = []
+    printable = set(string.printable)
+    for line in lines:
+        if re.match(r'.*[A-z]+.*', line) and len(line) >= 1:
+            content.append(''.join(filter(lambda x: x in printable, line)))
+    text = '\n'.join(content)
+    chunks = []
+    current_chunk = []
+    for word in text.split():
+        current_chunk.append(word)
+        if len(current_chunk) >= 100:
+            chunks.append(" ".join(current_chunk))
+            current_chunk = []
+    if current_chunk:
+        chunks.append(" ".join(current_chunk))
+    return chunks
+
+
+def new_path(path, overlap=0, max_tokens=None):
+    return chunk_words(text_lines(path), 100, overlap, max_tokens)
+
+
+def run(name, make_chunks, path, mb):
+    h = hashlib.blake2b()
+    start = time.perf_counter()
+    count = 0
+    for chunk in make_chunks(path):
+        h.update(chunk.encode())
+        count += 1
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    for chunk in make_chunks(path):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{name}: {count} chunks in {elapsed:.2f}s, {mb / elapsed:.1f} MB/s, peak memory {peak / 1e6:.1f} MB")
+    return h.hexdigest()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput and peak memory of normalization and chunking, old against streamed")
+    parser.add_argument("--size", type=int, default=50, help="Size of the text file in MB")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "big.txt")
+        make_text(path, args.size * 1_000_000)
+        mb = os.path.getsize(path) / 1e6
+        old = run("old (per character filter, whole text in memory)", old_path, path, mb)
+        new = run("streamed (translate table, generator chunks)", new_path, path, mb)
+        print("same chunks" if old == new else "chunks differ")
+        run("streamed with 20 words overlap", lambda p: new_path(p, overlap=20), path, mb)
+        run("streamed with at most 64 tokens per chunk", lambda p: new_path(p, max_tokens=64), path, mb)
@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from engine.engine import Engine
+from engine.vectors import VectorStore, HashingEmbedder, normalize
+from common.context_packer import estimate_tokens
+from bench_ingest import WORDS
+
+TOPICS = {
+    "led": "blinking exfiltration photodiode flicker airgap modulation camera smartphone".split(),
+    "kernel": "ioctl syscall ring0 rootkit escalation kaslr hook privilege".split(),
+    "phishing": "phishing email credential lure spoofed domain link attachment".split(),
+    "ransomware": "ransomware encryption ransom note bitcoin decryptor backup shadow".split(),
+}
+
+
+def make_docs(count, rng):
+    """Documents of random filler words with a few words of one topic"""
+    docs = []
+    for i in range(count):
+        topic = rng.choice(list(TOPICS))
+        words = [rng.choice(WORDS) for _ in range(90)] + rng.sample(TOPICS[topic], 3)
+        rng.shuffle(words)
+        docs.append((topic, f"doc{i}", " ".join(words)))
+    return docs
+
+
+def retrieval(docs_count, rng):
+    """Prompt tokens and share of on-topic chunks of BM25 top 30 against hybrid top 8"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = Engine({"index_dir": os.path.join(tmp, "index"), "embedder": "hash"})
+        docs = make_docs(docs_count, rng)
+        topics = {f"{path}#0": topic for topic, path, content in docs}
+        engine.index_docs((path, content, path) for topic, path, content in docs)
+        with engine.backend.searcher() as searcher:
+            by_content = {fields['content']: topics[fields['chunk']] for fields in searcher.documents()}
+        for topic, words in TOPICS.items():
+            query = words[0]
+            prompt = " ".join(words[1:5])
+            for name, hybrid in (("bm25", False), ("hybrid", True)):
+                start = time.perf_counter()
+                chunks = engine.search(query, vector_query=prompt, hybrid=hybrid)
+                elapsed = (time.perf_counter() - start) * 1000
+                relevant = sum(by_content[c] == topic for c in chunks)
+                tokens = sum(estimate_tokens(c) for c in chunks)
+                print(f"  {topic:<10} {name:<6} {len(chunks):>2} chunks, {tokens:>5} tokens, "
+                      f"{relevant / max(1, len(chunks)):.0%} on topic, {elapsed:.1f}ms")
+
+
+def vector_search(rows, dim, queries, rng):
+    """Latency and recall@10 of IVF search against exhaustive search"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VectorStore(tmp, HashingEmbedder(dim))
+        centers = normalize(np.random.default_rng(1).standard_normal((200, dim)).astype(np.float32))
+        data = np.random.default_rng(2)
+        with open(store.matrix_path, "ab") as f:
+            for start in range(0, rows, 50000):
+                n = min(50000, rows - start)
+                block = centers[data.integers(0, 200, n)] + 0.5 * data.standard_normal((n, dim)).astype(np.float32) / np.sqrt(dim)
+                f.write(normalize(block).astype(np.float32).tobytes())
+        store.pending = [(i, f"c{i}", f"p{i}") for i in range(rows)]
+        start = time.perf_counter()
+        store.save()
+        print(f"  {rows} vectors of {dim} dimensions, IVF built in {time.perf_counter() - start:.1f}s")
+        texts = [" ".join(rng.sample(WORDS, 4)) for _ in range(queries)]
+        ivf = store.ivf
+        store.ivf = None
+        start = time.perf_counter()
+        exact = [store.search(text, k=10, min_similarity=-1) for text in texts]
+        print(f"  exhaustive: {(time.perf_counter() - start) / queries * 1000:.1f}ms per query")
+        store.ivf = ivf
+        start = time.perf_counter()
+        approx = [store.search(text, k=10, min_similarity=-1) for text in texts]
+        elapsed = (time.perf_counter() - start) / queries * 1000
+        recall = np.mean([len({c for c, s in a} & {c for c, s in e}) / 10 for a, e in zip(approx, exact)])
+        print(f"  ivf ({len(ivf['centroids'])} lists, nprobe 8): {elapsed:.1f}ms per query, recall@10 {recall:.2f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hybrid BM25 + vector retrieval against BM25 only, and IVF against exhaustive vector search")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+    rng = random.Random(1)
+    print("retrieval with the hashing embedder:")
+    retrieval(args.docs, rng)
+    print("vector search:")
+    vector_search(args.vectors, args.dim, args.queries, rng)
@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from engine.engine import Engine
+from index import index_text, index_directory, find_files
+
+WORDS = ("attack vector payload kernel driver firmware exploit memory buffer overflow network packet "
+         "router switch LED optical covert channel malware sandbox signature heuristic").split()
+
+
+def make_corpus(path, files, size):
+    """files text files of about size bytes in nested directories, with some files of other types"""
+    rng = random.Random(1)
+    for i in range(files):
+        directory = os.path.join(path, f"dir{i % 20}", f"sub{i % 7}")
+        os.makedirs(directory, exist_ok=True)
+        lines = []
+        length = 0
+        while length < size:
+            line = " ".join(rng.choice(WORDS) for _ in range(12))
+            lines.append(line)
+            length += len(line) + 1
+        with open(os.path.join(directory, f"doc{i}.txt"), "w") as f:
+            f.write("\n".join(lines))
+        if i % 10 == 0:
+            with open(os.path.join(directory, f"image{i}.png"), "wb") as f:
+                f.write(b"\x89PNG" + bytes(64))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Files/s and MB/s of directory ingest against indexing one file per commit")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=8000, help="Bytes per file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, "corpus")
+        make_corpus(corpus, args.files, args.size)
+        paths = find_files(corpus, [".txt"])
+        mb = sum(os.path.getsize(p) for p in paths) / 1e6
+
+        engine = Engine({"index_dir": os.path.join(tmp, "one_by_one")})
+        start = time.perf_counter()
+        for path in paths:
+            index_text(engine, path, None)
+        elapsed = time.perf_counter() - start
+        print(f"one commit per file: {len(paths)} files, {mb:.1f} MB in {elapsed:.1f}s: "
+              f"{len(paths) / elapsed:.0f} files/s, {mb / elapsed:.2f} MB/s")
+
+        engine = Engine({"index_dir": os.path.join(tmp, "directory")})
+        print(f"--dir with {args.workers} workers:")
+        index_directory(engine, corpus, [".txt"], args.workers)
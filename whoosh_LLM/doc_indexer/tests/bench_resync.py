@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from engine.engine import Engine
+from index import index_directory, find_files
+from bench_ingest import make_corpus
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time to re-sync a mostly unchanged corpus with the manifest")
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--size", type=int, default=2000, help="Bytes per file")
+    parser.add_argument("--changed", type=float, default=0.01, help="Fraction of files changed before the re-sync")
+    parser.add_argument("--deleted", type=float, default=0.005, help="Fraction of files deleted before the re-sync")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, "corpus")
+        make_corpus(corpus, args.files, args.size)
+        engine = Engine({"index_dir": os.path.join(tmp, "index")})
+        print("initial index:")
+        index_directory(engine, corpus, [".txt"], args.workers)
+        print("re-sync without changes:")
+        start = time.perf_counter()
+        index_directory(engine, corpus, [".txt"], args.workers)
+        print(f"  {time.perf_counter() - start:.2f}s")
+
+        rng = random.Random(2)
+        paths = find_files(corpus, [".txt"])
+        rng.shuffle(paths)
+        changed = paths[:int(len(paths) * args.changed)]
+        deleted = paths[len(changed):len(changed) + int(len(paths) * args.deleted)]
+        for path in changed:
+            with open(path, "a") as f:
+                f.write("\nappended line about a new firmware exploit")
+        for path in deleted:
+            os.remove(path)
+        print(f"re-sync after changing {len(changed)} and deleting {len(deleted)} files:")
+        start = time.perf_counter()
+        index_directory(engine, corpus, [".txt"], args.workers)
+        print(f"  {time.perf_counter() - start:.2f}s")
+        with engine.backend.searcher() as searcher:
+            indexed = {fields['path'] for fields in searcher.documents()}
+        print(f"indexed files: {len(indexed)}, manifest: {engine.manifest.count()}, on disk: {len(find_files(corpus, ['.txt']))}")
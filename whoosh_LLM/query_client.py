@@ -0,0 +1,81 @@
+import sys
+import json
+import time
+import argparse
+import http.client
+from common.context_packer import format_report
+from common.ollama_client import format_metrics
+
+
+def request(conn, method, path, data=None):
+    body = json.dumps(data) if data is not None else None
+    conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    result = json.loads(response.read())
+    if response.status != 200:
+        sys.exit(f"Query server error: {result.get('error')}")
+    return result
+
+
+def bench(conn, source, data, count):
+    """Send count retrieval only requests over one connection and print client side p50/p99 latency"""
+    data = dict(data, retrieve_only=True)
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        request(conn, "POST", f"/{source}", data)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+    print(f"{count} retrieval requests: p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Query CVE, RSS and document indexes through query_server.py.")
+    parser.add_argument('--server', default="127.0.0.1:8765", help="Address of query_server.py.")
+    parser.add_argument('--retrieve_only', action='store_true', help="Print the retrieved documents without asking Ollama.")
+    parser.add_argument('--bench', type=int, default=0, help="Send this many retrieval only requests and print p50/p99 latency.")
+    parser.add_argument('--model', type=str, help="LLM to use instead of the server default.")
+    parser.add_argument('--context_size', type=int, default=2048, help="The context size for Ollama.")
+    parser.add_argument('--context_fraction', type=float, help="Fraction of the context size that retrieved documents may use.")
+    sources = parser.add_subparsers(dest="source", required=True)
+    cve = sources.add_parser("cve", help="Query CVE data.")
+    cve.add_argument('--whoosh_query', type=str, required=True, help="The query for Whoosh.")
+    cve.add_argument('--sort_by', type=str, choices=['score', 'severity_rank', 'published', 'modified'],
+                     help="Sort Whoosh results by this field, highest first.")
+    cve.add_argument('--ollama_prompt', type=str, default="", help="The prompt for Ollama.")
+    rss = sources.add_parser("rss", help="Query RSS feed data.")
+    rss.add_argument('--days', type=int, required=True, help="The number of days for retrieving data from Whoosh.")
+    rss.add_argument('--whoosh_query', type=str, required=False, help="The query for Whoosh.")
+    rss.add_argument('--ollama_prompt', type=str, default="", help="The prompt for Ollama.")
+    doc = sources.add_parser("doc", help="Query indexed documents.")
+    doc.add_argument('--whoosh_query', type=str, required=True, help="Whoosh query to search context for prompt.")
+    doc.add_argument('--ollama_prompt', type=str, default="", help="Ollama prompt that is combined with context.")
+    sources.add_parser("stats", help="Print server side retrieval latency and index generations.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    host, port = args.server.rsplit(":", 1)
+    conn = http.client.HTTPConnection(host, int(port))
+    if args.source == "stats":
+        print(json.dumps(request(conn, "GET", "/stats"), indent=2))
+        sys.exit(0)
+    data = {k: v for k, v in vars(args).items() if k not in ("server", "bench", "source") and v is not None}
+    if args.bench:
+        bench(conn, args.source, data, args.bench)
+        sys.exit(0)
+    result = request(conn, "POST", f"/{args.source}", data)
+    if args.retrieve_only:
+        for i, doc in enumerate(result['documents']):
+            print(f"Result {i+1}:")
+            print(doc if isinstance(doc, str) else "\n".join(f"{key}: {value}" for key, value in doc.items()))
+            print()
+    else:
+        print(result['response'])
+    if result.get('context'):
+        print(format_report(result['context']), file=sys.stderr)
+    if result.get('llm_metrics'):
+        print(format_metrics(result['llm_metrics']), file=sys.stderr)
@@ -0,0 +1,227 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+for subdir in ("cve_indexer", "rss_indexer", "doc_indexer"):
+    sys.path.insert(0, os.path.join(base_dir, subdir))
+sys.path.insert(0, base_dir)
+
+from whoosh import index
+import cve_query
+import rss_query
+from engine.engine import Engine
+from common.context_packer import CONTEXT_FRACTION
+from common.response_cache import ResponseCache
+from common.ollama_client import get_client, KEEP_ALIVE
+from common.search_backend import open_backend, BACKENDS, DEFAULT_BACKEND
+
+
+class IndexHandle:
+    """
+    Index of a search backend that is opened once. The searcher is refreshed only
+    when a new generation has been committed, and searches are serialized because
+    Whoosh searchers are not thread safe.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        # Cache scope of the responses
+        self.index_dir = backend.path
+        self.lock = threading.Lock()
+        self.searcher = None
+
+    def search(self, fn):
+        """Call fn with an up to date searcher and return its result"""
+        with self.lock:
+            if self.searcher is None:
+                self.searcher = self.backend.searcher()
+            elif not self.searcher.up_to_date():
+                self.searcher = self.searcher.refresh()
+            return fn(self.searcher)
+
+    def generation(self):
+        return self.searcher.generation() if self.searcher else None
+
+
+class RssHandle:
+    """Partitioned RSS index that keeps its partition searchers open, with the interface of IndexHandle"""
+
+    def __init__(self, index_dir, backend=None):
+        self.index_dir = index_dir
+        self.lock = threading.Lock()
+        self.rss_feed = rss_query.RssFeed(index_dir, keep_open=True, backend=backend)
+
+    def search(self, fn):
+        """Call fn with the RssFeed and return its result"""
+        with self.lock:
+            return fn(self.rss_feed)
+
+    def generation(self):
+        with self.lock:
+            return self.rss_feed.generation()
+
+
+class QueryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, cve_index, rss_index, doc_index, doc_model, cache=None, backend=DEFAULT_BACKEND):
+        super().__init__(address, Handler)
+        self.cache = cache
+        self.engine = Engine({"index_dir": doc_index, "backend": backend}, model=doc_model)
+        self.indexes = {
+            "cve": IndexHandle(open_backend(backend, cve_index, cve_query.schema, "description")),
+            "rss": RssHandle(rss_index, backend),
+            "doc": IndexHandle(self.engine.backend),
+        }
+        # Shared by all request threads, HTTP connections to Ollama are reused
+        self.client = get_client()
+        # Retrieval latencies in seconds of the latest requests per source
+        self.latencies = {source: deque(maxlen=10000) for source in self.indexes}
+
+    def retrieve(self, source, request):
+        """Documents, augmented prompt and context report (None for documents) for the request"""
+        prompt = request.get('ollama_prompt', '')
+        context_size = request.get('context_size', 2048)
+        fraction = request.get('context_fraction', CONTEXT_FRACTION)
+        if source == "cve":
+            query = request['whoosh_query']
+            sort_by = request.get('sort_by')
+            docs = self.indexes[source].search(lambda searcher: cve_query.search_index(
+                query, None if query.lower() == "all" else 5, sort_by, searcher))
+            ranked = bool(sort_by) or query.lower() != "all"
+            return (docs, *cve_query.build_prompt(docs, prompt, context_size, fraction, ranked))
+        if source == "rss":
+            query = request.get('whoosh_query')
+            docs = self.indexes[source].search(lambda rss_feed: rss_feed.search_index(request['days'], query))
+            return (docs, *rss_query.build_prompt(docs, prompt, context_size, fraction, bool(query)))
+        docs = self.indexes[source].search(lambda searcher: self.engine.search(request['whoosh_query'], searcher, request.get('ollama_prompt')))
+        return docs, self.engine.build_prompt(docs, prompt), None
+
+    def generate(self, source, request, prompt):
+        """Response of the LLM, from the cache while the index generation is unchanged"""
+        model = self.model(source, request)
+        options = {"num_ctx": request.get('context_size', 2048), "temperature": request.get('temperature')}
+        generate = lambda: self.client.generate(model, prompt, options)
+        if self.cache is None:
+            return generate(), False
+        handle = self.indexes[source]
+        return self.cache.call(model, options, prompt, generate,
+                               os.path.abspath(handle.index_dir), handle.generation())
+
+    def warm(self):
+        """Load the default models of all sources into Ollama before the first request"""
+        for model in sorted({cve_query.llm_model, rss_query.llm_model, self.engine.ollama_model}):
+            try:
+                print(f"Loaded {model} in {self.client.warm(model):.1f}s")
+            except Exception as e:
+                print(f"Could not load {model}: {e}")
+
+    def model(self, source, request):
+        if request.get('model'):
+            return request['model']
+        if source == "cve":
+            return cve_query.llm_model
+        if source == "rss":
+            return rss_query.llm_model
+        return self.engine.ollama_model
+
+    def stats(self):
+        result = {"cache": self.cache.stats() if self.cache else None, "ollama": self.client.stats()}
+        for source, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            result[source] = {
+                "requests": len(ordered),
+                "generation": self.indexes[source].generation(),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3) if ordered else None,
+                "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3) if ordered else None,
+            }
+        return result
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Small JSON replies, without this every keep-alive request waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, data):
+        body = json.dumps(data, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._reply(200, self.server.stats())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        source = self.path.strip("/")
+        if source not in self.server.indexes:
+            self._reply(404, {"error": "not found"})
+            return
+        start = time.perf_counter()
+        try:
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            docs, augmented_prompt, report = self.server.retrieve(source, request)
+        except (KeyError, ValueError, index.EmptyIndexError) as e:
+            self._reply(400, {"error": f"{type(e).__name__}: {e}"})
+            return
+        except Exception as e:
+            # For example a locked SQLite index or a partition removed by the retention of a refresh
+            self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        retrieve_seconds = time.perf_counter() - start
+        self.server.latencies[source].append(retrieve_seconds)
+        result = {"documents": docs, "context": report, "retrieve_ms": round(retrieve_seconds * 1000, 3)}
+        if not request.get('retrieve_only'):
+            start = time.perf_counter()
+            try:
+                result["response"], result["cached"] = self.server.generate(source, request, augmented_prompt)
+            except Exception as e:
+                self._reply(502, {"error": f"Ollama: {e}"})
+                return
+            result["llm_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            if not result["cached"]:
+                result["llm_metrics"] = self.server.client.last_metrics()
+        self._reply(200, result)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Keep CVE, RSS and document indexes open and answer queries over HTTP on localhost.")
+    parser.add_argument('--host', default="127.0.0.1", help="Address to listen on.")
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on.")
+    parser.add_argument('--cve_index', default=os.path.join(base_dir, "cve_indexer", "whoosh_cve_index"), help="CVE index directory.")
+    parser.add_argument('--rss_index', default=os.path.join(base_dir, "rss_indexer", "whoosh_rss_index"), help="RSS index directory.")
+    parser.add_argument('--doc_index', default=os.path.join(base_dir, "doc_indexer", "whoosh_doc_index"), help="Document index directory.")
+    parser.add_argument('--doc_model', default="llama3.2:3b", help="LLM for document queries.")
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help="Search backend of the indexes, Whoosh or SQLite FTS5. The default is $SEARCH_BACKEND or whoosh.")
+    parser.add_argument('--cache', default=os.path.join(base_dir, ".llm_cache.sqlite"), help="Response cache database.")
+    parser.add_argument('--no_cache', action='store_true', help="Always ask Ollama instead of reusing cached responses.")
+    parser.add_argument('--keep_alive', default=KEEP_ALIVE, help="How long Ollama keeps models loaded after a request, e.g. 30m or -1 for ever.")
+    parser.add_argument('--no_warm', action='store_true', help="Do not load the models into Ollama at startup.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    cache = None if args.no_cache else ResponseCache(args.cache)
+    get_client().keep_alive = args.keep_alive
+    server = QueryServer((args.host, args.port), args.cve_index, args.rss_index, args.doc_index, args.doc_model, cache,
+                         args.backend)
+    if not args.no_warm:
+        server.warm()
+    print(f"Listening on http://{args.host}:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,63 @@
+import sqlite3
+
+
+class FeedStore:
+    """
+    SQLite store of the HTTP validators (ETag and Last-Modified) of every feed,
+    so a refresh can ask for a feed only if it has changed, and of a fingerprint
+    of every indexed entry, so unchanged entries of a changed feed are skipped.
+    Fingerprints are written in one transaction by set_fingerprints() once the
+    entries are committed to the index.
+    """
+
+    def __init__(self, path='.rss_feeds.sqlite'):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS feeds (url TEXT PRIMARY KEY, etag TEXT, modified TEXT) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS entries (id TEXT PRIMARY KEY, fingerprint TEXT) WITHOUT ROWID;
+        """)
+
+    def validators(self, url):
+        """etag and modified of the last response of the feed, None when unknown"""
+        row = self.conn.execute("SELECT etag, modified FROM feeds WHERE url = ?", (url,)).fetchone()
+        return row if row else (None, None)
+
+    def set_validators(self, validators):
+        """Save a dict of url: (etag, modified) in one transaction"""
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO feeds (url, etag, modified) VALUES (?, ?, ?)",
+                                  ((url, etag, modified) for url, (etag, modified) in validators.items()))
+
+    def fingerprint(self, entry_id):
+        """Fingerprint of the entry when it was last indexed, None for new entries"""
+        row = self.conn.execute("SELECT fingerprint FROM entries WHERE id = ?", (entry_id,)).fetchone()
+        return row[0] if row else None
+
+    def set_fingerprints(self, fingerprints):
+        """Save a dict of entry id: fingerprint in one transaction"""
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO entries (id, fingerprint) VALUES (?, ?)", fingerprints.items())
+
+    def close(self):
+        self.conn.close()
+
+
+def read_feeds(path, default_interval):
+    """
+    (url, interval) of every feed in a config file. Each line has a feed URL and
+    optionally its refresh interval in seconds. Empty lines and lines starting
+    with # are skipped.
+    """
+    feeds = []
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            feeds.append((fields[0], int(fields[1]) if len(fields) > 1 else default_interval))
+    return feeds
+
+
+def read_feed_urls(path):
+    """Feed URLs of a config file"""
+    return [url for url, _ in read_feeds(path, None)]
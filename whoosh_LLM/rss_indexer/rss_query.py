@@ -1,123 +1,494 @@
 import argparse
 import os
 import sys
+import time
+import socket
+import shutil
+import hashlib
 import feedparser
-from langchain_ollama import OllamaLLM
 from whoosh import index
-from whoosh.fields import Schema, TEXT, ID, DATETIME, KEYWORD
-from whoosh.query import DateRange, And
-from whoosh.qparser import QueryParser
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
+from html import unescape
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
+from feed_store import FeedStore, read_feed_urls, read_feeds
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.context_packer import pack_context, pack_context_batch, drop_duplicate_fields, format_report, CONTEXT_FRACTION
+from common.response_cache import ResponseCache, format_stats
+from common.scheduler import Scheduler, Source, print_status
+from common.ollama_client import get_client, format_metrics
+from common.batch import run_batch, read_prompts, open_output, format_summary, CONCURRENCY
+from common.mapreduce import map_reduce, format_map_reduce_report
+from common.search_backend import open_backend, backend_exists, rrf, Field, TEXT, ID, DATETIME, KEYWORD, BACKENDS, DEFAULT_BACKEND
+
+# Feed URLs, one per line
+feeds_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "feeds.txt")
+# Seconds to wait for a feed server
+FEED_TIMEOUT = 30
+# Seconds between refreshes of feeds without their own interval in --schedule mode
+REFRESH_INTERVAL = 900
+# Health of the feeds refreshed by --schedule
+status_path = os.path.join(os.getcwd(), ".rss_refresh_status.json")
 
 # Define the LLM model to be used
 #llm_model = "llama3.2:1b"
 llm_model = "llama3.2:3b"
 
-class RssFeed:
+class _TextExtractor(HTMLParser):
+    """Text of an HTML fragment without the content of script and style elements, like BeautifulSoup get_text()"""
+    skip_tags = {"script", "style", "template"}
+
     def __init__(self):
-        self.schema = Schema(
-            id=ID(stored=True, unique=True),
-            title=TEXT(stored=True),
-            link=ID(stored=True),
-            description=TEXT(stored=True),
-            published=DATETIME(stored=True),
-            category=KEYWORD(stored=True),
-            summary=TEXT(stored=True)
-        )
-        self.index_dir = os.path.join(os.getcwd(), "whoosh_rss_index")
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.skip_tags:
+            self.skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.skip_tags and self.skip:
+            self.skip -= 1
+
+    def handle_data(self, data):
+        if not self.skip:
+            self.parts.append(data)
+
+def html_to_text(html):
+    """Text of an HTML fragment. Plain text is only unescaped."""
+    if "<" not in html:
+        return unescape(html)
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return "".join(parser.parts)
+
+def entry_fingerprint(entry):
+    """Hash of the raw entry fields that end up in the index"""
+    tags = [tag['term'] for tag in entry.tags] if 'tags' in entry else []
+    fields = [entry.get('title'), entry.get('link'), entry.get('description'), entry.get('published')] + tags
+    return hashlib.blake2b("\x00".join(str(f) for f in fields).encode(), digest_size=16).hexdigest()
+
+def partition_name(day):
+    """Name of the weekly partition of a date, the ISO year and week like 2025-W07"""
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+class RssFeed:
+    """
+    RSS entries indexed in one index per week of publication, in
+    subdirectories of index_dir named by partition_name(). Date window queries
+    open only the weeks they overlap and old weeks are expired by deleting their
+    directory. With keep_open, searchers are kept and refreshed after commits.
+    backend is the search backend of the partitions, whoosh or sqlite.
+    """
+
+    def __init__(self, index_dir=None, keep_open=False, backend=None):
+        self.schema = {
+            "id": Field(ID, unique=True),
+            "title": Field(TEXT),
+            "link": Field(ID),
+            "description": Field(TEXT),
+            "published": Field(DATETIME, sortable=True),
+            "category": Field(KEYWORD),
+            "summary": Field(TEXT),
+        }
+        self.index_dir = index_dir or os.path.join(os.getcwd(), "whoosh_rss_index")
+        self.keep_open = keep_open
+        self.backend = backend or DEFAULT_BACKEND
+        self.searchers = {}
         if not os.path.exists(self.index_dir):
             os.mkdir(self.index_dir)
-
-    def create_index(self, url):
-        """Create or update a Whoosh index with RSS feed data."""
-        feed = feedparser.parse(url)
-        # Check if the index exists
         if index.exists_in(self.index_dir):
-            ix = index.open_dir(self.index_dir)
+            self.migrate()
+
+    def partitions(self):
+        """Names of the existing partitions, oldest first"""
+        return sorted(name for name in os.listdir(self.index_dir)
+                      if backend_exists(self.backend, os.path.join(self.index_dir, name)))
+
+    def open_partition(self, name):
+        """The index of a partition, created if missing"""
+        return open_backend(self.backend, os.path.join(self.index_dir, name), self.schema, "description")
+
+    def write(self, documents):
+        """Write documents into the partitions of their publish date, one writer and one commit per partition"""
+        partitions = {}
+        for doc in documents:
+            partitions.setdefault(partition_name(doc['published']), []).append(doc)
+        for name, docs in sorted(partitions.items()):
+            writer = self.open_partition(name).writer()
+            try:
+                for doc in docs:
+                    writer.update(doc)
+            except BaseException:
+                writer.cancel()
+                raise
+            writer.commit()
+        return len(partitions)
+
+    def migrate(self):
+        """Move the entries of a Whoosh index from before partitioning into weekly partitions"""
+        ix = index.open_dir(self.index_dir)
+        with ix.searcher() as searcher:
+            documents = list(searcher.all_stored_fields())
+        ix.close()
+        self.write(documents)
+        for name in os.listdir(self.index_dir):
+            path = os.path.join(self.index_dir, name)
+            if os.path.isfile(path):
+                os.remove(path)
+        print(f"Moved {len(documents)} RSS entries into weekly partitions")
+
+    def expire(self, weeks):
+        """Delete the partitions older than weeks weeks"""
+        oldest = partition_name(datetime.now() - timedelta(weeks=weeks))
+        expired = [name for name in self.partitions() if name < oldest]
+        for name in expired:
+            searcher = self.searchers.pop(name, None)
+            if searcher:
+                searcher.close()
+            shutil.rmtree(os.path.join(self.index_dir, name))
+        if expired:
+            print(f"Deleted {len(expired)} RSS partitions older than {weeks} weeks: {', '.join(expired)}")
+
+    def generation(self):
+        """Number that changes with every commit to a partition and when a partition is deleted"""
+        # Partitions of the other backend in the same directory never give the same number
+        signature = self.backend + ";" + ",".join(f"{name}:{self.open_partition(name).generation()}"
+                                                  for name in self.partitions())
+        return int(hashlib.blake2b(signature.encode(), digest_size=7).hexdigest(), 16)
+
+    def entry_document(self, entry):
+        """Index document of a feed entry"""
+        published = datetime(*entry.published_parsed[:6]) if 'published_parsed' in entry else datetime.now()
+        # Check if 'description' attribute exists
+        if 'description' in entry:
+            description = html_to_text(entry.description)
+            # Clean up description by removing empty lines and extra whitespace
+            description = "\n".join(line.strip() for line in description.splitlines() if line.strip())
         else:
-            ix = index.create_in(self.index_dir, self.schema)
-        writer = ix.writer()
-        for entry in feed.entries:
-            published = datetime(*entry.published_parsed[:6]) if 'published_parsed' in entry else datetime.now()
-            # Check if 'description' attribute exists
-            if 'description' in entry:
-                description = BeautifulSoup(entry.description, 'html.parser').get_text()
-                # Clean up description by removing empty lines and extra whitespace
-                description = "\n".join(line.strip() for line in description.splitlines() if line.strip())
-            else:
-                description = "No description available."
-            # Generate a summary (for simplicity, using the first 200 characters as summary)
-            summary = description[:200] + "..." if len(description) > 200 else description
-            # Extract 'term' attribute from tags if available
-            category = ", ".join(tag['term'] for tag in entry.tags) if 'tags' in entry else "Uncategorized"
-            writer.update_document(
-                id=entry.id,
-                title=entry.title,
-                link=entry.link,
-                description=description,
-                published=published,
-                category=category,
-                summary=summary
-            )
-        writer.commit()
-        print(f"RSS feed data from {url} has been indexed into Whoosh")
+            description = "No description available."
+        # Generate a summary (for simplicity, using the first 200 characters as summary)
+        summary = description[:200] + "..." if len(description) > 200 else description
+        # Extract 'term' attribute from tags if available
+        category = ", ".join(tag['term'] for tag in entry.tags) if 'tags' in entry else "Uncategorized"
+        return dict(
+            id=entry.id,
+            title=entry.title,
+            link=entry.link,
+            description=description,
+            published=published,
+            category=category,
+            summary=summary
+        )
+
+    def refresh(self, urls, store=None, workers=8):
+        """
+        Fetch the feeds at the same time with up to workers threads and index their
+        entries with one writer and one commit per weekly partition. With a
+        FeedStore, feeds are asked with their saved ETag/Last-Modified and unchanged
+        feeds answer 304, and entries whose fingerprint has not changed are skipped
+        before their HTML is parsed. Nothing is committed when no entry has changed.
+        Returns the number of entries written and the number of failed feeds.
+        """
+        start = time.perf_counter()
+        validators = {}
+        entries = []
+        unchanged = failed = 0
+        # Validators and fingerprints are not trusted when the index was lost or
+        # recreated, or is of the other backend
+        check = store is not None and bool(self.partitions())
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            for url in urls:
+                etag, modified = store.validators(url) if check else (None, None)
+                # Descriptions are reduced to text by html_to_text, feedparser does not need to sanitize them
+                futures.append(pool.submit(feedparser.parse, url, etag=etag, modified=modified,
+                                              sanitize_html=False, resolve_relative_uris=False))
+            for url, future in zip(urls, futures):
+                feed = future.result()
+                status = feed.get('status')
+                if status == 304:
+                    unchanged += 1
+                elif (status and status >= 400) or (feed.bozo and not feed.entries):
+                    failed += 1
+                    print(f"Failed to fetch {url}: {feed.get('bozo_exception', status)}")
+                else:
+                    entries.extend(feed.entries)
+                    if feed.get('etag') or feed.get('modified'):
+                        validators[url] = (feed.get('etag'), feed.get('modified'))
+        documents = []
+        # New fingerprints, kept out of the store until write() has committed the entries,
+        # so a failed write is retried in full by the next refresh
+        fingerprints = {}
+        skipped = 0
+        for entry in entries:
+            if store:
+                fingerprint = entry_fingerprint(entry)
+                if check and store.fingerprint(entry.id) == fingerprint:
+                    skipped += 1
+                    continue
+                fingerprints[entry.id] = fingerprint
+            documents.append(self.entry_document(entry))
+        partitions = self.write(documents)
+        if store:
+            store.set_fingerprints(fingerprints)
+            store.set_validators(validators)
+        changed = len(urls) - unchanged - failed
+        print(f"{len(urls)} RSS feeds refreshed in {time.perf_counter() - start:.1f}s: {changed} changed, "
+              f"{unchanged} not modified, {failed} failed. {len(documents)} entries written into {partitions} weekly "
+              f"partitions, {skipped} unchanged skipped")
+        return len(documents), failed
+
+    def create_index(self, url):
+        """Create or update the index with RSS feed data."""
+        self.refresh([url])
+
+    def searcher(self, name):
+        if not self.keep_open:
+            return self.open_partition(name).searcher()
+        searcher = self.searchers.get(name)
+        if searcher is None:
+            searcher = self.open_partition(name).searcher()
+        elif not searcher.up_to_date():
+            searcher = searcher.refresh()
+        self.searchers[name] = searcher
+        return searcher
 
     def search_index(self, days, query_str=None, n_results=None):
-        """Search the Whoosh index for documents published within the given number of days and optionally matching the query."""
-        ix = index.open_dir(self.index_dir)
-        date_limit = datetime.now() - timedelta(days=days)
-        date_query = DateRange("published", date_limit, datetime.now())
+        """
+        Search the index for documents published within the given number of days and optionally matching the query.
+        Only the weekly partitions that overlap the days are searched. Without a query
+        results are ordered newest first. With one, the BM25 scores of different
+        partitions are not comparable, each has its own term statistics, so the
+        rankings of the partitions are merged by reciprocal rank fusion, newer weeks
+        first on ties.
+        """
+        now = datetime.now()
+        date_limit = now - timedelta(days=days)
+        weeks = {partition_name(now)}
+        day = date_limit
+        while day < now:
+            weeks.add(partition_name(day))
+            day += timedelta(weeks=1)
+        ranges = {"published": (date_limit, now)}
+        rankings = []
+        for name in sorted(weeks, reverse=True):
+            # Partitions outside the window are not even listed
+            if name not in self.searchers and not backend_exists(self.backend, os.path.join(self.index_dir, name)):
+                continue
+            searcher = self.searcher(name)
+            try:
+                rankings.append([doc for _, doc in searcher.search(query_str, limit=n_results, ranges=ranges)])
+            finally:
+                if not self.keep_open:
+                    searcher.close()
+        # An entry whose publish date was changed can be in two partitions, the newer one is kept
+        by_id = {}
+        for ranking in rankings:
+            for doc in ranking:
+                by_id.setdefault(doc['id'], doc)
         if query_str:
-            qp = QueryParser("description", ix.schema)
-            keyword_query = qp.parse(query_str)
-            combined_query = And([date_query, keyword_query])
+            documents = [by_id[id] for id in rrf([[doc['id'] for doc in ranking] for ranking in rankings])]
         else:
-            combined_query = date_query
-        with ix.searcher() as searcher:
-            results = searcher.search(combined_query, limit=n_results)
-            documents = [hit.fields() for hit in results]
-            return documents
+            documents = sorted(by_id.values(), key=lambda doc: doc['published'], reverse=True)
+        return documents[:n_results] if n_results else documents
+
+def query_ollama(prompt, context_size, temperature=None, cache=None, rss_feed=None, on_token=None):
+    """
+    Send a query to Ollama and retrieve the response.
+    With a cache, the response to the same prompt and options is reused until the index of rss_feed changes.
+    on_token is called with the text of the response as it is generated.
+    """
+    options = {"num_ctx": context_size, "temperature": temperature}
+    client = get_client()
+    generate = lambda: client.generate(llm_model, prompt, options, on_token)
+    if cache is None:
+        response = generate()
+        print(format_metrics(client.last_metrics()), file=sys.stderr)
+        return response
+    scope = rss_feed.index_dir if rss_feed else None
+    generation = rss_feed.generation() if rss_feed else None
+    response, hit = cache.call(llm_model, options, prompt, generate, scope, generation)
+    if hit and on_token:
+        on_token(response)
+    elif not hit:
+        print(format_metrics(client.last_metrics()), file=sys.stderr)
+    print(format_stats(cache.stats(), hit))
+    return response
+
+def format_doc(doc):
+    # The summary is cut from the description, it is only kept if it differs
+    doc = drop_duplicate_fields(doc, ['description', 'summary'])
+    lines = [f"Title: {doc['title']}", f"Link: {doc['link']}", f"Published: {doc['published']:%Y-%m-%d %H:%M}",
+             f"Category: {doc['category']}", f"Description: {doc['description']}"]
+    if 'summary' in doc:
+        lines.append(f"Summary: {doc['summary']}")
+    return "\n".join(lines)
+
+def build_prompt(retrieved_docs, ollama_prompt, context_size=2048, context_fraction=CONTEXT_FRACTION, ranked=False):
+    """
+    Pack the documents that fit context_fraction of context_size into the prompt.
+    Unless ranked by relevance, the most recently published documents come first.
+    Returns the prompt and a report of included and dropped documents.
+    """
+    if not ranked:
+        retrieved_docs = sorted(retrieved_docs, key=lambda doc: doc['published'], reverse=True)
+    return pack_context(retrieved_docs, format_doc, context_size, ollama_prompt, context_fraction)
 
-def query_ollama(prompt, context_size):
-    """Send a query to Ollama and retrieve the response."""
-    llm = OllamaLLM(model=llm_model, num_ctx=context_size)
-    return llm.invoke(prompt)
+def build_prompts(retrieved_docs, ollama_prompts, context_size=2048, context_fraction=CONTEXT_FRACTION, ranked=False):
+    """Like build_prompt for several prompts that share one packed context"""
+    if not ranked:
+        retrieved_docs = sorted(retrieved_docs, key=lambda doc: doc['published'], reverse=True)
+    return pack_context_batch(retrieved_docs, format_doc, context_size, ollama_prompts, context_fraction)
 
-def get_response(rss_feed, days, whoosh_query, ollama_prompt, context_size):
+def get_response(rss_feed, days, whoosh_query, ollama_prompt, context_size, context_fraction=CONTEXT_FRACTION,
+                 temperature=None, cache=None, on_token=None):
     retrieved_docs = rss_feed.search_index(days, whoosh_query)
-    context = " ".join([
-        f"ID: {doc['id']}\nTitle: {doc['title']}\nLink: {doc['link']}\nDescription: {doc['description']}\nPublished: {doc['published']}\nCategory: {doc['category']}\nSummary: {doc['summary']}"
-        for doc in retrieved_docs
-    ]) if retrieved_docs else "No relevant documents found."
-    augmented_prompt = f"Context: {context}\n\nQuestion: {ollama_prompt}\nAnswer:"
+    augmented_prompt, report = build_prompt(retrieved_docs, ollama_prompt, context_size, context_fraction,
+                                            ranked=bool(whoosh_query))
     print(augmented_prompt)
+    print(format_report(report))
 
-    response = query_ollama(augmented_prompt, context_size)
+    response = query_ollama(augmented_prompt, context_size, temperature, cache, rss_feed, on_token)
     return response
 
+def get_map_reduce_response(rss_feed, days, whoosh_query, ollama_prompt, map_context_size=4096,
+                            context_fraction=CONTEXT_FRACTION, temperature=None, cache=None, concurrency=CONCURRENCY):
+    """
+    Answer from all items of the last days, summarized in groups of map_context_size
+    and combined. Groups hold the items of one publication day, so the cached summaries
+    of earlier days are reused while new items arrive.
+    """
+    retrieved_docs = sorted(rss_feed.search_index(days, whoosh_query), key=lambda doc: (doc['published'], doc['id']))
+    options = {"num_ctx": map_context_size, "temperature": temperature}
+    client = get_client()
+
+    def generate(prompt):
+        if cache is None:
+            return client.generate(llm_model, prompt, options), False
+        # The prompt holds the items it summarizes, it stays valid while the index changes
+        return cache.call(llm_model, options, prompt, lambda: client.generate(llm_model, prompt, options))
+
+    response, report = map_reduce(retrieved_docs, format_doc, ollama_prompt, generate, map_context_size,
+                                  context_fraction, concurrency, group_key=lambda doc: doc['published'].date())
+    print(format_map_reduce_report(report))
+    if cache:
+        print(format_stats(cache.stats()))
+    return response
+
+def get_responses(rss_feed, days, whoosh_query, ollama_prompts, output, context_size, context_fraction=CONTEXT_FRACTION,
+                  temperature=None, cache=None, concurrency=CONCURRENCY):
+    """
+    Batch mode: search and pack the context once, then answer all prompts with at
+    most concurrency Ollama calls at once. Results are written as JSON lines to output.
+    """
+    retrieved_docs = rss_feed.search_index(days, whoosh_query)
+    augmented_prompts, report = build_prompts(retrieved_docs, ollama_prompts, context_size, context_fraction,
+                                              ranked=bool(whoosh_query))
+    print(format_report(report), file=sys.stderr)
+
+    options = {"num_ctx": context_size, "temperature": temperature}
+    client = get_client()
+    generation = rss_feed.generation()
+
+    def generate(prompt):
+        if cache is None:
+            return client.generate(llm_model, prompt, options), False
+        return cache.call(llm_model, options, prompt, lambda: client.generate(llm_model, prompt, options),
+                          rss_feed.index_dir, generation)
+
+    summary = run_batch(ollama_prompts, augmented_prompts, generate, output, concurrency)
+    print(format_summary(summary), file=sys.stderr)
+    return summary
+
+def refresh_sources(rss_feed, feeds, store, workers=8, retention_weeks=None):
+    """
+    Scheduler sources for feeds given as (url, interval). Feeds with the same
+    interval are one source, refreshed together with one commit per partition.
+    A source fails only when none of its feeds could be fetched.
+    """
+    groups = {}
+    for url, interval in feeds:
+        groups.setdefault(interval, []).append(url)
+    sources = []
+    for interval, urls in sorted(groups.items()):
+        def refresh(urls=urls):
+            written, failed = rss_feed.refresh(urls, store, workers)
+            if failed == len(urls):
+                raise OSError(f"none of {len(urls)} feeds could be fetched")
+            if retention_weeks:
+                rss_feed.expire(retention_weeks)
+            return written
+        sources.append(Source(f"rss every {interval}s ({len(urls)} feeds)", refresh, interval))
+    return sources
+
 def main():
     parser = argparse.ArgumentParser(description="Manage RSS feed data and query Ollama.")
-    parser.add_argument('--update', action='store_true', help="Update Whoosh index with new RSS feed data.")
-    parser.add_argument('--days', type=int, required=True, help="The number of days for retrieving data from Whoosh.")
-    parser.add_argument('--ollama_prompt', type=str, required=True, help="The prompt for Ollama.")
+    parser.add_argument('--update', action='store_true', help="Update the index with new RSS feed data.")
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help="Search backend of the index, Whoosh or SQLite FTS5. The default is $SEARCH_BACKEND or whoosh.")
+    parser.add_argument('--feeds', type=str, default=feeds_path, help="File with the RSS feed URLs, one per line.")
+    parser.add_argument('--workers', type=int, default=8, help="Number of feeds fetched at the same time.")
+    parser.add_argument('--retention_weeks', type=int, help="Delete indexed entries older than this many weeks.")
+    parser.add_argument('--schedule', action='store_true',
+                        help="Keep refreshing the feeds in the background instead of querying. Queries in other processes read the last commit.")
+    parser.add_argument('--interval', type=int, default=REFRESH_INTERVAL,
+                        help="Seconds between refreshes of feeds without an interval in the feeds file.")
+    parser.add_argument('--status', action='store_true', help="Print the health of the feeds refreshed by --schedule.")
+    parser.add_argument('--days', type=int, help="The number of days for retrieving data from Whoosh.")
+    parser.add_argument('--ollama_prompt', type=str, help="The prompt for Ollama.")
+    parser.add_argument('--map_reduce', action='store_true',
+                        help="Summarize the retrieved RSS items in groups that fit --map_context_size and combine the summaries, instead of one prompt.")
+    parser.add_argument('--map_context_size', type=int, default=4096, help="Context size of each Ollama call with --map_reduce.")
+    parser.add_argument('--prompts_file', type=str,
+                        help="Answer every prompt of this file (one per line) with the same retrieved context instead of --ollama_prompt.")
+    parser.add_argument('--output', type=str, default="-", help="JSON lines file for the answers of --prompts_file, - for stdout.")
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help="Prompts of --prompts_file sent to Ollama at once.")
     parser.add_argument('--whoosh_query', type=str, required=False, help="The query for Whoosh.")
     parser.add_argument('--context_size', type=int, default=2048, help="The context size for Ollama.")
+    parser.add_argument('--context_fraction', type=float, default=CONTEXT_FRACTION,
+                        help="Fraction of the context size that retrieved RSS items may use.")
+    parser.add_argument('--temperature', type=float, help="Sampling temperature, the model default if not given.")
+    parser.add_argument('--no_cache', action='store_true', help="Always ask Ollama instead of reusing cached responses.")
+    parser.add_argument('--stream', action='store_true', help="Print the response as it is generated.")
     args = parser.parse_args()
-    rss_urls = [
-         "https://feeds.feedburner.com/TheHackersNews",
-         "https://cvefeed.io/rssfeed/severity/high.xml",
-         "https://cvefeed.io/rssfeed/newsroom.xml",
-         "https://krebsonsecurity.com/feed/"
-    ]
-
-    rss_feed = RssFeed()
+
+    if args.status:
+        print_status(status_path)
+        return
+    rss_feed = RssFeed(backend=args.backend)
+    if args.schedule:
+        socket.setdefaulttimeout(FEED_TIMEOUT)
+        sources = refresh_sources(rss_feed, read_feeds(args.feeds, args.interval), FeedStore(), args.workers,
+                                  args.retention_weeks)
+        Scheduler(sources, status_path).run()
+        return
+    if args.days is None or (args.ollama_prompt is None and args.prompts_file is None):
+        parser.error("--days and --ollama_prompt or --prompts_file are required unless --schedule or --status is given")
     if args.update:
-        for rss_url in rss_urls:
-            rss_feed.create_index(rss_url)
+        socket.setdefaulttimeout(FEED_TIMEOUT)
+        rss_feed.refresh(read_feed_urls(args.feeds), FeedStore(), args.workers)
+    if args.retention_weeks:
+        rss_feed.expire(args.retention_weeks)
 
-    response = get_response(rss_feed, args.days, args.whoosh_query, args.ollama_prompt, args.context_size)
-    print(response)
+    cache = None if args.no_cache else ResponseCache(os.path.join(os.getcwd(), ".llm_cache.sqlite"))
+    if args.prompts_file:
+        with open_output(args.output) as output:
+            get_responses(rss_feed, args.days, args.whoosh_query, read_prompts(args.prompts_file), output,
+                          args.context_size, args.context_fraction, args.temperature, cache, args.concurrency)
+        return
+    if args.map_reduce:
+        print(get_map_reduce_response(rss_feed, args.days, args.whoosh_query, args.ollama_prompt, args.map_context_size,
+                                      args.context_fraction, args.temperature, cache, args.concurrency))
+        return
+    on_token = (lambda text: print(text, end="", flush=True)) if args.stream else None
+    response = get_response(rss_feed, args.days, args.whoosh_query, args.ollama_prompt, args.context_size,
+                            args.context_fraction, args.temperature, cache, on_token)
+    print("" if args.stream else response)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import importlib.util
+from datetime import datetime, timezone
+
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(tests_dir, '..'))
+sys.path.insert(0, os.path.join(tests_dir, '..', '..'))
+import rss_query
+from rss_query import RssFeed, build_prompt, get_map_reduce_response
+from feed_store import FeedStore
+from feed_server import FeedServer, rss_item
+from common.ollama_client import OllamaClient
+from common.response_cache import ResponseCache
+from common.context_packer import estimate_tokens
+import common.ollama_client
+
+spec = importlib.util.spec_from_file_location("fake_ollama", os.path.join(tests_dir, '..', '..', 'common', 'tests', 'fake_ollama.py'))
+fake_ollama = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(fake_ollama)
+
+ARTICLE = ("<p>Researchers disclosed a ransomware campaign against VPN appliances and file transfer servers. "
+           "Initial access used CVE-2025-0001, lateral movement used stolen credentials and the operators "
+           "deleted backups before encrypting hosts. Vendors published patches and indicators.</p>") * 4
+QUESTION = "Which ransomware campaigns were reported and what should be patched?"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="One large prompt against map-reduce summarization, on a fake Ollama")
+    parser.add_argument("--feeds", type=int, default=4)
+    parser.add_argument("--items", type=int, default=40, help="Items per feed, one per hour")
+    parser.add_argument("--context_size", type=int, default=128000, help="Context size of the single prompt")
+    parser.add_argument("--map_context_size", type=int, default=4096)
+    parser.add_argument("--prompt_tps", type=float, default=5000.0, help="Prompt tokens per second of the fake Ollama")
+    parser.add_argument("--eval_tps", type=float, default=200.0)
+    parser.add_argument("--ctx_scale", type=float, default=4096.0, help="Prompt tokens get slower with their position, see fake_ollama")
+    args = parser.parse_args()
+    feeds = FeedServer(feeds=args.feeds, items=0).start()
+    for path in feeds.items:
+        feeds.items[path] = [rss_item(path, i, body=ARTICLE) for i in range(args.items)]
+    days = args.items // 24 + 1
+    with tempfile.TemporaryDirectory() as tmp:
+        rss_feed = RssFeed(os.path.join(tmp, "index"))
+        store = FeedStore(os.path.join(tmp, "feeds.sqlite"))
+        rss_feed.refresh(feeds.urls, store)
+        docs = rss_feed.search_index(days)
+        print(f"{len(docs)} items of the last {days} days")
+        for parallel in (1, 4):
+            ollama = fake_ollama.FakeOllama(load_time=0, prompt_tps=args.prompt_tps, eval_tps=args.eval_tps,
+                                            answer_tokens=60, parallel=parallel, ctx_scale=args.ctx_scale).start()
+            client = OllamaClient(ollama.url)
+            # rss_query uses the shared client of the process
+            common.ollama_client._clients[None] = client
+            print(f"fake Ollama with {parallel} parallel slots:")
+            prompt, report = build_prompt(docs, QUESTION, args.context_size)
+            start = time.perf_counter()
+            client.generate(rss_query.llm_model, prompt, {"num_ctx": args.context_size})
+            print(f"  single prompt: {report['included']} items, {estimate_tokens(prompt)} tokens, {time.perf_counter() - start:.1f}s")
+
+            cache = ResponseCache(os.path.join(tmp, f"cache{parallel}.sqlite"))
+            start = time.perf_counter()
+            get_map_reduce_response(rss_feed, days, None, QUESTION, args.map_context_size, cache=cache, concurrency=parallel)
+            print(f"  map-reduce: {time.perf_counter() - start:.1f}s")
+
+            # A new story arrives, only the summary of today's group is not cached
+            feeds.items["/feed/0"].insert(0, rss_item(0, 1000 + parallel, datetime.now(timezone.utc), ARTICLE))
+            rss_feed.refresh(feeds.urls, store)
+            start = time.perf_counter()
+            get_map_reduce_response(rss_feed, days, None, QUESTION, args.map_context_size, cache=cache, concurrency=parallel)
+            print(f"  map-reduce after one new item: {time.perf_counter() - start:.1f}s")
+            cache.close()
+            ollama.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+from whoosh import index
+from whoosh.query import DateRange, And
+from whoosh.qparser import QueryParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rss_query import RssFeed
+from common.whoosh_backend import whoosh_schema
+
+WORDS = ["ransomware", "phishing", "patch", "botnet", "breach", "exploit", "malware", "vpn", "cloud", "firmware"]
+
+
+def documents(start_day, end_day, per_day):
+    """Fixture entries published per_day times a day from start_day to end_day days ago"""
+    now = datetime.now()
+    for day in range(start_day, end_day):
+        for i in range(per_day):
+            n = day * per_day + i
+            yield dict(id=f"entry-{n}", title=f"Story {n}", link=f"http://example.com/{n}",
+                       description=f"Story {n} about {WORDS[n % len(WORDS)]} and {WORDS[(n // 7) % len(WORDS)]} "
+                                   f"affecting vendor {n % 97}",
+                       published=now - timedelta(days=day, minutes=i), category="news", summary=f"Story {n}")
+
+
+def single_index_search(ix, days, query_str):
+    """The search of the unpartitioned index: a DateRange over every entry ever indexed"""
+    now = datetime.now()
+    query = DateRange("published", now - timedelta(days=days), now)
+    if query_str:
+        query = And([query, QueryParser("description", ix.schema).parse(query_str)])
+    with ix.searcher() as searcher:
+        return [hit.fields() for hit in searcher.search(query, limit=None)]
+
+
+def latency(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n = len(fn())
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="--days query latency of the single and the weekly partitioned RSS index by index age")
+    parser.add_argument("--per_day", type=int, default=50, help="Entries published per day")
+    parser.add_argument("--weeks", type=int, nargs="+", default=[4, 26, 52, 104], help="Index ages to measure")
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        rss_feed = RssFeed(os.path.join(tmp, "partitioned"))
+        os.mkdir(os.path.join(tmp, "single"))
+        single = index.create_in(os.path.join(tmp, "single"), whoosh_schema(rss_feed.schema))
+        age = 0
+        for weeks in args.weeks:
+            # Older entries are added to both layouts until the index is weeks old
+            docs = list(documents(age * 7, weeks * 7, args.per_day))
+            writer = single.writer()
+            for doc in docs:
+                writer.add_document(**doc)
+            writer.commit()
+            rss_feed.write(docs)
+            age = weeks
+            for query_str in (None, "ransomware"):
+                single_ms, n = latency(lambda: single_index_search(single, args.days, query_str), args.repeat)
+                part_ms, m = latency(lambda: rss_feed.search_index(args.days, query_str), args.repeat)
+                print(f"{weeks:4d} weeks, {weeks * 7 * args.per_day:6d} entries, --days {args.days}"
+                      f"{' --whoosh_query ' + query_str if query_str else ''}: "
+                      f"single index {single_ms:7.1f} ms ({n} hits), partitioned {part_ms:6.1f} ms ({m} hits)")
@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rss_query import RssFeed, html_to_text
+from feed_store import FeedStore
+from feed_server import FeedServer, rss_item
+
+# Roughly the size and markup of a news feed description
+ARTICLE = ("<div class='entry'><p>Researchers have <a href='https://example.com/a'>disclosed</a> a new "
+           "<strong>ransomware</strong> campaign targeting VPN appliances &amp; file transfer servers.</p>"
+           "<ul><li>Initial access through CVE-2025-0001</li><li>Lateral movement with stolen credentials</li></ul>"
+           "<script>track('rss');</script><p>Patches are available &#8212; apply them now.</p>"
+           "<img src='x.png' alt='chart'/></div>") * 6
+
+
+def bench_html(repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        old = BeautifulSoup(ARTICLE, 'html.parser').get_text()
+    bs_ms = (time.perf_counter() - start) / repeat * 1000
+    start = time.perf_counter()
+    for _ in range(repeat):
+        new = html_to_text(ARTICLE)
+    new_ms = (time.perf_counter() - start) / repeat * 1000
+    print(f"HTML to text, {len(ARTICLE)} bytes: BeautifulSoup {bs_ms:.3f} ms, html_to_text {new_ms:.3f} ms, "
+          f"same text: {old == new}")
+
+
+def bench_refresh(feeds, items):
+    # Servers without ETag support send the whole feed on every refresh
+    server = FeedServer(feeds=feeds, items=0, etag=False).start()
+    for path in server.items:
+        server.items[path] = [rss_item(path, i, body=ARTICLE) for i in range(items)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, store in (("without fingerprints", None), ("with fingerprints", FeedStore(os.path.join(tmp, "s")))):
+            rss_feed = RssFeed(os.path.join(tmp, name))
+            print(f"{name}:")
+            for run in ("  first refresh", "  unchanged refresh"):
+                start = time.perf_counter()
+                rss_feed.refresh(server.urls, store)
+                print(f"{run}: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTML to text speed and refresh time of unchanged feeds")
+    parser.add_argument("--feeds", type=int, default=20)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+    bench_html(args.repeat)
+    bench_refresh(args.feeds, args.items)
@@ -0,0 +1,85 @@
+import os
+import sys
+import random
+import tempfile
+import importlib.util
+from datetime import datetime, timezone
+
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(tests_dir, '..'))
+sys.path.insert(0, os.path.join(tests_dir, '..', '..'))
+from feed_server import FeedServer, rss_item
+from feed_store import FeedStore
+from common.scheduler import Scheduler, Source
+
+HOUR = 3600
+
+
+class FakeClock:
+    """Clock whose sleep moves the time forward instead of waiting"""
+
+    def __init__(self, start=1_700_000_000.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def main():
+    """
+    Schedule two RSS feed groups (every 10 minutes and every hour) and the NVD
+    feed (every 2 hours) from local fixture servers over 8 hours of fake time.
+    The RSS server is down from hour 2 to hour 4 and a story is published every hour.
+    """
+    clock = FakeClock()
+    rss_server = FeedServer(feeds=3, items=5).start()
+    # The NVD stand-in has the same module name as the RSS one
+    spec = importlib.util.spec_from_file_location(
+        "nvd_feed_server", os.path.join(tests_dir, '..', '..', 'cve_indexer', 'tests', 'feed_server.py'))
+    nvd = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(nvd)
+    nvd_server = nvd.FeedServer(count=50).start()
+    os.environ["NVD_FEED_URL"] = nvd_server.url + nvd.NVD_PATH
+    os.environ["KEV_FEED_URL"] = nvd_server.url + nvd.KEV_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        # cve_query keeps its index and seen store in the working directory
+        os.chdir(tmp)
+        sys.path.insert(0, os.path.join(tests_dir, '..', '..', 'cve_indexer'))
+        import cve_query
+        from rss_query import RssFeed, refresh_sources
+        rss_feed = RssFeed(os.path.join(tmp, "whoosh_rss_index"))
+        urls = rss_server.urls
+        feeds = [(urls[0], 600), (urls[1], 600), (urls[2], HOUR)]
+        sources = refresh_sources(rss_feed, feeds, FeedStore(os.path.join(tmp, "feeds.sqlite")))
+        sources.append(Source("nvd", lambda: cve_query.create_index(nvd_server.url + nvd.NVD_PATH), 2 * HOUR))
+        runs = []
+        for source in sources:
+            def logged(source=source, refresh=source.refresh):
+                runs.append((clock.time() - start, source.name))
+                return refresh()
+            source.refresh = logged
+        start = clock.time()
+        scheduler = Scheduler(sources, os.path.join(tmp, "status.json"), clock.time, clock.sleep, random.Random(1).random)
+        for hour in range(1, 9):
+            rss_server.down = hour in (3, 4)
+            published = datetime.fromtimestamp(clock.time(), timezone.utc)
+            rss_server.items["/feed/0"].insert(0, rss_item(0, 100 + hour, published))
+            scheduler.run(until=start + hour * HOUR)
+        print("\nRuns (minutes from start):")
+        for name in [source.name for source in sources]:
+            print(f"  {name}: {' '.join(f'{t / 60:.0f}' for t, n in runs if n == name)}")
+        print("\nStatus after 8 hours:")
+        for name, status in scheduler.status().items():
+            print(f"  {name}: {status['health']}, lag {status['lag']}s, runs {status['runs']}, "
+                  f"last added {status['last_added']}, total added {status['total_added']}, failures {status['failures']}")
+        # The hourly story of hour 8 is published at the start of hour 8 and seen by the 10 minute group
+        assert scheduler.status()[sources[0].name]['health'] == "ok"
+        assert scheduler.status()["nvd"]['total_added'] == 50
+        os.chdir(tests_dir)
+
+
+if __name__ == "__main__":
+    main()
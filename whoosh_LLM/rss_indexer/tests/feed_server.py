@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def rss_item(feed, i, published=None, body=None):
+    published = published or datetime.now(timezone.utc) - timedelta(hours=i)
+    body = body or f"<p>Fixture <b>story</b> number {i} of feed {feed} about ransomware and patches.</p>"
+    return (f"<item><title>Story {feed}-{i}</title><link>http://example.com/{feed}/{i}</link>"
+            f"<guid>http://example.com/{feed}/{i}</guid><pubDate>{format_datetime(published)}</pubDate>"
+            f"<category>news</category><description><![CDATA[{body}]]></description></item>")
+
+
+class FeedServer(ThreadingHTTPServer):
+    """
+    Local stand-in for RSS feeds. Serves feeds /feed/0 .. /feed/<feeds - 1> with
+    ETag headers, answers 304 to matching conditional requests, waits delay
+    seconds before every answer like a remote server and records every request
+    as (path, status). With etag=False it behaves like servers that always send
+    the whole feed, with down=True every request fails with 503.
+    """
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), feeds=4, items=20, delay=0.0, etag=True):
+        super().__init__(address, Handler)
+        self.delay = delay
+        self.etag = etag
+        self.down = False
+        self.items = {f"/feed/{f}": [rss_item(f, i) for i in range(items)] for f in range(feeds)}
+        self.log = []
+        self.lock = threading.Lock()
+
+    def body(self, path):
+        items = self.items.get(path)
+        if items is None:
+            return None
+        return ('<?xml version="1.0"?><rss version="2.0"><channel><title>Fixture</title>'
+                f'<link>http://example.com/</link><description>Fixture feed</description>{"".join(items)}'
+                '</channel></rss>').encode()
+
+    @property
+    def urls(self):
+        return [self.url + path for path in self.items]
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        body = self.server.body(self.path)
+        if self.server.down:
+            self.send_error(503)
+            status = 503
+        elif body is None:
+            self.send_error(404)
+            status = 404
+        else:
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if self.server.etag and self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+                status = 304
+            else:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/rss+xml")
+                if self.server.etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                status = 200
+        with self.server.lock:
+            self.server.log.append((self.path, status))
+
+
+def check(server):
+    """
+    Refresh an index from the stand-in: a first run, a run without changes, a run
+    after one feed changed and a retry after a refresh whose index write failed
+    """
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from rss_query import RssFeed
+    from feed_store import FeedStore
+    with tempfile.TemporaryDirectory() as tmp:
+        rss_feed = RssFeed(os.path.join(tmp, "whoosh_rss_index"))
+        store = FeedStore(os.path.join(tmp, "feeds.sqlite"))
+        for name in ("first run", "no changes", "one feed changed"):
+            if name == "one feed changed":
+                server.items["/feed/0"].insert(0, rss_item(0, 1000))
+            server.log.clear()
+            print(f"{name}:")
+            rss_feed.refresh(server.urls, store)
+            print(f"  requests: {sorted(server.log)}")
+        server.items["/feed/1"][0] = rss_item(1, 0, body="<p>Updated story about a zeroday.</p>")
+        write = rss_feed.write
+
+        def failing_write(documents):
+            rss_feed.write = write
+            raise OSError("disk full")
+        rss_feed.write = failing_write
+        print("one entry updated, index write fails:")
+        try:
+            rss_feed.refresh(server.urls, store)
+        except OSError as e:
+            print(f"  {e}")
+        print("retry:")
+        rss_feed.refresh(server.urls, store)
+        print(f"  updated entry indexed: {bool(rss_feed.search_index(7, 'zeroday'))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for RSS feeds")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--feeds", type=int, default=4, help="Number of fixture feeds")
+    parser.add_argument("--items", type=int, default=20, help="Items per feed")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before every answer")
+    parser.add_argument("--check", action='store_true', help="Run RssFeed.refresh() against the server and print the requests")
+    args = parser.parse_args()
+    server = FeedServer(("127.0.0.1", 0 if args.check else args.port), args.feeds, args.items, args.delay)
+    if args.check:
+        check(server.start())
+    else:
+        print("\n".join(server.urls))
+        server.serve_forever()
@@ -18,19 +18,25 @@ index_dir = os.path.join(os.getcwd(), "whoosh_rss_index")
 
 def print_all_cves():
     """Print all indexed CVEs from the Whoosh index."""
-    if not index.exists_in(index_dir):
+    if not os.path.isdir(index_dir):
         print("No index found. Please create the index first.")
         return
 
-    ix = index.open_dir(index_dir)
-    with ix.searcher() as searcher:
-        query = Every()
-        results = searcher.search(query, limit=None)
-        for i, hit in enumerate(results):
-            print(f"Result {i+1}:")
-            for key, value in hit.items():
-                print(f"{key}: {value}")
-            print("\n")
+    # Entries are in one index per week
+    i = 0
+    for name in sorted(os.listdir(index_dir)):
+        if not index.exists_in(os.path.join(index_dir, name)):
+            continue
+        ix = index.open_dir(os.path.join(index_dir, name))
+        with ix.searcher() as searcher:
+            query = Every()
+            results = searcher.search(query, limit=None)
+            for hit in results:
+                i += 1
+                print(f"Result {i} ({name}):")
+                for key, value in hit.items():
+                    print(f"{key}: {value}")
+                print("\n")
 
 if __name__ == "__main__":
     print_all_cves()
@@ -17,15 +17,21 @@ schema = Schema(
 index_dir = os.path.join(os.getcwd(), "whoosh_rss_index")
 
 def search_index(query_text, n_results=5):
-    """Search the Whoosh index for relevant documents."""
-    ix = index.open_dir(index_dir)
-    # Use MultiFieldParser to allow querying multiple fields
-    qp = QueryParser("description", schema=ix.schema)
-    q = qp.parse(query_text)
-    with ix.searcher() as searcher:
-        results = searcher.search(q, limit=n_results)
-        documents = [hit.fields() for hit in results]
-        return documents
+    """Search the weekly indexes for relevant documents."""
+    hits = []
+    for name in sorted(os.listdir(index_dir)):
+        if not index.exists_in(os.path.join(index_dir, name)):
+            continue
+        ix = index.open_dir(os.path.join(index_dir, name))
+        # Use MultiFieldParser to allow querying multiple fields
+        qp = QueryParser("description", schema=ix.schema)
+        q = qp.parse(query_text)
+        with ix.searcher() as searcher:
+            results = searcher.search(q, limit=n_results)
+            hits.extend((hit.score, hit.fields()) for hit in results)
+    hits.sort(key=lambda hit: hit[0], reverse=True)
+    documents = [fields for _, fields in hits[:n_results]]
+    return documents
 
 def main():
     while True: